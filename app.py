@@ -1,5 +1,10 @@
-from flask import Flask, request, jsonify, send_from_directory
+from batch_chat import BatchError
+from chat_request import ChatRequestError, chat_params
+from compression import ResponseCompressor, StaticAsset
+from flask import Flask, Response, request, jsonify, stream_with_context
+from metrics import timed
 from multi_ai_assistant import MultiAIAssistant
+from streaming import sse_chunks
 import os
 from dotenv import load_dotenv
 
@@ -8,30 +13,113 @@ load_dotenv()
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 assistant = MultiAIAssistant()
+compression = ResponseCompressor.from_env()
+page = StaticAsset(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html'), 'text/html; charset=utf-8',
+    max_age=int(os.environ.get('STATIC_MAX_AGE', 0))
+)
 
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    status, body, headers = page.response(request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'))
+    return Response(body, status=status, headers=headers, content_type=page.content_type)
+
+@app.after_request
+def compress_response(response):
+    # JSON answers, SSE and NDJSON streams go out compressed when the client accepts it
+    if response.status_code in (204, 304) or 'Content-Encoding' in response.headers:
+        return response
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'), response.mimetype, response.is_streamed)
+    if encoding and response.is_streamed:
+        response.response = compression.stream(response.response, encoding)
+    elif encoding:
+        body, encoding = compression.compress(response.get_data(), encoding)
+        if encoding:
+            response.set_data(body)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if compression.enabled:
+        response.vary.add('Accept-Encoding')
+    return response
+
+def read_chat_request():
+    # JSON with a base64 data URL image, multipart/form-data with an 'image' file,
+    # or a raw image/* body with the other fields in the query string
+    if request.mimetype == 'multipart/form-data':
+        data = request.form
+        upload = request.files.get('image')
+        image_data = upload.read() if upload else None
+    elif request.mimetype.startswith('image/'):
+        data = request.args
+        image_data = request.get_data()
+    else:
+        data = request.json
+        image_data = data.get('image') if isinstance(data, dict) else None
+    return chat_params(data, image_data)
+
+@app.errorhandler(ChatRequestError)
+def invalid_chat_request(error):
+    return jsonify({'error': str(error)}), 400
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    data = request.json
-    user_input = data.get('message', '')
-    image_data = data.get('image', None)
-    language = data.get('language', 'any')
-    ai_model = data.get('ai_model', 'auto')
-    
-    response = assistant.chat(user_input, image_data, language, ai_model)
-    return jsonify({'response': response})
+    with assistant.metrics.request('/chat') as timing:
+        with timed('parse'):
+            user_input, image_data, language, ai_model, session_id = read_chat_request()
+        
+        response = assistant.chat(user_input, image_data, language, ai_model, session_id)
+        assistant.metrics.finish(timing, response)
+        with timed('serialize'):
+            result = jsonify({'response': response})
+    if assistant.metrics.server_timing:
+        result.headers['Server-Timing'] = timing.header()
+    return result
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    chunks = assistant.metrics.stream('/chat/stream', assistant.stream_chat(*read_chat_request()))
+    return Response(
+        stream_with_context(sse_chunks(chunks)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    try:
+        items = assistant.batches.parse(request.get_json(silent=True))
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    lines = assistant.metrics.stream('/chat/batch', assistant.chat_batch(items))
+    return Response(
+        stream_with_context(lines),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/status')
 def status():
     return jsonify({
         'status': 'online',
         'assistant_type': assistant.get_status(),
-        'gemini_enabled': assistant.use_gemini
+        'gemini_enabled': assistant.use_gemini,
+        'transport': assistant.get_transport_stats(),
+        'cache': assistant.get_cache_stats(),
+        'providers': assistant.get_provider_stats(),
+        'hedging': assistant.get_hedge_stats(),
+        'coalescing': assistant.get_coalescing_stats(),
+        'sessions': assistant.get_session_stats(),
+        'batch': assistant.get_batch_stats(),
+        'knowledge_base': assistant.get_knowledge_stats(),
+        'budget': assistant.get_budget_stats(),
+        'compression': compression.get_stats(),
+        'rate_limits': assistant.get_scheduler_stats()
     })
 
+@app.route('/metrics')
+def metrics():
+    return Response(assistant.get_metrics(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
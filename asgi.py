@@ -0,0 +1,264 @@
+import json
+import os
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qsl
+
+from batch_chat import BatchError
+from chat_request import ChatRequestError, chat_params
+from compression import ResponseCompressor, StaticAsset
+from dotenv import load_dotenv
+from metrics import timed
+from multi_ai_assistant import MultiAIAssistant
+from streaming import asse_chunks
+
+load_dotenv()
+
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+assistant = MultiAIAssistant()
+compression = ResponseCompressor.from_env()
+page = StaticAsset(
+    os.path.join(BASE_DIR, 'index.html'), 'text/html; charset=utf-8', max_age=int(os.environ.get('STATIC_MAX_AGE', 0))
+)
+
+
+async def _read_body(receive):
+    body = bytearray()
+    more_body = True
+    while more_body:
+        message = await receive()
+        body.extend(message.get('body', b''))
+        if len(body) > MAX_CONTENT_LENGTH:
+            return None
+        more_body = message.get('more_body', False)
+    return bytes(body)
+
+
+async def _send(send, status, body, content_type, headers=(), scope=None):
+    # With the request's scope, the body is compressed if the client accepts it and it is big enough
+    headers = list(headers)
+    if scope is not None and compression.enabled:
+        body, encoding = compression.compress(
+            body, compression.negotiate(_header(scope, b'accept-encoding'), content_type)
+        )
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode()))
+        headers.append((b'vary', b'accept-encoding'))
+    if status != 304:
+        headers.append((b'content-length', str(len(body)).encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _stream_headers(scope, content_type):
+    # Response headers for a stream, and the encoder to compress it with (None to send it as is)
+    headers = [
+        (b'content-type', content_type),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]
+    encoding = compression.negotiate(_header(scope, b'accept-encoding'), content_type.decode(), stream=True)
+    if compression.enabled:
+        headers.append((b'vary', b'accept-encoding'))
+    if encoding is None:
+        return headers, None
+    headers.append((b'content-encoding', encoding.encode()))
+    return headers, compression.encoder(encoding)
+
+
+async def _send_json(send, payload, status=200, scope=None):
+    await _send(send, status, json.dumps(payload).encode(), 'application/json', scope=scope)
+
+
+async def index(scope, receive, send):
+    status, body, headers = page.response(_header(scope, b'accept-encoding'), _header(scope, b'if-none-match'))
+    await _send(send, status, body, page.content_type, [(name.lower().encode(), value.encode()) for name, value in headers])
+
+
+async def _read_json(receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        await _send_json(send, {'error': 'Request entity too large'}, 413)
+        return None
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        await _send_json(send, {'error': 'Invalid JSON'}, 400)
+        return None
+    if data is None:
+        # A literal null would look like the errors above to the caller, which then sends nothing
+        await _send_json(send, {'error': 'Expected a JSON object'}, 400)
+    return data
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def _parse_multipart(body, content_type):
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = part.get_payload(decode=True)
+    return fields
+
+
+async def _read_chat_request(scope, receive, send):
+    # Same request formats as app.read_chat_request: JSON, multipart/form-data or a raw image/* body
+    content_type = _header(scope, b'content-type')
+    mimetype = content_type.split(';')[0].strip().lower()
+    if mimetype == 'application/json' or not mimetype:
+        data = await _read_json(receive, send)
+        if data is None:
+            return None
+        image_data = data.get('image') if isinstance(data, dict) else None
+    else:
+        body = await _read_body(receive)
+        if body is None:
+            await _send_json(send, {'error': 'Request entity too large'}, 413)
+            return None
+        if mimetype == 'multipart/form-data':
+            fields = _parse_multipart(body, content_type)
+            image_data = fields.pop('image', None) or None
+            data = {name: value.decode('utf-8') for name, value in fields.items()}
+        elif mimetype.startswith('image/'):
+            data = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+            image_data = body
+        else:
+            await _send_json(send, {'error': 'Unsupported media type'}, 415)
+            return None
+    try:
+        return chat_params(data, image_data)
+    except ChatRequestError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return None
+
+
+async def chat(scope, receive, send):
+    with assistant.metrics.request('/chat') as timing:
+        with timed('parse'):
+            params = await _read_chat_request(scope, receive, send)
+        if params is None:
+            timing.outcome = 'invalid'
+            return
+
+        response = await assistant.achat(*params)
+        assistant.metrics.finish(timing, response)
+        with timed('serialize'):
+            body = json.dumps({'response': response}).encode()
+    headers = []
+    if assistant.metrics.server_timing:
+        headers.append((b'server-timing', timing.header().encode()))
+    await _send(send, 200, body, 'application/json', headers, scope)
+
+
+async def chat_stream(scope, receive, send):
+    params = await _read_chat_request(scope, receive, send)
+    if params is None:
+        return
+
+    chunks = assistant.metrics.astream('/chat/stream', assistant.astream_chat(*params))
+    headers, encoder = _stream_headers(scope, b'text/event-stream')
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    async for event in asse_chunks(chunks):
+        body = encoder.encode(event.encode()) if encoder else event.encode()
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': compression.finish_stream(encoder) if encoder else b''})
+
+
+async def chat_batch(scope, receive, send):
+    data = await _read_json(receive, send)
+    if data is None:
+        return
+    try:
+        items = assistant.batches.parse(data)
+    except BatchError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+
+    lines = assistant.metrics.astream('/chat/batch', assistant.achat_batch(items))
+    headers, encoder = _stream_headers(scope, b'application/x-ndjson')
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    async for line in lines:
+        body = encoder.encode(line.encode()) if encoder else line.encode()
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': compression.finish_stream(encoder) if encoder else b''})
+
+
+async def status(scope, receive, send):
+    await _send_json(send, {
+        'status': 'online',
+        'assistant_type': assistant.get_status(),
+        'gemini_enabled': assistant.use_gemini,
+        'transport': assistant.get_transport_stats(),
+        'cache': assistant.get_cache_stats(),
+        'providers': assistant.get_provider_stats(),
+        'hedging': assistant.get_hedge_stats(),
+        'coalescing': assistant.get_coalescing_stats(),
+        'sessions': assistant.get_session_stats(),
+        'batch': assistant.get_batch_stats(),
+        'knowledge_base': assistant.get_knowledge_stats(),
+        'budget': assistant.get_budget_stats(),
+        'compression': compression.get_stats(),
+        'rate_limits': assistant.get_scheduler_stats()
+    }, scope=scope)
+
+
+async def metrics(scope, receive, send):
+    await _send(send, 200, assistant.get_metrics().encode(), 'text/plain; version=0.0.4; charset=utf-8', scope=scope)
+
+
+ROUTES = {
+    ('GET', '/'): index,
+    ('POST', '/chat'): chat,
+    ('POST', '/chat/stream'): chat_stream,
+    ('POST', '/chat/batch'): chat_batch,
+    ('GET', '/status'): status,
+    ('GET', '/metrics'): metrics,
+}
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await assistant.async_transport.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        if any(path == scope['path'] for _, path in ROUTES):
+            await _send_json(send, {'error': 'Method not allowed'}, 405)
+        else:
+            await _send_json(send, {'error': 'Not found'}, 404)
+        return
+    await handler(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8080))
+    uvicorn.run('asgi:app', host='0.0.0.0', port=port)
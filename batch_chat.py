@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class BatchError(ValueError):
+    pass
+
+
+class BatchItem:
+    # One distinct question in a batch; identical items share it and are listed in indexes
+    __slots__ = ('message', 'image', 'language', 'ai_model', 'indexes')
+
+    def __init__(self, message, image, language, ai_model):
+        self.message = message
+        self.image = image
+        self.language = language
+        self.ai_model = ai_model
+        self.indexes = []
+
+    @property
+    def key(self):
+        return (self.message, self.image, self.language.lower(), self.ai_model)
+
+
+def _text_field(entry, name, where):
+    # A string field of an item or of the batch defaults; anything else would reach the chat
+    # layer (and the dedup key) as an unhashable or meaningless value
+    value = entry.get(name)
+    if value is not None and not isinstance(value, str):
+        raise BatchError(f"{where}: '{name}' must be a string")
+    return value
+
+
+def _ndjson(payload):
+    return json.dumps(payload) + '\n'
+
+
+class BatchRunner:
+    # Answers many chat requests from one HTTP request, at most `concurrency` at a time.
+    # Provider rate limits still apply per call, so a large batch queues in the scheduler
+    # rather than overrunning a free tier. Results are NDJSON lines in completion order.
+    def __init__(self, max_items=50, concurrency=8):
+        self.max_items = max_items
+        self.concurrency = max(1, concurrency)
+        self.batches = 0
+        self.items = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_items=int(os.environ.get('BATCH_MAX_ITEMS', 50)),
+            concurrency=int(os.environ.get('BATCH_CONCURRENCY', 8)),
+        )
+
+    def parse(self, data):
+        # Either a bare array of items or {"items": [...]} with batch-wide language/ai_model defaults
+        defaults = {}
+        if isinstance(data, dict):
+            defaults = data
+            data = data.get('items')
+        for name in ('language', 'ai_model'):
+            _text_field(defaults, name, 'Batch')
+        if not isinstance(data, list) or not data:
+            raise BatchError("Expected a non-empty array of {message, language, ai_model} items")
+        if len(data) > self.max_items:
+            raise BatchError(f"Batch of {len(data)} items exceeds the limit of {self.max_items}")
+
+        unique = {}
+        for index, entry in enumerate(data):
+            if isinstance(entry, str):
+                entry = {'message': entry}
+            if not isinstance(entry, dict):
+                raise BatchError(f"Item {index} must be an object")
+            where = f"Item {index}"
+            item = BatchItem(
+                _text_field(entry, 'message', where) or '',
+                _text_field(entry, 'image', where) or None,
+                _text_field(entry, 'language', where) or defaults.get('language') or 'any',
+                _text_field(entry, 'ai_model', where) or defaults.get('ai_model') or 'auto',
+            )
+            item = unique.setdefault(item.key, item)
+            item.indexes.append(index)
+
+        items = list(unique.values())
+        with self._lock:
+            self.batches += 1
+            self.items += len(data)
+            self.deduplicated += len(data) - len(items)
+        return items
+
+    def _lines(self, item, response, started, seconds, batch_start):
+        # One line per original index; duplicates point at the index that was actually asked
+        for index in item.indexes:
+            result = {
+                'index': index,
+                'response': response,
+                'duration_ms': round(seconds * 1000, 1),
+                'finished_ms': round((started + seconds - batch_start) * 1000, 1),
+            }
+            if index != item.indexes[0]:
+                result['duplicate_of'] = item.indexes[0]
+            yield _ndjson(result)
+
+    def _summary(self, items, errors, batch_start):
+        return _ndjson({
+            'done': True,
+            'items': sum(len(item.indexes) for item in items),
+            'unique': len(items),
+            'errors': errors,
+            'duration_ms': round((time.perf_counter() - batch_start) * 1000, 1),
+        })
+
+    @staticmethod
+    def _call(chat, item):
+        started = time.perf_counter()
+        try:
+            response = chat(item.message, item.image, item.language, item.ai_model)
+        except Exception as e:
+            response = f"[ERROR] Error: {str(e)}"
+        return item, response, started, time.perf_counter() - started
+
+    def run(self, chat, items):
+        batch_start = time.perf_counter()
+        errors = 0
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items)), thread_name_prefix='batch') as pool:
+            futures = [pool.submit(self._call, chat, item) for item in items]
+            try:
+                for future in as_completed(futures):
+                    item, response, started, seconds = future.result()
+                    errors += len(item.indexes) if response.startswith('[ERROR]') else 0
+                    yield from self._lines(item, response, started, seconds, batch_start)
+            finally:
+                # A client that disconnects stops the items that have not started yet
+                for future in futures:
+                    future.cancel()
+        yield self._summary(items, errors, batch_start)
+
+    async def arun(self, achat, items):
+        batch_start = time.perf_counter()
+        errors = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def call(item):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await achat(item.message, item.image, item.language, item.ai_model)
+                except Exception as e:
+                    response = f"[ERROR] Error: {str(e)}"
+                return item, response, started, time.perf_counter() - started
+
+        tasks = [asyncio.ensure_future(call(item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, response, started, seconds = await next_done
+                errors += len(item.indexes) if response.startswith('[ERROR]') else 0
+                for line in self._lines(item, response, started, seconds, batch_start):
+                    yield line
+        finally:
+            for task in tasks:
+                task.cancel()
+        yield self._summary(items, errors, batch_start)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'deduplicated': self.deduplicated,
+                'max_items': self.max_items,
+                'concurrency': self.concurrency
+            }
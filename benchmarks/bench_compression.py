@@ -0,0 +1,104 @@
+"""Bytes on the wire and time to deliver index.html and typical answers, with and without compression.
+
+Typical answers are built from the knowledge base corpus (markdown explanations with code, the
+same shape as model answers) at a few sizes. For each encoding this reports the size sent, the
+CPU time to compress, and the estimated time to deliver on a slow and a fast link. Streams are
+measured as SSE events of a few words each, flushed one by one as /chat/stream does. The
+index.html rows compare reading the file per request (the old behaviour) with the in-memory
+precompressed copy and a 304 revalidation:
+
+    python benchmarks/bench_compression.py [--repeat 200] [--chunk 24]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import ResponseCompressor, StaticAsset, encodings  # noqa: E402
+from knowledge_base import parse_corpus  # noqa: E402
+from streaming import sse_event  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Link speeds in bytes per second: a slow mobile connection and home broadband
+LINKS = {'3g': 1.6e6 / 8, 'broadband': 50e6 / 8}
+
+
+def typical_answers():
+    # (name, answer) for short, medium and long answers made of consecutive corpus sections
+    docs = [body for language, _, _, body in parse_corpus() if language == 'java']
+    answers = []
+    for name, count in (('short', 1), ('medium', 3), ('long', 8)):
+        answers.append((name, '\n\n'.join(docs[:count])))
+    return answers
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def deliver_ms(size, cpu):
+    return {link: (cpu + size / speed) * 1000 for link, speed in LINKS.items()}
+
+
+def row(label, size, cpu, original):
+    times = deliver_ms(size, cpu)
+    print(f"  {label:<22} {size:>8} B  {size / original:6.1%}  cpu {cpu * 1000:7.3f} ms  "
+          + '  '.join(f"{link} {ms:7.1f} ms" for link, ms in times.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='runs per measurement')
+    parser.add_argument('--chunk', type=int, default=24, help='characters per streamed chunk')
+    args = parser.parse_args()
+    compressor = ResponseCompressor(min_size=0)
+    offered = [None, *encodings()]
+
+    print('index.html')
+    path = os.path.join(ROOT, 'index.html')
+
+    def read_file():
+        with open(path, 'rb') as f:
+            return f.read()
+
+    body, cpu = timed(read_file, args.repeat)
+    row('read per request', len(body), cpu, len(body))
+    start = time.perf_counter()
+    page = StaticAsset(path, 'text/html; charset=utf-8')
+    print(f"  (precompressing at startup took {(time.perf_counter() - start) * 1000:.1f} ms)")
+    for encoding in offered:
+        (_, sent, headers), cpu = timed(lambda: page.response(encoding or 'identity'), args.repeat)
+        row(f'precompressed {encoding or "identity"}', len(sent), cpu, len(body))
+    etag = dict(page.response('gzip')[2])['ETag']
+    (status, sent, _), cpu = timed(lambda: page.response('gzip', etag), args.repeat)
+    row(f'revalidated ({status})', len(sent), cpu, len(body))
+
+    for name, answer in typical_answers():
+        payload = json.dumps({'response': answer}).encode()
+        print(f"\n/chat {name} answer ({len(answer)} chars)")
+        for encoding in offered:
+            (sent, _), cpu = timed(lambda: compressor.compress(payload, encoding), args.repeat)
+            row(encoding or 'identity', len(sent), cpu, len(payload))
+
+        events = [sse_event({'text': answer[i:i + args.chunk]}).encode() for i in range(0, len(answer), args.chunk)]
+        raw = sum(len(event) for event in events)
+        print(f"/chat/stream {name} answer ({len(events)} events)")
+        row('identity', raw, 0.0, raw)
+        for encoding in offered[1:]:
+            def stream():
+                encoder = compressor.encoder(encoding)
+                return sum(len(encoder.encode(event)) for event in events) + len(encoder.finish())
+
+            sent, cpu = timed(stream, max(1, args.repeat // 10))
+            row(f'{encoding}, flushed per event', sent, cpu, raw)
+
+
+if __name__ == '__main__':
+    main()
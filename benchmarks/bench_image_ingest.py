@@ -0,0 +1,131 @@
+"""Peak memory and time of the legacy vs. the new image ingestion path.
+
+Each path runs in a fresh subprocess so peak RSS is not shared between runs:
+
+    python benchmarks/bench_image_ingest.py [--width 3840 --height 2160 --runs 3]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_screenshot(width, height):
+    # Code text over a noisy photo-like band, so the PNG is as large as a real screenshot
+    from PIL import Image, ImageDraw
+
+    image = Image.effect_noise((width, height), 64).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, height // 2), fill=(30, 30, 46))
+    for y in range(0, height // 2, 18):
+        draw.text((20, y), f"public static void main(String[] args) {{ System.out.println({y}); }}", fill=(220, 220, 220))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def legacy_path(data_url):
+    # What _chat_gemini did before: split copy, b64decode, full-resolution decode,
+    # then the SDK serialises the full image again before upload
+    from PIL import Image
+
+    image_bytes = base64.b64decode(data_url.split(',')[1])
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return len(buffer.getvalue())
+
+
+def ingest_path(data_url):
+    from image_ingest import prepare_image
+
+    return len(prepare_image(data_url)['data'])
+
+
+def _proc_status_mb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    raise OSError(field)
+
+
+def reset_peak_rss():
+    # Linux lets a process reset its high-water mark; elsewhere the peak includes setup
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _proc_status_mb('VmRSS')
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    try:
+        return _proc_status_mb('VmHWM')
+    except OSError:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
+
+
+def run_child(path, payload_file):
+    with open(payload_file) as f:
+        data_url = f.read()
+    import PIL.Image  # noqa: F401  (import cost is not part of the measurement)
+    import image_ingest  # noqa: F401
+
+    baseline = reset_peak_rss()
+    start = time.perf_counter()
+    sent_bytes = (legacy_path if path == 'legacy' else ingest_path)(data_url)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'path': path,
+        'payload_mb': round(len(data_url) / (1024 * 1024), 2),
+        'peak_increase_mb': round(peak_rss_mb() - baseline, 1),
+        'time_ms': round(elapsed * 1000, 1),
+        'sent_kb': round(sent_bytes / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--child', choices=['legacy', 'ingest'], help=argparse.SUPPRESS)
+    parser.add_argument('--payload', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.payload)
+        return
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write(make_screenshot(args.width, args.height))
+    print(f"{'path':<8} {'payload MB':>10} {'peak +MB':>9} {'time ms':>8} {'sent KB':>8}")
+    try:
+        for path in ('legacy', 'ingest'):
+            for _ in range(args.runs):
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', path, '--payload', f.name],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output)
+                print(f"{result['path']:<8} {result['payload_mb']:>10} {result['peak_increase_mb']:>9} "
+                      f"{result['time_ms']:>8} {result['sent_kb']:>8}")
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    main()
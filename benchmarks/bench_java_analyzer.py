@@ -0,0 +1,344 @@
+"""Speed and accuracy of the local Java snippet checks (java_analyzer.py).
+
+Runs every snippet in a small corpus of typical student code, correct and broken, many
+times and reports the time per snippet, which rules fired against the ones expected, and
+how many snippets would be answered locally instead of with a model call:
+
+    python benchmarks/bench_java_analyzer.py [--repeat 2000] [--verbose]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from java_analyzer import analyze  # noqa: E402
+
+# (name, code, rules expected to fire); an empty set means the snippet is fine as far as
+# local checks can tell and would be sent to a model for review
+CORPUS = [
+    ('hello world', '''
+public class Main {
+    public static void main(String[] args) {
+        System.out.println("Hello, World!");
+    }
+}''', set()),
+    ('missing semicolon', '''
+public class Main {
+    public static void main(String[] args) {
+        int x = 5
+        System.out.println(x);
+    }
+}''', {'missing-semicolon'}),
+    ('missing semicolon before brace', '''
+public class Main {
+    public static void main(String[] args) {
+        System.out.println("hi")
+    }
+}''', {'missing-semicolon'}),
+    ('unclosed brace', '''
+public class Main {
+    public static void main(String[] args) {
+        for (int i = 0; i < 3; i++) {
+            System.out.println(i);
+    }
+}''', {'unclosed-bracket'}),
+    ('extra brace', '''
+public class Main {
+    void run() {
+        System.out.println("run");
+    }}
+}''', {'unmatched-bracket'}),
+    ('mismatched paren', '''
+int total = sum(values[0], values[1];
+''', {'unclosed-bracket'}),
+    ('string equality', '''
+String name = scanner.nextLine();
+if (name == "admin") {
+    System.out.println("Welcome");
+}''', {'string-equality'}),
+    ('assignment in condition', '''
+int x = read();
+if (x = 10) {
+    System.out.println("ten");
+}''', {'assignment-in-condition'}),
+    ('empty if body', '''
+if (score > 90);
+{
+    grade = 'A';
+}''', {'empty-body'}),
+    ('empty for body', '''
+for (int i = 0; i < 10; i++);
+    sum += i;
+''', {'empty-body'}),
+    ('do while is fine', '''
+int i = 0;
+do {
+    i++;
+} while (i < 10);
+''', set()),
+    ('lowercase system', '''
+public class Main {
+    public static void main(String[] args) {
+        system.out.println("hi");
+    }
+}''', {'case'}),
+    ('printIn typo', '''
+System.out.printIn("hello");
+''', {'case'}),
+    ('lowercase string type', '''
+string greeting = "hi";
+''', {'case'}),
+    ('main not static', '''
+public class App {
+    public void main(String[] args) {
+        System.out.println("x");
+    }
+}''', {'main-signature'}),
+    ('main without array', '''
+public class App {
+    public static void main(String args) {
+    }
+}''', {'main-signature'}),
+    ('main varargs is fine', '''
+public class App {
+    public static void main(final String... args) {
+    }
+}''', set()),
+    ('main old-style array is fine', '''
+class App {
+    public static void main(String args[]) {
+    }
+}''', set()),
+    ('method outside class', '''
+public class Main {
+}
+
+static void helper() {
+    System.out.println("help");
+}''', {'outside-class'}),
+    ('missing class keyword', '''
+public Main {
+    public static void main(String[] args) {
+    }
+}''', {'missing-class-keyword'}),
+    ('two public classes', '''
+public class A {
+}
+public class B {
+}''', {'multiple-public-types'}),
+    ('method header semicolon', '''
+class Greeter {
+    void greet();
+    {
+        System.out.println("hi");
+    }
+}''', {'semicolon-before-body'}),
+    ('unterminated string', '''
+System.out.println("Hello);
+''', {'unterminated-string'}),
+    ('reversed operator', '''
+if (age => 18) {
+    allow();
+}''', {'reversed-operator'}),
+    ('generics and lambdas', '''
+import java.util.*;
+import java.util.stream.Collectors;
+
+public class Words {
+    public static void main(String[] args) {
+        List<String> words = Arrays.asList("a", "bb", "ccc");
+        Map<Integer, List<String>> byLength = words.stream()
+            .filter(w -> !w.isEmpty())
+            .collect(Collectors.groupingBy(String::length));
+        byLength.forEach((length, group) -> {
+            System.out.println(length + ": " + group);
+        });
+    }
+}''', set()),
+    ('annotations and interface', '''
+@FunctionalInterface
+interface Shape {
+    double area();
+}
+
+class Circle implements Shape {
+    private final double r;
+
+    Circle(double r) {
+        this.r = r;
+    }
+
+    @Override
+    public double area() {
+        return Math.PI * r * r;
+    }
+}''', set()),
+    ('enum with constants', '''
+enum Color {
+    RED,
+    GREEN,
+    BLUE
+}''', set()),
+    ('enum with body', '''
+public enum Planet {
+    MERCURY(3.303e+23, 2.4397e6),
+    EARTH(5.976e+24, 6.37814e6);
+
+    private final double mass;
+    private final double radius;
+
+    Planet(double mass, double radius) {
+        this.mass = mass;
+        this.radius = radius;
+    }
+}''', set()),
+    ('array initializers', '''
+int[] primes = {2, 3, 5, 7};
+int[][] grid = new int[][] {
+    {1, 2},
+    {3, 4}
+};
+String[] names = new String[] {"a", "b"};
+''', set()),
+    ('missing semicolon after initializer', '''
+int[] primes = {2, 3, 5, 7}
+int count = primes.length;
+''', {'missing-semicolon'}),
+    ('braceless if and else', '''
+if (n < 0)
+    n = -n;
+else if (n == 0)
+    n = 1;
+else
+    n = n * 2;
+''', set()),
+    ('switch', '''
+switch (day) {
+    case MONDAY:
+        work();
+        break;
+    case SATURDAY, SUNDAY -> rest();
+    default:
+        sleep();
+}''', set()),
+    ('switch missing break semicolon', '''
+switch (day) {
+    case 1:
+        work();
+        break
+    default:
+        sleep();
+}''', {'missing-semicolon'}),
+    ('try with resources', '''
+try (BufferedReader reader = new BufferedReader(new FileReader(path))) {
+    String line;
+    while ((line = reader.readLine()) != null) {
+        System.out.println(line);
+    }
+} catch (IOException e) {
+    e.printStackTrace();
+} finally {
+    done = true;
+}''', set()),
+    ('anonymous class', '''
+Runnable task = new Runnable() {
+    @Override
+    public void run() {
+        System.out.println("running");
+    }
+};
+new Thread(task).start();
+''', set()),
+    ('multi-line expression', '''
+String message = "Hello, "
+    + name
+    + "!";
+boolean ok = a > 0
+    && b > 0;
+int max = a > b
+    ? a
+    : b;
+''', set()),
+    ('record and text block', '''
+record Point(int x, int y) {
+    String describe() {
+        return """
+            Point at %d, %d
+            """.formatted(x, y);
+    }
+}''', set()),
+    ('generic method', '''
+public static <T extends Comparable<T>>
+T max(List<T> items)
+        throws IllegalArgumentException {
+    return Collections.max(items);
+}''', set()),
+    ('comments', '''
+// A comment with { braces and "quotes"
+/* and a block comment;
+   spanning ( lines */
+int x = 1; // trailing
+''', set()),
+    ('missing return semicolon', '''
+int square(int n) {
+    return n * n
+}''', {'missing-semicolon'}),
+    ('miscased keyword', '''
+Public class Main {
+}''', {'case'}),
+    ('unterminated comment', '''
+int x = 1;
+/* never closed
+int y = 2;
+''', {'unterminated-comment'}),
+    ('logic bug only a review finds', '''
+public class Average {
+    public static double average(int[] values) {
+        int sum = 0;
+        for (int i = 0; i <= values.length; i++) {
+            sum += values[i];
+        }
+        return sum / values.length;
+    }
+}''', set()),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help='analyses per snippet')
+    parser.add_argument('--verbose', action='store_true', help='print the issues found in each snippet')
+    args = parser.parse_args()
+
+    timings = []
+    mismatches = []
+    local = 0
+    for name, code, expected in CORPUS:
+        issues = analyze(code)
+        fired = {issue.rule for issue in issues}
+        if fired != expected:
+            mismatches.append((name, expected, fired))
+        if issues:
+            local += 1
+        if args.verbose:
+            print(f"{name}: {', '.join(str(issue) for issue in issues) or 'no issues'}")
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            analyze(code)
+        timings.append((time.perf_counter() - start) / args.repeat * 1e6)
+
+    timings.sort()
+    print(f"{len(CORPUS)} snippets, {args.repeat} runs each")
+    print(f"  time per snippet  median {statistics.median(timings):.1f} us  max {timings[-1]:.1f} us")
+    print(f"  answered locally {local}/{len(CORPUS)}; the other {len(CORPUS) - local} would go to a model for review")
+    print(f"  rules matching expectations {len(CORPUS) - len(mismatches)}/{len(CORPUS)}")
+    for name, expected, fired in mismatches:
+        print(f"    {name}: expected {sorted(expected) or 'none'}, got {sorted(fired) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
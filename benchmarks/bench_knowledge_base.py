@@ -0,0 +1,120 @@
+"""Startup cost, query latency and answer quality of the offline knowledge base (knowledge_base.py).
+
+Builds the index into a temp directory, times opening it (mmap) against building it in
+memory, then asks a set of typical questions many times each. Questions have the answer
+title they should get, or None when the knowledge base should stay quiet (off-topic), so
+the hit rate and wrong answers are reported along with latency:
+
+    python benchmarks/bench_knowledge_base.py [--repeat 200] [--verbose]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base import INDEX_NAME, KNOWLEDGE_DIR, KnowledgeBase, KnowledgeIndex, build_index, write_index  # noqa: E402
+
+# (question, language, expected answer title or None)
+QUESTIONS = [
+    ('how do I reverse a string', 'python', 'Strings in Python'),
+    ('what is a list comprehension', 'python', 'List comprehensions and generators in Python'),
+    ('how to read a file in python', 'any', 'Reading and writing files in Python'),
+    ('how do dictionaries work', 'python', 'Dictionaries in Python'),
+    ('for loop', 'java', 'Loops in Java: for, while, do-while and for-each'),
+    ('how do I use a HashMap', 'java', 'HashMap and dictionaries in Java'),
+    ('NullPointerException', 'java', 'Exceptions and error handling in Java'),
+    ('how to read user input with Scanner', 'java', 'Reading user input in Java with Scanner'),
+    ('what is polymorphism in java', 'any', 'Inheritance, interfaces and polymorphism in Java'),
+    ('how do promises and async await work', 'javascript', 'Promises and async/await in JavaScript'),
+    ('interfaces vs types in typescript', 'any', 'Interfaces and type aliases in TypeScript'),
+    ('c++ vectors', 'any', 'Vectors and arrays in C++'),
+    ('pointers in c', 'any', 'Pointers in C'),
+    ('goroutines and channels', 'go', 'Goroutines and channels in Go'),
+    ('hashmap in golang', 'any', 'Maps in Go'),
+    ('ownership and borrowing', 'rust', 'Ownership and borrowing in Rust'),
+    ('prepared statements sql injection', 'php', 'Forms, databases and security in PHP'),
+    ('optionals and if let', 'swift', 'Optionals in Swift'),
+    ('null safety', 'kotlin', 'Null safety in Kotlin'),
+    ('what is recursion', 'any', 'Recursion explained'),
+    ('explain big o notation', 'any', 'Big O notation and time complexity'),
+    ('binary search', 'any', 'Binary search'),
+    ('stack vs queue', 'any', 'Stacks and queues'),
+    ('how do I reverse a linked list', 'any', 'Linked lists'),
+    ('tell me a joke', 'any', None),
+    ('who won the world cup', 'any', None),
+    ('how to center a div in css', 'any', None),
+    ('write a poem about cats', 'any', None),
+    ('what is docker', 'any', None),
+    ('explain quantum chromodynamics in python', 'any', None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='searches per question')
+    parser.add_argument('--verbose', action='store_true', help='print what each question matched')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        corpus = os.path.join(workdir, 'knowledge')
+        shutil.copytree(KNOWLEDGE_DIR, corpus, ignore=shutil.ignore_patterns(INDEX_NAME + '*'))
+        index_path = os.path.join(corpus, INDEX_NAME)
+
+        start = time.perf_counter()
+        data = write_index(index_path, corpus)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        KnowledgeIndex(build_index(corpus))
+        memory_ms = (time.perf_counter() - start) * 1000
+        opens = []
+        for _ in range(20):
+            start = time.perf_counter()
+            KnowledgeBase(corpus, index_path).index
+            opens.append((time.perf_counter() - start) * 1000)
+        kb = KnowledgeBase(corpus, index_path)
+        index = kb.index
+
+        timings = []
+        right = wrong = missed = quiet = 0
+        for question, language, expected in QUESTIONS:
+            results = kb.search(question, language, limit=1)
+            title = results[0][1]['title'] if results else None
+            if expected is None:
+                quiet += title is None
+                wrong += title is not None
+            elif title == expected:
+                right += 1
+            elif title is None:
+                missed += 1
+            else:
+                wrong += 1
+            if args.verbose or title != expected:
+                score = f'{results[0][0]:5.2f}' if results else '  -  '
+                print(f"{'ok ' if title == expected else 'BAD'} {score}  [{language}] {question!r} -> {title}")
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                kb.search(question, language, limit=1)
+            timings.append((time.perf_counter() - start) / args.repeat * 1000)
+    finally:
+        shutil.rmtree(workdir)
+
+    timings.sort()
+    answerable = sum(1 for _, _, expected in QUESTIONS if expected is not None)
+    print(f"{index.n_docs} answers, {index.n_terms} terms, index {len(data) / 1024:.0f} KiB")
+    print(f"  build + write {build_ms:.1f} ms, build in memory {memory_ms:.1f} ms, "
+          f"open (mmap) median {statistics.median(opens):.2f} ms")
+    print(f"  query latency median {statistics.median(timings):.3f} ms  "
+          f"p95 {timings[int(len(timings) * 0.95)]:.3f} ms  max {timings[-1]:.3f} ms")
+    print(f"  answered correctly {right}/{answerable}, missed {missed}, wrong answers {wrong}, "
+          f"off-topic left unanswered {quiet}/{len(QUESTIONS) - answerable}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Goodput against a rate-limited provider with and without the provider scheduler.
+
+A local OpenAI-compatible stub allows --ceiling requests per second and answers the
+rest with 429. Closed-loop clients hammer it through MultiAIAssistant, first with
+RATE_LIMITS=off, then with the scheduler shaping traffic to the same ceiling:
+
+    python benchmarks/bench_rate_limit.py [--ceiling 20 --clients 32 --seconds 10]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    ceiling = 20
+    latency = 0.05
+    window = [0, 0]
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        now = int(time.monotonic())
+        with self.lock:
+            if self.window[0] != now:
+                self.window[:] = [now, 0]
+            self.window[1] += 1
+            allowed = self.window[1] <= self.ceiling
+        if allowed:
+            time.sleep(self.latency)
+            self._reply(200, {'choices': [{'message': {'content': 'ok'}}]})
+        else:
+            self._reply(429, {'error': {'message': 'Rate limit reached'}}, {'Retry-After': '1'})
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def run(base_url, enabled, ceiling, clients, seconds):
+    os.environ.update({
+        'GROQ_API_KEY': 'bench', 'GROQ_BASE_URL': base_url, 'HEALTH_PROBE_INTERVAL': '0', 'RESPONSE_CACHE': 'off', 'SEMANTIC_CACHE': 'off',
+        'RATE_LIMITS': 'on' if enabled else 'off', 'GROQ_RPM': str(ceiling * 60), 'GROQ_TPM': '0',
+        'RATE_LIMIT_BURST_SECONDS': '1', 'GROQ_MAX_CONCURRENCY': str(clients), 'PROVIDER_POOL_SIZE': str(clients),
+    })
+    import multi_ai_assistant
+
+    assistant = multi_ai_assistant.MultiAIAssistant()
+    counts = {'ok': 0, 'throttled': 0, 'refused': 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client(worker):
+        request = 0
+        while time.monotonic() < stop_at:
+            request += 1
+            response = assistant._timed_chat('groq', f'question {worker}-{request}', None, 'any')
+            kind = 'ok'
+            if 'API error 429' in response:
+                kind = 'throttled'
+            elif response.startswith('[ERROR]'):
+                kind = 'refused'
+            with lock:
+                counts[kind] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ceiling', type=int, default=20, help='requests per second the stub accepts')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    RateLimitedHandler.ceiling = args.ceiling
+    server = StubServer(('127.0.0.1', 0), RateLimitedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/v1'
+
+    print(f"{'scheduler':<10} {'ok/s':>7} {'429/s':>7} {'refused':>8}")
+    for enabled in (False, True):
+        counts = run(base_url, enabled, args.ceiling, args.clients, args.seconds)
+        print(f"{'on' if enabled else 'off':<10} {counts['ok'] / args.seconds:>7.1f} "
+              f"{counts['throttled'] / args.seconds:>7.1f} {counts['refused']:>8}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
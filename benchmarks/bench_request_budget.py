@@ -0,0 +1,98 @@
+"""Generation time and prompt size per request class, with and without request budgets.
+
+First shows how a set of typical questions is classified and how much of their pasted code is
+trimmed (request_budget.py). Then asks them all through MultiAIAssistant against the local mock
+provider, once with REQUEST_BUDGET=off (2048 tokens for everything) and once with the per-class
+budgets. The mock generates --answer-tokens tokens at --token-delay seconds each unless max_tokens
+stops it first, so with the default of a model that writes until it is cut off the times are the
+worst case each budget allows:
+
+    python benchmarks/bench_request_budget.py [--answer-tokens 2048 --token-delay 0.001 --repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_provider import LatencyDistribution, MockConfig, MockProviderServer  # noqa: E402
+from request_budget import RequestBudgeter  # noqa: E402
+
+STACK_TRACE = 'Exception in thread "main" java.lang.StackOverflowError\n' + '\tat Main.depth(Main.java:7)\n' * 1000
+BIG_FILE = '\n'.join(f'    static int value{i}() {{ return {i}; }}' for i in range(600))
+SNIPPET = 'public class Main {\n    public static void main(String[] args) {\n        String s = null;\n' \
+          '        System.out.println(s.length());\n    }\n}'
+
+# (label, question)
+QUESTIONS = [
+    ('one-line concept', 'what is polymorphism'),
+    ('concept', 'what is the difference between an interface and an abstract class'),
+    ('code generation', 'write a function that reverses a linked list'),
+    ('code generation', 'implement a thread-safe LRU cache'),
+    ('debug, short snippet', f'why does this throw?\n```java\n{SNIPPET}\n```'),
+    ('debug, pasted twice', f'fix this\n```java\n{SNIPPET}\n```\nhere it is again\n```java\n{SNIPPET}\n```'),
+    ('debug, stack trace', f'my recursion crashes\n{STACK_TRACE}'),
+    ('debug, whole file', f'find the bug\n```java\npublic class Values {{\n{BIG_FILE}\n}}\n```'),
+]
+
+
+def show_plans(repeat):
+    budgeter = RequestBudgeter()
+    print(f"{'question':<22} {'class':<8} {'max_tokens':>10} {'chars in':>9} {'sent':>7}  plan time")
+    for label, question in QUESTIONS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            budget = budgeter.plan(question)
+        ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"{label:<22} {budget.kind:<8} {budget.max_tokens:>10} {len(question):>9} {len(budget.text):>7}  {ms:.3f} ms")
+
+
+def run(base_url, enabled, repeat):
+    os.environ.update({
+        'GROQ_API_KEY': 'bench', 'GROQ_BASE_URL': base_url + '/v1', 'HEALTH_PROBE_INTERVAL': '0',
+        'RESPONSE_CACHE': 'off', 'SEMANTIC_CACHE': 'off', 'KNOWLEDGE_BASE': 'off', 'HEDGE_POLICY': 'off',
+        'REQUEST_BUDGET': 'on' if enabled else 'off',
+    })
+    import multi_ai_assistant
+
+    assistant = multi_ai_assistant.MultiAIAssistant()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, question in QUESTIONS:
+            assistant.chat(question, language='java', ai_model='groq')
+    total = time.perf_counter() - start
+    assistant.shutdown()
+    return assistant.get_budget_stats()['classes'], total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--answer-tokens', type=int, default=2048, help='tokens the mock writes when not cut off')
+    parser.add_argument('--token-delay', type=float, default=0.001, help='mock seconds per generated token')
+    parser.add_argument('--repeat', type=int, default=3, help='times each question is asked')
+    args = parser.parse_args()
+
+    show_plans(200)
+
+    config = MockConfig(LatencyDistribution('fixed', 0.05), args.token_delay, args.answer_tokens)
+    server = MockProviderServer(config=config).start()
+    try:
+        before, before_total = run(server.base_url, False, args.repeat)
+        after, after_total = run(server.base_url, True, args.repeat)
+    finally:
+        server.stop()
+
+    print(f"\n{'class':<8} {'max_tokens':>17} {'avg est. tokens':>17} {'avg seconds':>17} {'prompt tokens saved':>20}")
+    for kind, stats in after.items():
+        if not stats['answers']:
+            continue
+        old = before[kind]
+        print(f"{kind:<8} {old['max_tokens']:>7} -> {stats['max_tokens']:<6} "
+              f"{old['avg_completion_tokens']:>7} -> {stats['avg_completion_tokens']:<6} "
+              f"{old['avg_seconds']:>7.3f} -> {stats['avg_seconds']:<6.3f} {stats['prompt_tokens_saved']:>20}")
+    print(f"all questions: {before_total:.2f} s without budgets, {after_total:.2f} s with")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Throughput of the development server against the production serving modes.
+
+Runs benchmarks/load_test.py (open-loop load against the local mock provider) at rising
+request rates for `python app.py` (the dev server the Procfile used to start) and for
+gunicorn with gunicorn.conf.py, then prints achieved throughput, latency and memory:
+
+    python benchmarks/bench_serving.py [--rps 25,50,100,200 --duration 10 --workers 2]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load_test  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rps', default='25,50,100,200', help='comma-separated request rates to step through')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1),
+                        help='gunicorn worker processes for the multi-worker runs')
+    parser.add_argument('--latency', default='lognormal:0.4,0.5', help='mock provider latency distribution')
+    parser.add_argument('--servers', default='dev,gunicorn,gunicorn-multi,gunicorn-asgi')
+    args = parser.parse_args()
+
+    modes = {
+        'dev': ('dev', 1),
+        'gunicorn': ('gunicorn', 1),
+        'gunicorn-multi': ('gunicorn', args.workers),
+        'gunicorn-asgi': ('gunicorn-asgi', args.workers),
+    }
+    print(f"{'server':<22} {'target':>7} {'achieved':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>9} {'peak MB':>8}")
+    for name in args.servers.split(','):
+        server, workers = modes[name]
+        for rps in args.rps.split(','):
+            test_args = load_test.build_parser().parse_args([
+                '--server', server, '--workers', str(workers), '--rps', rps,
+                '--duration', str(args.duration), '--latency', args.latency
+            ])
+            summary = load_test.run_test(test_args)
+            label = f"{name} ({workers}w)" if server != 'dev' else name
+            print(f"{label:<22} {float(rps):>7g} {summary['throughput_rps']:>9} {summary['errors']:>7} "
+                  f"{summary['p50_ms']:>8} {summary['p99_ms']:>9} {summary['rss_peak_mb']:>8}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Cold-start cost of the Flask app: import time plus time to the first answered request.
+
+Each run is a fresh interpreter. The first request goes to a local OpenAI-compatible
+stub so only our own startup work is measured. Exits non-zero when the median of
+either number exceeds its budget, so it can gate regressions in CI:
+
+    python benchmarks/bench_startup.py [--runs 5 --max-import-ms 600 --max-first-response-ms 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('google.generativeai', 'PIL.Image', 'httpx')
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'choices': [{'message': {'content': 'public class Main {}'}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_child():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CompletionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sys.path.insert(0, ROOT)
+    os.environ['GROQ_BASE_URL'] = f'http://127.0.0.1:{server.server_port}/v1'
+
+    start = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - start) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    client = app.app.test_client()
+    start = time.perf_counter()
+    response = client.post('/chat', json={'message': 'Write a Java class', 'language': 'java', 'ai_model': 'groq'})
+    first_response_ms = (time.perf_counter() - start) * 1000
+    answer = response.get_json()['response']
+    server.shutdown()
+    print(json.dumps({
+        'import_ms': round(import_ms, 1),
+        'first_response_ms': round(first_response_ms, 1),
+        'heavy_modules_at_import': loaded,
+        'ok': not answer.startswith('[ERROR]'),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=600)
+    parser.add_argument('--max-first-response-ms', type=float, default=300)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    env = dict(os.environ, GEMINI_API_KEY='bench', GROQ_API_KEY='bench', HEALTH_PROBE_INTERVAL='0',
+               RESPONSE_CACHE='memory', PYTHONWARNINGS='ignore')
+    results = []
+    print(f"{'run':<4} {'import ms':>10} {'first ms':>9}  heavy modules loaded at import")
+    for run in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--child'], env=env, cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if not result['ok']:
+            sys.exit("first request did not get an answer from the stub provider")
+        results.append(result)
+        print(f"{run + 1:<4} {result['import_ms']:>10} {result['first_response_ms']:>9}  "
+              f"{', '.join(result['heavy_modules_at_import']) or '-'}")
+
+    import_ms = statistics.median(r['import_ms'] for r in results)
+    first_ms = statistics.median(r['first_response_ms'] for r in results)
+    print(f"median import {import_ms:.1f} ms (budget {args.max_import_ms:.0f}), "
+          f"first response {first_ms:.1f} ms (budget {args.max_first_response_ms:.0f})")
+    if import_ms > args.max_import_ms or first_ms > args.max_first_response_ms:
+        sys.exit("startup regression: over budget")
+
+
+if __name__ == '__main__':
+    main()
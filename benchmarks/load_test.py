@@ -0,0 +1,293 @@
+"""Open-loop load test of /chat (or /chat/stream) against the local mock provider.
+
+Starts mock_provider.py and the app (Flask or ASGI) as subprocesses, fires requests on
+a fixed schedule (--rps) regardless of how fast answers come back, and reports latency
+percentiles, throughput and the server's resident memory. No API quota is used:
+
+    python benchmarks/load_test.py --server flask --rps 20 --duration 20
+    python benchmarks/load_test.py --server asgi --rps 50 --stream --latency fixed:0.3 --json
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_provider import provider_env  # noqa: E402
+from provider_stats import percentile  # noqa: E402
+
+SERVER_COMMANDS = {
+    # Flask's threaded development server without the debugger/reloader
+    'flask': lambda port: [sys.executable, '-c', f"from app import app; app.run(port={port}, threaded=True)"],
+    # Exactly what `python app.py` runs (debug mode, reloader child process)
+    'dev': lambda port: [sys.executable, 'app.py'],
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning'],
+    # Production entry point, configured by gunicorn.conf.py (WEB_CONCURRENCY, GUNICORN_THREADS)
+    'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn'],
+    'gunicorn-asgi': lambda port: [sys.executable, '-m', 'gunicorn'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def _process_tree(pid):
+    pids = [pid]
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                for child in f.read().split():
+                    pids.extend(_process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def rss_mb(pid, field='VmRSS'):
+    # Summed over the server's process tree (gunicorn workers, the dev server's reloader child)
+    total = None
+    for member in _process_tree(pid):
+        try:
+            with open(f'/proc/{member}/status') as f:
+                for line in f:
+                    if line.startswith(field + ':'):
+                        total = (total or 0) + int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return total
+
+
+def stop_tree(process):
+    # Children first, so a reloader or gunicorn master can't respawn them
+    for pid in reversed(_process_tree(process.pid)):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+    process.wait()
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            value = rss_mb(self.pid)
+            if value is not None:
+                self.samples.append(value)
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def make_prompts(count, repeat_ratio):
+    # A repeat_ratio share of requests reuse a small pool of questions, to exercise the caches
+    pool = [f"How do I reverse a linked list? (variant {i})" for i in range(10)]
+    prompts = []
+    for i in range(count):
+        if repeat_ratio and (i * 7919 % 1000) / 1000 < repeat_ratio:
+            prompts.append(pool[i % len(pool)])
+        else:
+            prompts.append(f"Explain Java generics with example #{i}")
+    return prompts
+
+
+def fire(session_for, url, payload, scheduled, stream):
+    # Latency is measured from the scheduled start, so client-side queueing is not hidden
+    result = {'scheduled': scheduled, 'ok': False, 'ttfb': None}
+    try:
+        with session_for().post(url, json=payload, stream=stream, timeout=120) as response:
+            if stream:
+                body = b''
+                for chunk in response.iter_content(chunk_size=None):
+                    if result['ttfb'] is None:
+                        result['ttfb'] = time.monotonic() - scheduled
+                    body += chunk
+                text = body.decode('utf-8', 'replace')
+                result['ok'] = response.status_code == 200 and '[ERROR]' not in text
+            else:
+                answer = response.json().get('response', '')
+                result['ok'] = response.status_code == 200 and not answer.startswith('[ERROR]')
+    except requests.RequestException:
+        pass
+    result['latency'] = time.monotonic() - scheduled
+    return result
+
+
+def run_load(base_url, rps, duration, warmup, stream, repeat_ratio, max_in_flight):
+    url = base_url + ('/chat/stream' if stream else '/chat')
+    total = int(rps * (duration + warmup))
+    prompts = make_prompts(total, repeat_ratio)
+    local = threading.local()
+
+    def session_for():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    futures = []
+    start = time.monotonic() + 0.5
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for i, prompt in enumerate(prompts):
+            scheduled = start + i / rps
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            payload = {'message': prompt, 'language': 'java', 'ai_model': 'auto'}
+            futures.append(pool.submit(fire, session_for, url, payload, scheduled, stream))
+        results = [future.result() for future in futures]
+    measured = [r for r in results if r['scheduled'] >= start + warmup]
+    return measured, duration
+
+
+def summarize(results, window):
+    # Throughput is over the time the answers actually took to arrive, so a server that falls
+    # behind shows a lower rate instead of catching up after the measured window
+    if results:
+        window = max(window, max(r['scheduled'] + r['latency'] for r in results) - min(r['scheduled'] for r in results))
+    latencies = sorted(r['latency'] for r in results)
+    ttfbs = sorted(r['ttfb'] for r in results if r['ttfb'] is not None)
+    ok = sum(1 for r in results if r['ok'])
+
+    def ms(values, fraction):
+        value = percentile(values, fraction)
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'requests': len(results),
+        'ok': ok,
+        'errors': len(results) - ok,
+        'throughput_rps': round(ok / window, 1),
+        'p50_ms': ms(latencies, 0.5),
+        'p95_ms': ms(latencies, 0.95),
+        'p99_ms': ms(latencies, 0.99),
+        'max_ms': ms(latencies, 1.0),
+        'ttfb_p50_ms': ms(ttfbs, 0.5),
+        'ttfb_p99_ms': ms(ttfbs, 0.99),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='flask')
+    parser.add_argument('--workers', type=int, default=1, help='WEB_CONCURRENCY for the gunicorn servers')
+    parser.add_argument('--threads', type=int, help='GUNICORN_THREADS for --server gunicorn')
+    parser.add_argument('--rps', type=float, default=20)
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds, after the warm-up')
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--stream', action='store_true', help='load /chat/stream instead of /chat')
+    parser.add_argument(
+        '--providers', default='groq,deepseek',
+        help='comma-separated providers to point at the mock; two or more exercise auto-mode hedging'
+    )
+    parser.add_argument('--latency', default='lognormal:0.4,0.5', help='mock provider latency distribution')
+    parser.add_argument('--token-delay', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--repeat-ratio', type=float, default=0.0, help='share of requests repeating earlier questions')
+    parser.add_argument('--max-in-flight', type=int, default=512)
+    parser.add_argument('--keep-rate-limits', action='store_true', help='keep the free-tier provider rate limits')
+    parser.add_argument('--json', action='store_true', help='print one JSON object instead of a table')
+    return parser
+
+
+def run_test(args):
+    mock_port, app_port = free_port(), free_port()
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'mock_provider.py'), '--port', str(mock_port), '--latency', args.latency,
+        '--token-delay', str(args.token_delay), '--error-rate', str(args.error_rate),
+        '--throttle-rate', str(args.throttle_rate), '--seed', '1'
+    ], stdout=subprocess.DEVNULL)
+    env = {name: value for name, value in os.environ.items() if not name.endswith('_API_KEY')}
+    env.update(provider_env(f'http://127.0.0.1:{mock_port}', args.providers.split(',')))
+    env.update(
+        HEALTH_PROBE_INTERVAL='0', PYTHONWARNINGS='ignore', PROVIDER_POOL_SIZE=str(args.max_in_flight),
+        PORT=str(app_port), WEB_CONCURRENCY=str(args.workers),
+        SERVER_MODE='asgi' if args.server == 'gunicorn-asgi' else 'wsgi'
+    )
+    if args.threads:
+        env['GUNICORN_THREADS'] = str(args.threads)
+    if not args.keep_rate_limits:
+        env['RATE_LIMITS'] = 'off'
+    server = subprocess.Popen(
+        SERVER_COMMANDS[args.server](app_port), cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{app_port}'
+    try:
+        wait_until_up(f'http://127.0.0.1:{mock_port}/health', mock)
+        wait_until_up(base_url + '/status', server)
+        sampler = MemorySampler(server.pid)
+        rss_start = rss_mb(server.pid)
+        sampler.start()
+        results, window = run_load(
+            base_url, args.rps, args.duration, args.warmup, args.stream, args.repeat_ratio, args.max_in_flight
+        )
+        sampler.stop()
+        summary = summarize(results, window)
+        summary.update({
+            'server': args.server,
+            'endpoint': '/chat/stream' if args.stream else '/chat',
+            'target_rps': args.rps,
+            'rss_start_mb': round(rss_start, 1) if rss_start else None,
+            'rss_peak_mb': round(max(sampler.samples), 1) if sampler.samples else None,
+        })
+    finally:
+        stop_tree(server)
+        mock.terminate()
+        mock.wait()
+    return summary
+
+
+def main():
+    args = build_parser().parse_args()
+    summary = run_test(args)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['server']} {summary['endpoint']} at {args.rps:g} req/s for {args.duration:g}s "
+          f"(mock latency {args.latency}, errors {args.error_rate}, 429s {args.throttle_rate})")
+    print(f"  requests {summary['requests']}  ok {summary['ok']}  errors {summary['errors']}  "
+          f"throughput {summary['throughput_rps']} req/s")
+    print(f"  latency ms  p50 {summary['p50_ms']}  p95 {summary['p95_ms']}  p99 {summary['p99_ms']}  "
+          f"max {summary['max_ms']}")
+    if args.stream:
+        print(f"  first byte ms  p50 {summary['ttfb_p50_ms']}  p99 {summary['ttfb_p99_ms']}")
+    print(f"  server RSS MB  start {summary['rss_start_mb']}  peak {summary['rss_peak_mb']}")
+
+
+if __name__ == '__main__':
+    main()
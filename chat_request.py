@@ -0,0 +1,25 @@
+# Field checks shared by the /chat and /chat/stream readers in app.py and asgi.py, so a malformed
+# body is a 400 in both servers instead of an exception deep in the cache or prompt code
+
+
+class ChatRequestError(ValueError):
+    pass
+
+
+TEXT_FIELDS = (('message', ''), ('language', 'any'), ('ai_model', 'auto'), ('session_id', None))
+
+
+def chat_params(data, image_data):
+    # (message, image_data, language, ai_model, session_id) from a parsed body or form
+    if not isinstance(data, dict):
+        raise ChatRequestError("Expected a JSON object")
+    params = []
+    for name, default in TEXT_FIELDS:
+        value = data.get(name)
+        if value is not None and not isinstance(value, str):
+            raise ChatRequestError(f"'{name}' must be a string")
+        params.append(default if value is None else value)
+    if image_data is not None and not isinstance(image_data, (str, bytes, bytearray)):
+        raise ChatRequestError("'image' must be a data URL string")
+    message, language, ai_model, session_id = params
+    return message, image_data, language, ai_model, session_id
@@ -0,0 +1,233 @@
+# Response compression for both servers (app.py and asgi.py).
+#
+# index.html is read and compressed once, at startup, in every encoding we offer, and served with a
+# strong ETag so a browser revalidating gets a 304 with no body. Answers are compressed per response
+# when the client accepts it and they are big enough to gain from it; streams are compressed with a
+# flush after every event so text still reaches the browser as soon as it is generated.
+# Brotli is used when the optional brotli package is installed, gzip otherwise.
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+
+from lazy_imports import optional_import
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript')
+
+
+def _brotli():
+    return optional_import('brotli')
+
+
+def encodings():
+    # Ours in preference order, for clients that accept both equally
+    return ('br', 'gzip') if _brotli() else ('gzip',)
+
+
+def _accepted(accept_encoding):
+    # {coding: q} from an Accept-Encoding header
+    codings = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.partition(';')
+        name, params = name.strip(), params.strip()
+        if not name:
+            continue
+        q = 1.0
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name] = q
+    return codings
+
+
+def negotiate(accept_encoding, offered=None):
+    # The best encoding both sides support, or None for identity
+    codings = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in offered or encodings():
+        q = codings.get(encoding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body, encoding, level=None):
+    if encoding == 'br':
+        return _brotli().compress(body, quality=11 if level is None else level)
+    return gzip.compress(body, 9 if level is None else level, mtime=0)
+
+
+def compressible(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+
+def _etag_matches(if_none_match, etag):
+    # Weak comparison, as If-None-Match requires
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class StaticAsset:
+    # One file held in memory with its precompressed variants. Each variant has its own strong ETag,
+    # since the bytes differ. A stat per request notices when the file is edited and reloads it.
+    def __init__(self, path, content_type, max_age=0):
+        self.path = path
+        self.content_type = content_type
+        # Files without a content hash in their name must be revalidated, which is a 304 when unchanged
+        self.cache_control = f'public, max-age={max_age}' if max_age else 'no-cache'
+        self._stamp = None
+        self._variants = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            with open(self.path, 'rb') as f:
+                body = f.read()
+            tag = hashlib.sha256(body).hexdigest()[:24]
+            variants = {None: (body, f'"{tag}"')}
+            for encoding in encodings():
+                compressed = compress(body, encoding)
+                if len(compressed) < len(body):
+                    variants[encoding] = (compressed, f'"{tag}-{encoding}"')
+            self._variants, self._stamp = variants, stamp
+
+    def sizes(self):
+        return {encoding or 'identity': len(body) for encoding, (body, _) in self._variants.items()}
+
+    def response(self, accept_encoding=None, if_none_match=None):
+        # (status, body, headers); headers leave out Content-Type and Content-Length
+        self._load()
+        variants = self._variants
+        encoding = negotiate(accept_encoding, [encoding for encoding in variants if encoding])
+        body, etag = variants[encoding]
+        headers = [('ETag', etag), ('Cache-Control', self.cache_control), ('Vary', 'Accept-Encoding')]
+        if _etag_matches(if_none_match, etag):
+            return 304, b'', headers
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return 200, body, headers
+
+
+class StreamEncoder:
+    # Compresses a response piece by piece, flushing after each so nothing waits in the buffer
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = _brotli().Compressor(quality=level)
+        else:
+            # wbits 31: zlib with a gzip header and trailer
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encode(self, data):
+        self.bytes_in += len(data)
+        if self.encoding == 'br':
+            out = self._compressor.process(data) + self._compressor.flush()
+        else:
+            out = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.bytes_out += len(out)
+        return out
+
+    def finish(self):
+        out = self._compressor.finish() if self.encoding == 'br' else self._compressor.flush()
+        self.bytes_out += len(out)
+        return out
+
+
+class ResponseCompressor:
+    def __init__(self, enabled=True, min_size=1400, level=6, brotli_quality=4):
+        # Answers are compressed on the request path, so these levels trade a little ratio for speed
+        self.enabled = enabled
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get('COMPRESSION', 'on').lower() not in ('off', 'false', '0'),
+            min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1400))
+        )
+
+    def negotiate(self, accept_encoding, content_type, stream=False):
+        if not self.enabled or not compressible(content_type):
+            return None
+        if stream:
+            # Flushed after every small event, brotli saves less than gzip (bench_compression.py)
+            return negotiate(accept_encoding, sorted(encodings(), key=lambda encoding: encoding != 'gzip'))
+        return negotiate(accept_encoding)
+
+    def _level(self, encoding):
+        return self.brotli_quality if encoding == 'br' else self.level
+
+    def compress(self, body, encoding):
+        # (body, encoding actually used); bodies under min_size (about one packet) are left alone
+        if encoding is None:
+            return body, None
+        if len(body) < self.min_size:
+            self._record(len(body), len(body), False)
+            return body, None
+        compressed = compress(body, encoding, self._level(encoding))
+        self._record(len(body), len(compressed), True)
+        return compressed, encoding
+
+    def encoder(self, encoding):
+        return StreamEncoder(encoding, self._level(encoding))
+
+    def stream(self, chunks, encoding):
+        # Streams are compressed whatever their size: it isn't known when the headers go out
+        encoder = self.encoder(encoding)
+        try:
+            for chunk in chunks:
+                yield encoder.encode(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield encoder.finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+            self._record(encoder.bytes_in, encoder.bytes_out, True)
+
+    def finish_stream(self, encoder):
+        out = encoder.finish()
+        self._record(encoder.bytes_in, encoder.bytes_out, True)
+        return out
+
+    def _record(self, size_in, size_out, compressed):
+        with self._lock:
+            self.responses += 1
+            self.compressed += compressed
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'encodings': list(encodings()),
+                'min_size': self.min_size,
+                'responses': self.responses,
+                'compressed': self.compressed,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None
+            }
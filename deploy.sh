@@ -1,7 +1,8 @@
 #!/bin/bash
 
 # Package Lambda function
-zip -r function.zip lambda_handler.py java_learning_assistant.py
+# Code checks need only the standard library; AI answers also need requirements.txt (e.g. as a layer)
+zip -r function.zip *.py knowledge/*.md
 
 # Deploy to AWS Lambda (replace with your function name)
 aws lambda update-function-code \
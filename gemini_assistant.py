@@ -2,15 +2,7 @@ import os
 import base64
 import io
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
+from lazy_imports import is_installed, optional_import
 
 class GeminiJavaAssistant:
     def __init__(self):
@@ -20,11 +12,18 @@ class GeminiJavaAssistant:
         self._initialize_gemini()
     
     def _initialize_gemini(self):
-        if not self.api_key or genai is None:
+        # The SDK is imported when the first question arrives, not at startup
+        if not self.api_key or not is_installed('google.generativeai'):
             print("⚠️ Gemini not available")
             return
-            
+        self.use_gemini = True
+        print("✅ Gemini AI ready")
+    
+    def _get_model(self):
+        if self.model is not None:
+            return self.model
         try:
+            genai = optional_import('google.generativeai')
             genai.configure(api_key=self.api_key)
             generation_config = {
                 'temperature': 0.7,
@@ -33,17 +32,16 @@ class GeminiJavaAssistant:
                 'max_output_tokens': 2048,
             }
             self.model = genai.GenerativeModel('gemini-2.5-flash', generation_config=generation_config)
-            self.use_gemini = True
-            print("✅ Gemini AI ready")
         except Exception as e:
             print(f"⚠️ Gemini failed: {e}")
             self.use_gemini = False
+        return self.model
 
     def chat(self, user_input, image_data=None, language="any"):
         if not user_input and not image_data:
             return "Please provide a question or upload an image."
         
-        if not self.use_gemini:
+        if not self.use_gemini or self._get_model() is None:
             return "❌ Gemini AI not available. Please check API key and internet connection."
         
         try:
@@ -55,6 +53,7 @@ class GeminiJavaAssistant:
             return f"❌ Error: {str(e)}"
     
     def _analyze_image(self, user_input, image_data, language="any"):
+        Image = optional_import('PIL.Image')
         if Image is None:
             return "📷 Image analysis requires Pillow library."
         
@@ -0,0 +1,65 @@
+# Production server settings, read automatically by `gunicorn` when started from this directory:
+#
+#   gunicorn                     # Flask app (app.py) on threaded workers
+#   SERVER_MODE=asgi gunicorn    # asgi.py on uvicorn workers, one event loop per process
+#
+# `python app.py` remains the development server (debugger and reloader on).
+import os
+import sys
+
+from lazy_imports import is_installed
+
+mode = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+# Processes. Sessions, caches and health probes live in each process, so a follow-up question can
+# land on a worker that hasn't seen the conversation; use RESPONSE_CACHE=sqlite to share answers.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+if mode == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn_worker.UvicornWorker' if is_installed('uvicorn_worker') else 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'app:app'
+    # Requests mostly wait on AI providers, so each process serves many at once on threads
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 64))
+
+# Each worker builds its own MultiAIAssistant after the fork: thread pools, health probe threads
+# and connection pools must not be shared between processes
+preload_app = False
+
+# On SIGTERM workers stop accepting connections and get graceful_timeout seconds to finish the
+# requests they hold, including provider calls up to PROVIDER_READ_TIMEOUT (30s by default)
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 35))
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+# Recycle workers after this many requests (0 = never), with jitter so they don't restart together
+max_requests = int(os.environ.get('MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('ACCESS_LOG') or None
+errorlog = '-'
+
+# Every worker enforces 1/workers of each provider's rate limits, so together they stay
+# within what the shared API keys allow
+os.environ.setdefault('RATE_LIMIT_WORKERS', str(workers))
+
+
+def _assistant():
+    module = sys.modules.get(wsgi_app.split(':')[0])
+    return getattr(module, 'assistant', None)
+
+
+def post_worker_init(worker):
+    # The app is loaded by now; pay one-time setup before the worker takes its first request
+    assistant = _assistant()
+    if assistant is not None:
+        assistant.warm_up(asynchronous=mode == 'asgi')
+        worker.log.info("Worker %s warmed up (%s)", worker.pid, assistant.get_status())
+
+
+def worker_exit(server, worker):
+    assistant = _assistant()
+    if assistant is not None:
+        assistant.shutdown()
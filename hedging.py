@@ -0,0 +1,72 @@
+import os
+import threading
+
+# Rough list prices in USD per 1K generated tokens, used only to cap hedging spend
+PROVIDER_COST_PER_1K_TOKENS = {
+    'gemini': 0.0025,
+    'groq': 0.0008,
+    'cohere': 0.002,
+    'huggingface': 0.0,
+    'deepseek': 0.0011,
+    'openai': 0.0006,
+    'perplexity': 0.0002
+}
+
+
+class HedgePolicy:
+    def __init__(self, enabled=True, delay=4.0, max_providers=2, cost_cap=0.01):
+        self.enabled = enabled
+        self.delay = delay
+        self.max_providers = max_providers
+        self.cost_cap = cost_cap
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get('HEDGE_POLICY', 'race').lower() == 'race',
+            delay=float(os.environ.get('HEDGE_DELAY', 4)),
+            max_providers=int(os.environ.get('HEDGE_MAX_PROVIDERS', 2)),
+            cost_cap=float(os.environ.get('HEDGE_COST_CAP', 0.01)),
+        )
+
+    def estimated_cost(self, provider, max_tokens):
+        return PROVIDER_COST_PER_1K_TOKENS.get(provider, 0.0) * max_tokens / 1000
+
+    def plan(self, candidates, max_tokens):
+        # The primary always runs; backups are added while they fit the per-request cost cap
+        if not candidates:
+            return []
+        if not self.enabled:
+            return candidates[:1]
+        planned = [candidates[0]]
+        spent = self.estimated_cost(candidates[0], max_tokens)
+        for provider in candidates[1:]:
+            if len(planned) >= self.max_providers:
+                break
+            cost = self.estimated_cost(provider, max_tokens)
+            if spent + cost > self.cost_cap:
+                continue
+            planned.append(provider)
+            spent += cost
+        return planned
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedged += 1
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'delay': self.delay,
+            'max_providers': self.max_providers,
+            'cost_cap': self.cost_cap,
+            'hedged_requests': self.hedged,
+            'hedge_wins': self.hedge_wins
+        }
@@ -0,0 +1,179 @@
+import binascii
+import hashlib
+import io
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from lazy_imports import is_installed, optional_import
+
+MAX_IMAGE_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', 1568))
+MAX_IMAGE_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 40_000_000))
+JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+
+# Multiple of 4 so each slice decodes to whole bytes
+BASE64_CHUNK_CHARS = 1 << 20
+
+
+class ImageIngestError(ValueError):
+    pass
+
+
+def images_supported():
+    return is_installed('PIL')
+
+
+def _pil():
+    # Pillow is imported on the first image request, not at startup
+    if not images_supported():
+        raise ImageIngestError("Image analysis requires the Pillow library.")
+    return optional_import('PIL.Image')
+
+
+def preload_pillow():
+    # Server workers import Pillow before taking traffic instead of on the first upload
+    if images_supported():
+        _pil()
+
+
+def _is_data_url(data):
+    prefix = b'data:' if isinstance(data, (bytes, bytearray)) else 'data:'
+    return data[:5] == prefix
+
+
+def _base64_start(data):
+    # Skip a "data:image/png;base64," header if present; the header is always short
+    comma = data.find(b',' if isinstance(data, (bytes, bytearray)) else ',', 0, 256)
+    return comma + 1
+
+
+def decode_base64(data):
+    # Decode in slices into one anonymous mapping sized from the base64 length, instead of
+    # split(',') + b64decode copies of the payload; load_image() releases it right after decoding
+    start = _base64_start(data)
+    size = (len(data) - start) * 3 // 4
+    if size <= 0:
+        raise ImageIngestError("Empty image data.")
+    view = memoryview(data) if isinstance(data, (bytes, bytearray)) else data
+    buffer = mmap.mmap(-1, size)
+    try:
+        for offset in range(start, len(data), BASE64_CHUNK_CHARS):
+            buffer.write(binascii.a2b_base64(view[offset:offset + BASE64_CHUNK_CHARS]))
+    except (binascii.Error, ValueError) as e:
+        buffer.close()
+        raise ImageIngestError(f"Invalid base64 image data: {e}")
+    buffer.seek(0)
+    return buffer
+
+
+def open_source(source):
+    # Accepts a data URL / base64 string, raw image bytes, or a binary file-like object
+    if isinstance(source, str) or (isinstance(source, (bytes, bytearray)) and _is_data_url(source)):
+        return decode_base64(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def load_image(source, max_edge=None):
+    Image = _pil()
+    max_edge = max_edge or MAX_IMAGE_EDGE
+    source = open_source(source)
+    try:
+        image = Image.open(source)
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise ImageIngestError(f"Image is too large ({image.width}x{image.height}).")
+        # JPEG can decode straight to a reduced scale; other formats decode at full size
+        image.draft('RGB', (max_edge, max_edge))
+        image.load()
+    except ImageIngestError:
+        raise
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Pillow's messages name internal objects ("<_io.BytesIO object at 0x...>"), so they stay in the log
+        raise ImageIngestError("Unsupported image.")
+    finally:
+        if isinstance(source, mmap.mmap):
+            source.close()
+
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    # Integer box reduction first so thumbnail() resamples a small image, not the full decode
+    factor = max(image.size) // max_edge
+    if factor >= 2:
+        image = image.reduce(factor)
+    image.thumbnail((max_edge, max_edge))
+    return image
+
+
+def encode_image(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return {'mime_type': 'image/jpeg', 'data': buffer.getvalue()}
+
+
+def prepare_image(source, max_edge=None):
+    return encode_image(load_image(source, max_edge))
+
+
+def image_digest(source):
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        for offset in range(0, len(source), BASE64_CHUNK_CHARS):
+            digest.update(source[offset:offset + BASE64_CHUNK_CHARS].encode('ascii', 'replace'))
+    else:
+        digest.update(source)
+    return digest.hexdigest()
+
+
+class PreparedImage:
+    __slots__ = ('digest', 'blob')
+
+    def __init__(self, digest, blob):
+        self.digest = digest
+        self.blob = blob
+
+
+class ImageStore:
+    # Small LRU of downscaled, re-encoded uploads keyed by the upload's byte hash, so
+    # follow-up questions about the same image skip the decode
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.environ.get('IMAGE_CACHE_SIZE', 32)))
+
+    def get(self, source, digest=None):
+        digest = digest or image_digest(source)
+        with self._lock:
+            image = self._entries.get(digest)
+            if image is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        decoded = load_image(source)
+        image = PreparedImage(digest, encode_image(decoded))
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[digest] = image
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return image
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(len(image.blob['data']) for image in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
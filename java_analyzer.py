@@ -0,0 +1,481 @@
+import re
+
+# Local checks for Java snippets: a tokenizer plus rules for the mistakes beginners make most
+# (unbalanced brackets, missing semicolons, == on strings, a malformed main). No model call
+# and no compiler, so an obvious problem is reported in microseconds; a snippet that passes
+# may still be wrong in ways only a review can tell.
+
+_TOKEN = re.compile(r'''
+    (?P<space>[ \t\f\r\n]+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<open_comment>/\*)
+  | (?P<textblock>""".*?""")
+  | (?P<string>"(?:[^"\\\n]|\\.)*")
+  | (?P<open_string>"[^\n]*)
+  | (?P<char>'(?:[^'\\\n]|\\.)+')
+  | (?P<number>\d[\w.]*|\.\d\w*)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<op>\.\.\.|->|::|\+\+|--|&&|\|\||[=!<>+\-*/%&|^]=|[{}()\[\];,.@=<>!~?:+\-*/&|^%])
+  | (?P<other>.)
+''', re.S | re.X)
+
+KEYWORDS = frozenset('''
+    abstract assert boolean break byte case catch char class const continue default do double else enum
+    extends final finally float for goto if implements import instanceof int interface long native new
+    package private protected public return short static strictfp super switch synchronized this throw
+    throws transient try void volatile while true false null
+'''.split())
+
+MODIFIERS = frozenset(('public', 'private', 'protected', 'static', 'final', 'abstract', 'sealed', 'strictfp',
+                       'synchronized', 'native', 'transient', 'volatile', 'default'))
+CONTROL_KEYWORDS = frozenset(('if', 'for', 'while', 'switch', 'catch', 'synchronized'))
+# A line starting with one of these continues the previous one rather than starting a statement
+CONTINUATION_KEYWORDS = frozenset(('extends', 'implements', 'throws', 'instanceof', 'permits'))
+# Tokens a complete statement can end with, before its ';'
+VALUE_KEYWORDS = frozenset(('this', 'super', 'null', 'true', 'false', 'break', 'continue'))
+CLOSING = {')': '(', ']': '[', '}': '{'}
+MISCASED_KEYWORDS = {'Public': 'public', 'Private': 'private', 'Protected': 'protected', 'Static': 'static',
+                     'Int': 'int', 'Return': 'return'}
+
+
+class Token:
+    __slots__ = ('kind', 'text', 'line', 'start', 'end', 'line_start')
+
+    def __init__(self, kind, text, line, start, end, line_start):
+        self.kind = kind
+        self.text = text
+        self.line = line
+        self.start = start
+        self.end = end
+        # First token on its line
+        self.line_start = line_start
+
+    @property
+    def is_literal(self):
+        return self.kind in ('string', 'textblock', 'char', 'number')
+
+    def ends_statement(self):
+        # Could this token be the last one of a statement that is missing its ';'?
+        if self.kind == 'name':
+            return self.text not in KEYWORDS or self.text in VALUE_KEYWORDS
+        return self.is_literal or self.kind == 'initializer' or self.text in (')', ']', '++', '--')
+
+    def starts_statement(self):
+        return self.kind == 'name' and self.text not in CONTINUATION_KEYWORDS
+
+
+class Issue:
+    __slots__ = ('line', 'rule', 'message')
+
+    def __init__(self, line, rule, message):
+        self.line = line
+        self.rule = rule
+        self.message = message
+
+    def __str__(self):
+        return f"Line {self.line}: {self.message}"
+
+    def __repr__(self):
+        return f"Issue({self.line}, {self.rule!r})"
+
+
+def tokenize(code):
+    # Returns (tokens, issues); comments and whitespace are dropped, unterminated literals reported
+    tokens = []
+    issues = []
+    line = 1
+    line_start = True
+    for match in _TOKEN.finditer(code):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'space' or kind == 'comment':
+            newlines = text.count('\n')
+            line += newlines
+            line_start = line_start or newlines > 0
+            continue
+        if kind == 'open_comment':
+            issues.append(Issue(line, 'unterminated-comment', "'/*' comment is never closed with '*/'"))
+            break
+        if kind == 'open_string':
+            issues.append(Issue(line, 'unterminated-string', "String literal is missing its closing '\"'"))
+            kind, text = 'string', text + '"'
+        tokens.append(Token(kind, text, line, match.start(), match.end(), line_start))
+        line += text.count('\n')
+        line_start = False
+    return tokens, issues
+
+
+def _check_brackets(tokens, issues):
+    stack = []
+    for token in tokens:
+        if token.kind != 'op':
+            continue
+        if token.text in '([{':
+            stack.append(token)
+        elif token.text in CLOSING:
+            opener = CLOSING[token.text]
+            if stack and stack[-1].text == opener:
+                stack.pop()
+            elif any(open_token.text == opener for open_token in stack):
+                # Something in between was never closed; report it and resynchronize on the match
+                while stack[-1].text != opener:
+                    unclosed = stack.pop()
+                    issues.append(Issue(
+                        unclosed.line, 'unclosed-bracket',
+                        f"'{unclosed.text}' is not closed before '{token.text}' on line {token.line}"
+                    ))
+                stack.pop()
+            else:
+                issues.append(Issue(token.line, 'unmatched-bracket', f"'{token.text}' has no matching '{opener}'"))
+    for unclosed in stack:
+        issues.append(Issue(unclosed.line, 'unclosed-bracket', f"'{unclosed.text}' is never closed"))
+
+
+class _Frame:
+    # One level of braces: a code or class body ('block'), enum constants ('enum', until
+    # their ';') or an array initializer ('init')
+    __slots__ = ('kind', 'base', 'statement', 'header_open')
+
+    def __init__(self, kind, base, statement, header_open):
+        self.kind = kind
+        self.base = base
+        self.statement = statement
+        self.header_open = header_open
+
+
+class _StatementChecker:
+    # Walks the tokens keeping track of where each statement starts and ends, which is what
+    # the semicolon, empty-body and code-outside-a-class rules need
+    def __init__(self, tokens, issues):
+        self.tokens = tokens
+        self.issues = issues
+        self.frames = []
+        self.parens = []
+        self.statement = []
+        # Index in the statement of the '(' opening a control header (if/for/while...)
+        self.header_open = None
+        self.top_level = []
+
+    @property
+    def base(self):
+        return self.frames[-1].base if self.frames else 0
+
+    @property
+    def in_initializer(self):
+        return bool(self.frames) and self.frames[-1].kind == 'init'
+
+    @property
+    def in_statements(self):
+        # At the level where statements and declarations follow each other
+        return len(self.parens) == self.base and not (self.frames and self.frames[-1].kind != 'block')
+
+    def end_statement(self):
+        if self.statement and not self.frames:
+            self.top_level.append(self.statement)
+        self.statement = []
+        self.header_open = None
+
+    def run(self):
+        tokens = self.tokens
+        for index, token in enumerate(tokens):
+            at_statement_level = self.in_statements
+            if at_statement_level and token.line_start and self.statement and token.starts_statement():
+                last = self.statement[-1]
+                if last.ends_statement() and not _annotations_only(self.statement):
+                    self.issues.append(Issue(last.line, 'missing-semicolon', f"Missing ';' after '{last.text}'"))
+                    self.end_statement()
+
+            text = token.text
+            if token.kind != 'op':
+                self.statement.append(token)
+                if at_statement_level and len(self.statement) == 1 and text in ('else', 'do'):
+                    # The body that follows is a statement of its own
+                    self.statement = []
+            elif text in '([':
+                if text == '(' and at_statement_level and len(self.statement) == 1 \
+                        and self.statement[0].text in CONTROL_KEYWORDS:
+                    self.header_open = 1
+                self.statement.append(token)
+                self.parens.append(token)
+            elif text in ')]':
+                self.statement.append(token)
+                if self.parens:
+                    self.parens.pop()
+                if text == ')' and self.header_open is not None and len(self.parens) == self.base:
+                    self.close_header(tokens, index)
+            elif text == '{':
+                self.open_brace(tokens, index)
+            elif text == '}':
+                self.close_brace(token)
+            elif text == ';' and at_statement_level:
+                self.check_stray_semicolon(tokens, index)
+                self.end_statement()
+            elif text == ';' and self.frames and self.frames[-1].kind == 'enum' and len(self.parens) == self.base:
+                # The constants are done; the rest of an enum body is an ordinary class body
+                self.frames[-1].kind = 'block'
+                self.statement = []
+            elif text in (':', '->') and at_statement_level and self.statement and (
+                self.statement[0].text in ('case', 'default')
+                or (text == ':' and len(self.statement) == 1 and self.statement[0].kind == 'name')
+            ):
+                # Switch labels and statement labels
+                self.statement = []
+            else:
+                self.statement.append(token)
+        if self.statement:
+            self.end_statement()
+        return self.top_level
+
+    def close_header(self, tokens, index):
+        keyword = self.statement[0]
+        header = self.statement[self.header_open + 1:-1]
+        if keyword.text in ('if', 'while'):
+            depth = 0
+            for i, token in enumerate(header):
+                depth += {'(': 1, '[': 1, ')': -1, ']': -1}.get(token.text, 0)
+                following = header[i + 1] if i + 1 < len(header) else None
+                if following is not None and following.text in ('<', '>') and following.start == token.end:
+                    # `=>` or `=<`, reported as a reversed operator
+                    continue
+                if depth == 0 and token.text == '=':
+                    self.issues.append(Issue(
+                        token.line, 'assignment-in-condition',
+                        f"'=' assigns inside the {keyword.text} condition; use '==' to compare"
+                    ))
+                    break
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        previous = tokens[index - len(self.statement)] if index >= len(self.statement) else None
+        do_while = keyword.text == 'while' and previous is not None and previous.text == '}'
+        if following is not None and following.text == ';' and keyword.text in ('if', 'for', 'while') and not do_while:
+            self.issues.append(Issue(
+                following.line, 'empty-body',
+                f"';' right after the {keyword.text} (...) ends it; the block below always runs"
+                if keyword.text == 'if' else f"';' right after the {keyword.text} (...) makes the loop body empty"
+            ))
+        if keyword.text in ('if', 'for', 'while') and not do_while:
+            # The body follows as its own statement
+            self.end_statement()
+        self.header_open = None
+
+    def open_brace(self, tokens, index):
+        previous = tokens[index - 1] if index else None
+        if self.in_initializer or (previous is not None and previous.text in ('=', ']', '(', ',')):
+            kind = 'init'
+        elif any(token.text == 'enum' for token in self.statement):
+            kind = 'enum'
+        else:
+            kind = 'block'
+        self.statement.append(tokens[index])
+        self.frames.append(_Frame(kind, len(self.parens), self.statement, self.header_open))
+        self.statement = []
+        self.header_open = None
+
+    def close_brace(self, token):
+        if not self.frames:
+            return
+        if self.in_statements and self.statement:
+            last = self.statement[-1]
+            if last.ends_statement() and not _annotations_only(self.statement):
+                self.issues.append(Issue(last.line, 'missing-semicolon', f"Missing ';' after '{last.text}'"))
+            self.end_statement()
+        frame = self.frames.pop()
+        self.statement = frame.statement
+        self.header_open = frame.header_open
+        if frame.kind == 'init':
+            # A closed array initializer can end a statement: `int[] a = {1, 2}`
+            self.statement.append(Token('initializer', '}', token.line, token.start, token.end, token.line_start))
+        elif self.in_statements:
+            # A class, method or control block ends its statement; whatever follows (`else`,
+            # `while (...);` after a do block, the ';' after an anonymous class) starts a new one
+            self.end_statement()
+        else:
+            self.statement.append(token)
+
+    def check_stray_semicolon(self, tokens, index):
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        if following is None or following.text != '{' or not self.statement:
+            return
+        if self.statement[-1].text == ')' and self.statement[0].text not in CONTROL_KEYWORDS:
+            self.issues.append(Issue(
+                tokens[index].line, 'semicolon-before-body',
+                "';' after the method header ends the declaration before its body"
+            ))
+
+
+def _skip_annotation(statement, i):
+    # statement[i] is '@'; returns the index just past `@a.b.Name(...)`
+    i += 2
+    while i + 1 < len(statement) and statement[i].text == '.':
+        i += 2
+    if i < len(statement) and statement[i].text == '(':
+        depth = 0
+        while i < len(statement):
+            depth += {'(': 1, ')': -1}.get(statement[i].text, 0)
+            i += 1
+            if depth == 0:
+                break
+    return i
+
+
+def _annotations_only(statement):
+    i = 0
+    while i < len(statement) and statement[i].text == '@':
+        i = _skip_annotation(statement, i)
+    return i >= len(statement)
+
+
+def _declaration_head(statement):
+    # Splits off annotations and modifiers: `@Deprecated public static final int x` -> modifiers, `int x`
+    i = 0
+    modifiers = []
+    while i < len(statement):
+        text = statement[i].text
+        if text == '@' and i + 1 < len(statement) and statement[i + 1].text != 'interface':
+            i = _skip_annotation(statement, i)
+        elif text in MODIFIERS:
+            modifiers.append(text)
+            i += 1
+        elif text == 'non' and i + 2 < len(statement) and statement[i + 2].text == 'sealed':
+            i += 3
+        else:
+            break
+    return modifiers, statement[i:]
+
+
+def _is_type_declaration(head):
+    if not head:
+        return False
+    if head[0].text in ('class', 'interface', 'enum'):
+        return True
+    if head[0].text == '@' and len(head) > 1 and head[1].text == 'interface':
+        return True
+    return head[0].text == 'record' and len(head) > 2 and head[1].kind == 'name' and head[2].text in ('(', '<')
+
+
+def _check_structure(top_level, issues):
+    # Only for snippets that declare a type; a bare fragment of a method body is a normal question
+    declarations = []
+    missing_class = []
+    strays = []
+    for statement in top_level:
+        if statement[0].text in ('package', 'import') or _annotations_only(statement):
+            continue
+        modifiers, head = _declaration_head(statement)
+        if _is_type_declaration(head):
+            declarations.append((modifiers, head))
+        elif modifiers and len(head) == 2 and head[0].kind == 'name' and head[1].text == '{':
+            # `public Main {`
+            missing_class.append(head[0])
+        else:
+            strays.append(statement[0])
+
+    for name in missing_class:
+        issues.append(Issue(name.line, 'missing-class-keyword', f"Missing 'class' keyword before '{name.text}'"))
+    if not declarations and not missing_class:
+        return
+    for token in strays:
+        issues.append(Issue(
+            token.line, 'outside-class', "Code outside a class: methods, fields and statements belong inside one"
+        ))
+    public = [head for modifiers, head in declarations if 'public' in modifiers]
+    for head in public[1:]:
+        issues.append(Issue(
+            head[0].line, 'multiple-public-types', "Only one public top-level class is allowed per file"
+        ))
+
+
+def _main_parameters_ok(tokens, open_index):
+    # String[] args, String... args or String args[]
+    params = []
+    depth = 0
+    for token in tokens[open_index:]:
+        depth += {'(': 1, ')': -1}.get(token.text, 0)
+        if depth == 0:
+            break
+        params.append(token.text)
+    params = [text for text in params[1:] if text != 'final']
+    if len(params) == 3:
+        return params[:2] == ['String', '...']
+    return len(params) == 4 and params[0] == 'String' and (params[1:3] == ['[', ']'] or params[2:] == ['[', ']'])
+
+
+def _check_main(tokens, issues):
+    for i, token in enumerate(tokens):
+        if token.text != 'main' or i == 0 or i + 1 >= len(tokens) or tokens[i + 1].text != '(':
+            continue
+        previous = tokens[i - 1]
+        if previous.kind != 'name' or previous.text in ('new', 'return', 'else') or (
+            i > 1 and tokens[i - 2].text == '.'
+        ):
+            # A call such as obj.main(...) or return main(...), not a declaration
+            continue
+        modifiers = set()
+        j = i - 2
+        while j >= 0 and tokens[j].text not in (';', '{', '}'):
+            modifiers.add(tokens[j].text)
+            j -= 1
+        problems = []
+        if 'public' not in modifiers:
+            problems.append("missing 'public'")
+        if 'static' not in modifiers:
+            problems.append("missing 'static'")
+        if previous.text != 'void':
+            problems.append(f"returns {previous.text}, not void")
+        if not _main_parameters_ok(tokens, i + 1):
+            problems.append("the parameter must be String[] args")
+        if problems:
+            issues.append(Issue(
+                token.line, 'main-signature',
+                f"A program starts from 'public static void main(String[] args)': {', '.join(problems)}"
+            ))
+
+
+def _check_common_mistakes(tokens, issues):
+    for i, token in enumerate(tokens):
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        previous = tokens[i - 1] if i else None
+        text = token.text
+        if text in ('==', '!=') and (
+            (previous is not None and previous.kind in ('string', 'textblock'))
+            or (following is not None and following.kind in ('string', 'textblock'))
+        ):
+            issues.append(Issue(
+                token.line, 'string-equality', f"'{text}' compares String references; use .equals() to compare text"
+            ))
+        elif token.kind != 'name':
+            if text == '=' and following is not None and following.text in ('<', '>') and following.start == token.end:
+                issues.append(Issue(
+                    token.line, 'reversed-operator',
+                    f"'={following.text}' is not an operator; did you mean '{following.text}='?"
+                ))
+        elif text == 'system' and following is not None and following.text == '.':
+            issues.append(Issue(token.line, 'case', "'system' should be 'System'; Java names are case-sensitive"))
+        elif text == 'printIn':
+            issues.append(Issue(token.line, 'case', "'printIn' should be 'println' (lowercase L)"))
+        elif text == 'string' and following is not None and following.kind == 'name' and following.text not in KEYWORDS:
+            issues.append(Issue(token.line, 'case', "'string' should be 'String'; Java names are case-sensitive"))
+        elif text in MISCASED_KEYWORDS and following is not None and following.kind == 'name':
+            issues.append(Issue(
+                token.line, 'case', f"'{text}' should be '{MISCASED_KEYWORDS[text]}'; keywords are lowercase"
+            ))
+
+
+def analyze(code):
+    # Issues found in a Java snippet, by line; an empty list means nothing obvious is wrong
+    tokens, issues = tokenize(code)
+    if not issues:
+        # An unterminated string or comment swallows the code after it, so the structure
+        # can't be judged until it is fixed
+        _check_brackets(tokens, issues)
+        top_level = _StatementChecker(tokens, issues).run()
+        _check_structure(top_level, issues)
+        _check_main(tokens, issues)
+    _check_common_mistakes(tokens, issues)
+
+    seen = set()
+    unique = []
+    for issue in sorted(issues, key=lambda issue: issue.line):
+        if (issue.line, issue.rule) not in seen:
+            seen.add((issue.line, issue.rule))
+            unique.append(issue)
+    return unique
@@ -1,4 +1,56 @@
+import threading
+
 from gemini_assistant import GeminiJavaAssistant
+from java_analyzer import analyze
+from prompts import code_review_prompt
+
+
+class JavaLearningAssistant:
+    # Answers for the Lambda handler. Code is checked locally first and only snippets without an
+    # obvious mistake are sent to a model for review; the AI providers are set up on first use,
+    # so a cold start that only checks code never loads them.
+    def __init__(self, escalate=True):
+        self.escalate = escalate
+        self.checked = 0
+        self.answered_locally = 0
+        self.escalated = 0
+        self._ai = None
+        self._lock = threading.Lock()
+
+    @property
+    def ai(self):
+        if self._ai is None:
+            with self._lock:
+                if self._ai is None:
+                    from multi_ai_assistant import MultiAIAssistant
+                    self._ai = MultiAIAssistant()
+        return self._ai
+
+    def chat(self, user_input):
+        return self.ai.chat(user_input, language='java')
+
+    def check_code(self, code):
+        # A list of findings: the local issues, or the model's review when there were none
+        issues = analyze(code)
+        self.checked += 1
+        if issues:
+            self.answered_locally += 1
+            return [str(issue) for issue in issues]
+        if not self.escalate:
+            return ["No syntax issues found"]
+        self.escalated += 1
+        review = self.ai.chat(code_review_prompt(code), language='java')
+        if review.startswith('[ERROR]'):
+            return ["No syntax issues found", review]
+        return [review]
+
+    def get_stats(self):
+        return {
+            'checked': self.checked,
+            'answered_locally': self.answered_locally,
+            'escalated': self.escalated
+        }
+
 
 def main():
     assistant = GeminiJavaAssistant()
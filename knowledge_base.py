@@ -0,0 +1,467 @@
+# Offline answer engine over the bundled corpus in knowledge/ (one markdown file per language).
+#
+# Each "## " section of a corpus file is one answer. An optional "keywords:" line right under the
+# title adds search terms without being shown, and general.md holds language-independent answers.
+#
+# The corpus is compiled into a BM25 inverted index, knowledge/knowledge.idx, which is opened with
+# mmap: startup only reads the small header, and a query touches just the terms it contains and
+# the one answer it returns. The index is rebuilt automatically when the corpus changes.
+#
+#   python knowledge_base.py build
+#   python knowledge_base.py search "how do I reverse a string" --language python
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from prompts import LANG_MAP
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge')
+INDEX_NAME = 'knowledge.idx'
+
+MAGIC = b'KBX1'
+VERSION = 2
+HEADER = struct.Struct('<4sI')  # magic, meta JSON length
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Term frequency weights: a word in a title or keywords line says more than one in the body
+TITLE_WEIGHT = 3
+KEYWORD_WEIGHT = 2
+BODY_WEIGHT = 1
+
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'be', 'what', 'whats', 'which', 'how', 'why', 'when', 'do', 'does',
+    'did', 'i', 'me', 'my', 'you', 'your', 'we', 'it', 'its', 'this', 'that', 'these', 'those', 'can', 'could',
+    'should', 'would', 'will', 'please', 'explain', 'show', 'tell', 'give', 'about', 'of', 'in', 'on', 'at',
+    'to', 'for', 'from', 'with', 'and', 'or', 'but', 'not', 'no', 'if', 'then', 'than', 'as', 'by', 'into',
+    'example', 'examples', 'use', 'using', 'used', 'write', 'code', 'language', 'programming', 'program',
+    'want', 'need', 'know', 'learn', 'way', 'some', 'any', 'there', 'here', 'get', 'make', 'difference', 'between',
+    'work', 'works', 'mean', 'means', 'like', 'just', 'simple', 'basic', 'basics'
+}
+
+# Spellings people use for each language, so "C++" and "c#" survive tokenizing
+TOKEN_ALIASES = [(re.compile(r'c\+\+'), ' cpp '), (re.compile(r'c#'), ' csharp '), (re.compile(r'\.net\b'), ' csharp ')]
+
+WORD_RE = re.compile(r'[a-z0-9_]+')
+
+# Words that only name a language; a query's language decides which answers it may get instead
+# of being scored, so "quantum physics in python" doesn't match every Python answer
+LANGUAGE_WORDS = {
+    'python', 'py', 'java', 'javascript', 'js', 'typescript', 'ts', 'c', 'cpp', 'csharp', 'go', 'golang', 'rust',
+    'php', 'ruby', 'swift', 'kotlin'
+}
+
+# Language named in a question asked with language "any"; C and Go need context since both are
+# common words (or letters) on their own
+LANGUAGE_PATTERNS = [
+    ('cpp', re.compile(r'c\+\+|\bcpp\b')),
+    ('csharp', re.compile(r'c#|\bc sharp\b|\bcsharp\b|\.net\b')),
+    ('typescript', re.compile(r'\btypescript\b|\bts\b')),
+    ('javascript', re.compile(r'\bjavascript\b|\bjs\b|\bnode(?:\.?js)?\b')),
+    ('python', re.compile(r'\bpython\b')),
+    ('java', re.compile(r'\bjava\b')),
+    ('golang', re.compile(r'\bgolang\b|\bin go\b|\bgo (?:lang|code|program|language)\b')),
+    ('rust', re.compile(r'\brust\b')),
+    ('php', re.compile(r'\bphp\b')),
+    ('ruby', re.compile(r'\bruby\b')),
+    ('swift', re.compile(r'\bswift\b')),
+    ('kotlin', re.compile(r'\bkotlin\b')),
+    ('c', re.compile(r'\b(?:in|ansi) c(?![+#\w])|\bc (?:language|code|program)\b'))
+]
+
+
+def _stem(word):
+    # Just enough suffix stripping that "loops", "looping" and "looped" meet at "loop"
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 5 and word.endswith('ing'):
+        return word[:-3]
+    if len(word) > 4 and word.endswith('ed'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    text = text.lower()
+    for pattern, replacement in TOKEN_ALIASES:
+        text = pattern.sub(replacement, text)
+    return [_stem(word) for word in WORD_RE.findall(text) if len(word) > 1 and word not in STOPWORDS]
+
+
+# Greetings and filler that are not questions. A query made only of these gets no answer, although
+# words like "hi" and "ok" turn up in some answers' sample code
+SMALL_TALK = {_stem(word) for word in (
+    'hi', 'hello', 'hey', 'yo', 'thanks', 'thank', 'thx', 'ok', 'okay', 'yes', 'yeah', 'yep', 'nope', 'sure',
+    'cool', 'nice', 'great', 'good', 'morning', 'evening', 'bye', 'test', 'testing', 'hmm', 'lol', 'wow'
+)}
+
+# Queries this short cover themselves fully through any answer body that happens to contain them
+SHORT_QUERY_TERMS = 2
+
+
+def detect_language(text):
+    text = text.lower()
+    for language, pattern in LANGUAGE_PATTERNS:
+        if pattern.search(text):
+            return 'go' if language == 'golang' else language
+    return None
+
+
+def parse_corpus(directory=KNOWLEDGE_DIR):
+    # [(language, title, keywords, body)] for every "## " section; general.md answers are language "any"
+    docs = []
+    for filename in sorted(os.listdir(directory)):
+        language, ext = os.path.splitext(filename)
+        if ext != '.md':
+            continue
+        if language == 'general':
+            language = 'any'
+        elif language not in LANG_MAP:
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            sections = re.split(r'^## ', f.read(), flags=re.MULTILINE)[1:]
+        for section in sections:
+            title, _, rest = section.partition('\n')
+            keywords = ''
+            rest = rest.lstrip('\n')
+            if rest.startswith('keywords:'):
+                line, _, rest = rest.partition('\n')
+                keywords = line[len('keywords:'):].strip()
+            docs.append((language, title.strip(), keywords, rest.strip()))
+    return docs
+
+
+def corpus_signature(directory=KNOWLEDGE_DIR):
+    # Changes whenever a corpus file is added, removed or edited
+    entries = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.md'):
+            stat = os.stat(os.path.join(directory, filename))
+            entries.append(f'{filename}:{stat.st_size}:{stat.st_mtime_ns}')
+    return '|'.join(entries)
+
+
+def _u32(values):
+    packed = array('I', values)
+    if packed.itemsize != 4:
+        packed = array('L', values)
+    return packed
+
+
+def build_index(directory=KNOWLEDGE_DIR):
+    # Returns the index file contents. Layout after the header and meta JSON, each section a
+    # native-order uint32 array (or UTF-8 bytes) at the offset recorded in meta['sections']:
+    #   term_offsets [n_terms + 1]   term_blob     sorted terms, concatenated
+    #   postings_offsets [n_terms + 1]             postings: (doc, weighted tf) pairs per term
+    #   doc_len [n_docs]             doc_lang [n_docs]
+    #   doc_offsets [n_docs + 1]     doc_blob      one JSON answer per doc
+    docs = parse_corpus(directory)
+    languages = sorted({language for language, _, _, _ in docs})
+    postings = {}
+    doc_len = []
+    doc_blobs = []
+    for doc_id, (language, title, keywords, body) in enumerate(docs):
+        counts = {}
+        for text, weight in ((title, TITLE_WEIGHT), (keywords, KEYWORD_WEIGHT), (body, BODY_WEIGHT)):
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + weight
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+        doc_len.append(sum(counts.values()))
+        # Title and keyword terms, which a short query has to hit (KnowledgeBase.search)
+        keys = sorted(set(tokenize(f'{title} {keywords}')))
+        doc_blobs.append(json.dumps({'title': title, 'language': language, 'body': body, 'keys': keys}).encode('utf-8'))
+
+    terms = sorted(term.encode('utf-8') for term in postings)
+    term_offsets, postings_offsets, flat = [0], [0], []
+    for term in terms:
+        for doc_id, tf in postings[term.decode('utf-8')]:
+            flat.extend((doc_id, tf))
+        term_offsets.append(term_offsets[-1] + len(term))
+        postings_offsets.append(len(flat) // 2)
+    doc_offsets = [0]
+    for blob in doc_blobs:
+        doc_offsets.append(doc_offsets[-1] + len(blob))
+
+    language_ids = {language: i for i, language in enumerate(languages)}
+    sections = [
+        ('term_offsets', _u32(term_offsets).tobytes()),
+        ('term_blob', b''.join(terms)),
+        ('postings_offsets', _u32(postings_offsets).tobytes()),
+        ('postings', _u32(flat).tobytes()),
+        ('doc_len', _u32(doc_len).tobytes()),
+        ('doc_lang', _u32([language_ids[doc[0]] for doc in docs]).tobytes()),
+        ('doc_offsets', _u32(doc_offsets).tobytes()),
+        ('doc_blob', b''.join(doc_blobs))
+    ]
+    meta = {
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'signature': corpus_signature(directory),
+        'n_docs': len(docs),
+        'n_terms': len(terms),
+        'avgdl': sum(doc_len) / len(docs) if docs else 0.0,
+        'languages': languages,
+        'sections': {}
+    }
+
+    # Offsets depend on the meta length, which depends on the offsets: pad the meta JSON to a
+    # fixed size so one pass is enough, and keep every section 4-byte aligned
+    layout = {}
+    offset = 0
+    for name, data in sections:
+        layout[name] = [offset, len(data)]
+        offset += (len(data) + 3) & ~3
+    meta['sections'] = layout
+    meta_bytes = json.dumps(meta).encode('utf-8')
+    meta_size = (len(meta_bytes) + 64 + 3) & ~3
+    base = HEADER.size + meta_size
+    for name in layout:
+        layout[name][0] += base
+    meta_bytes = json.dumps(meta).encode('utf-8').ljust(meta_size)
+
+    out = bytearray(HEADER.pack(MAGIC, meta_size))
+    out += meta_bytes
+    for name, data in sections:
+        out += data
+        out += b'\0' * (-len(data) % 4)
+    return bytes(out)
+
+
+def write_index(path, directory=KNOWLEDGE_DIR):
+    # Written to a temp file and renamed, so a worker opening the index never sees half of it
+    data = build_index(directory)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return data
+
+
+class KnowledgeIndex:
+    # Read-only view of an index file (mapped, or bytes built in memory)
+    def __init__(self, buffer, meta=None):
+        self.buffer = buffer
+        self.meta = meta or self.read_meta(buffer)
+        self.view = memoryview(buffer)
+        sections = self.meta['sections']
+        self.term_offsets = self._u32(sections['term_offsets'])
+        self.postings_offsets = self._u32(sections['postings_offsets'])
+        self.postings = self._u32(sections['postings'])
+        self.doc_len = self._u32(sections['doc_len'])
+        self.doc_lang = self._u32(sections['doc_lang'])
+        self.doc_offsets = self._u32(sections['doc_offsets'])
+        self.term_base = sections['term_blob'][0]
+        self.doc_base = sections['doc_blob'][0]
+        self.n_docs = self.meta['n_docs']
+        self.n_terms = self.meta['n_terms']
+        self.avgdl = self.meta['avgdl'] or 1.0
+        self.languages = self.meta['languages']
+
+    @staticmethod
+    def read_meta(buffer):
+        magic, meta_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('not a knowledge base index')
+        return json.loads(bytes(buffer[HEADER.size:HEADER.size + meta_size]))
+
+    def _u32(self, section):
+        offset, length = section
+        return self.view[offset:offset + length].cast('I')
+
+    def _term(self, i):
+        return self.view[self.term_base + self.term_offsets[i]:self.term_base + self.term_offsets[i + 1]]
+
+    def find(self, term):
+        # Binary search over the sorted term table; returns the term number or -1
+        term = term.encode('utf-8')
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid).tobytes() < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._term(lo).tobytes() == term:
+            return lo
+        return -1
+
+    def postings_for(self, term_id):
+        start, end = self.postings_offsets[term_id], self.postings_offsets[term_id + 1]
+        return self.postings[start * 2:end * 2]
+
+    def doc(self, doc_id):
+        start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        return json.loads(self.view[self.doc_base + start:self.doc_base + end].tobytes())
+
+    def search(self, terms, languages=None, limit=3):
+        # BM25 over the query terms; returns [(score, doc_id, matched terms)] best first
+        allowed = None
+        if languages is not None:
+            allowed = {i for i, language in enumerate(self.languages) if language in languages}
+        scores = {}
+        matched = {}
+        for term in set(terms):
+            term_id = self.find(term)
+            if term_id < 0:
+                continue
+            postings = self.postings_for(term_id)
+            df = len(postings) // 2
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            for i in range(0, len(postings), 2):
+                doc_id, tf = postings[i], postings[i + 1]
+                if allowed is not None and self.doc_lang[doc_id] not in allowed:
+                    continue
+                norm = K1 * (1 - B + B * self.doc_len[doc_id] / self.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(score, doc_id, matched[doc_id]) for doc_id, score in ranked]
+
+
+class KnowledgeBase:
+    def __init__(self, directory=KNOWLEDGE_DIR, index_path=None, min_score=3.0, min_coverage=0.6):
+        self.directory = directory
+        self.index_path = index_path or os.path.join(directory, INDEX_NAME)
+        self.min_score = min_score
+        self.min_coverage = min_coverage
+        self._index = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.queries = 0
+        self.answered = 0
+        self.total_ms = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.environ.get('KNOWLEDGE_DIR', KNOWLEDGE_DIR),
+            index_path=os.environ.get('KNOWLEDGE_INDEX') or None,
+            min_score=float(os.environ.get('KNOWLEDGE_MIN_SCORE', 3.0))
+        )
+
+    def available(self):
+        return os.path.isdir(self.directory)
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._open()
+        return self._index
+
+    def _open(self):
+        signature = corpus_signature(self.directory)
+        try:
+            with open(self.index_path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            meta = KnowledgeIndex.read_meta(buffer)
+            if (meta.get('version') == VERSION and meta.get('byteorder') == sys.byteorder
+                    and meta.get('signature') == signature):
+                return KnowledgeIndex(buffer, meta)
+            buffer.close()
+        except (OSError, ValueError, struct.error):
+            pass
+
+        # Missing or stale: rebuild it. A read-only deploy (e.g. Lambda) keeps the index in memory instead
+        try:
+            write_index(self.index_path, self.directory)
+            with open(self.index_path, 'rb') as f:
+                index = KnowledgeIndex(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            print(f"[OK] Knowledge base index built: {index.n_docs} answers")
+            return index
+        except OSError as e:
+            print(f"[ERROR] Knowledge base index not saved ({e}); using it from memory")
+            return KnowledgeIndex(build_index(self.directory))
+
+    def search(self, query, language='any', limit=3):
+        # [(score, answer)] for the answers allowed for this language: the language's own plus
+        # general ones. With language "any", a language named in the question narrows it the same way.
+        if language == 'any':
+            language = detect_language(query) or 'any'
+        languages = None if language == 'any' else {language.lower(), 'any'}
+        terms = [term for term in tokenize(query) if term not in LANGUAGE_WORDS]
+        unique = set(terms)
+        if unique <= SMALL_TALK:
+            return []
+        results = []
+        for score, doc_id, matched in self.index.search(terms, languages, limit):
+            if score < self.min_score or matched / len(unique) < self.min_coverage:
+                continue
+            doc = self.index.doc(doc_id)
+            # One or two words must name the answer's topic, or both match
+            if len(unique) <= SHORT_QUERY_TERMS and matched < 2 and not unique & set(doc['keys']):
+                continue
+            results.append((score, doc))
+        return results
+
+    def answer(self, query, language='any'):
+        # The best answer as markdown, or None when nothing matches confidently
+        start = time.perf_counter()
+        results = self.search(query or '', language, limit=1)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.queries += 1
+            self.total_ms += elapsed
+            if results:
+                self.answered += 1
+        if not results:
+            return None
+        doc = results[0][1]
+        return f"### {doc['title']}\n\n{doc['body']}"
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = {
+                'queries': self.queries,
+                'answered': self.answered,
+                'hit_rate': round(self.answered / self.queries, 3) if self.queries else None,
+                'avg_ms': round(self.total_ms / self.queries, 3) if self.queries else None
+            }
+        if self._index is not None:
+            stats['answers'] = self._index.n_docs
+            stats['terms'] = self._index.n_terms
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the offline knowledge base')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help=f'compile knowledge/*.md into knowledge/{INDEX_NAME}')
+    search = commands.add_parser('search', help='show the best matching answers for a question')
+    search.add_argument('query')
+    search.add_argument('--language', default='any')
+    search.add_argument('--limit', type=int, default=3)
+    args = parser.parse_args()
+
+    kb = KnowledgeBase.from_env()
+    if args.command == 'build':
+        data = write_index(kb.index_path, kb.directory)
+        index = KnowledgeIndex(data)
+        print(f"[OK] {index.n_docs} answers, {index.n_terms} terms, {len(data)} bytes -> {kb.index_path}")
+        return
+    start = time.perf_counter()
+    results = kb.search(args.query, args.language, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for score, doc in results:
+        print(f"{score:6.2f}  [{doc['language']}] {doc['title']}")
+    if not results:
+        print('No confident match')
+    print(f"({elapsed:.2f} ms)")
+
+
+if __name__ == '__main__':
+    main()
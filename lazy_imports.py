@@ -0,0 +1,25 @@
+import importlib
+import importlib.util
+
+_MISSING = object()
+_modules = {}
+
+
+def is_installed(name):
+    # Checks for an optional SDK without paying for its import
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def optional_import(name):
+    # Imports an optional SDK on first use instead of at module import; None if it isn't installed
+    module = _modules.get(name, _MISSING)
+    if module is _MISSING:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            module = None
+        _modules[name] = module
+    return module
@@ -0,0 +1,360 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans cache hits (milliseconds) up to slow free-tier models (a minute)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricFamily:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self):
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for key, value in self.samples():
+            lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(MetricFamily):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        # For running totals another component already keeps
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(MetricFamily):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(MetricFamily):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                series = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            return sorted((key, list(series)) for key, series in self._values.items())
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for key, series in self.samples():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key, [('le', '+Inf')])
+            lines.append(f'{self.name}_bucket{labels} {series[-1]}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._families = []
+
+    def _register(self, family):
+        self._families.append(family)
+        return family
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self.prefix + name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge(self.prefix + name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self.prefix + name, help_text, labels, buckets))
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+class RequestTiming:
+    # Where one request's time went, for its Server-Timing header. Phases with the same
+    # name and description add up; hedged provider calls each get their own entry.
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.outcome = None
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, desc=None):
+        with self._lock:
+            self._phases[(name, desc)] = self._phases.get((name, desc), 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def header(self):
+        with self._lock:
+            phases = list(self._phases.items())
+        entries = []
+        for (name, desc), seconds in phases:
+            entry = f'{name};dur={seconds * 1000:.1f}'
+            if desc:
+                entry += f';desc="{desc}"'
+            entries.append(entry)
+        entries.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(entries)
+
+
+# The timing of the request being served, if any. Context variables follow asyncio tasks and
+# asyncio.to_thread; work handed to a thread pool must be submitted through copy_context().run.
+_current_timing = ContextVar('request_timing', default=None)
+
+
+def record(name, seconds, desc=None):
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(name, seconds, desc)
+
+
+@contextmanager
+def timed(name, desc=None):
+    # Adds the block's duration to the current request's timing; a no-op outside a request
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, desc)
+
+
+def note_outcome(outcome):
+    timing = _current_timing.get()
+    if timing is not None and timing.outcome is None:
+        timing.outcome = outcome
+
+
+def _outcome(text):
+    return 'error' if text.startswith('[ERROR]') else 'ok'
+
+
+class ChatMetrics:
+    def __init__(self, server_timing=False):
+        self.server_timing = server_timing
+        self.registry = MetricsRegistry(prefix='assistant_')
+        self.requests = self.registry.counter('requests_total', 'Chat requests served', ('endpoint', 'outcome'))
+        self.request_seconds = self.registry.histogram(
+            'request_duration_seconds', 'Time to answer a chat request', ('endpoint',)
+        )
+        self.requests_in_flight = self.registry.gauge('requests_in_flight', 'Chat requests being served', ('endpoint',))
+        self.provider_seconds = self.registry.histogram(
+            'provider_request_duration_seconds', 'Time spent waiting on an AI provider', ('provider',)
+        )
+        self.provider_queue_seconds = self.registry.histogram(
+            'provider_queue_seconds', 'Time spent queued for a provider rate-limit slot', ('provider',)
+        )
+        self.provider_in_flight = self.registry.gauge(
+            'provider_requests_in_flight', 'Provider calls in progress', ('provider',)
+        )
+        self.provider_errors = self.registry.counter(
+            'provider_errors_total', 'Failed provider calls by HTTP status code or failure kind', ('provider', 'code')
+        )
+        self.provider_bytes = self.registry.counter(
+            'provider_bytes_total', 'Question and answer text exchanged with providers, excluding prompt templates',
+            ('provider', 'direction')
+        )
+        self.provider_tokens = self.registry.counter(
+            'provider_tokens_total', 'Estimated prompt and completion tokens (4 characters per token)',
+            ('provider', 'kind')
+        )
+        self.scheduler_queue_depth = self.registry.gauge(
+            'scheduler_queue_depth', 'Requests waiting for a provider rate-limit slot', ('provider',)
+        )
+        self.scheduler_rejected = self.registry.counter(
+            'scheduler_rejected_total', 'Requests refused a provider rate-limit slot', ('provider',)
+        )
+        self.cache_lookups = self.registry.counter('cache_lookups_total', 'Response cache lookups', ('result',))
+        self.singleflight = self.registry.counter(
+            'singleflight_total', 'Uncached questions asked of a provider (executed) or joined to an identical '
+            'one already in flight (coalesced)', ('result',)
+        )
+        self.generation_seconds = self.registry.histogram(
+            'generation_duration_seconds', 'Time for a provider to answer, by request class (request_budget.py)',
+            ('kind',)
+        )
+
+    @classmethod
+    def from_env(cls):
+        return cls(server_timing=os.environ.get('SERVER_TIMING', 'off').lower() in ('on', 'true', '1'))
+
+    def _start(self, endpoint):
+        self.requests_in_flight.inc(endpoint=endpoint)
+        return RequestTiming()
+
+    def _finish(self, endpoint, timing):
+        self.requests_in_flight.dec(endpoint=endpoint)
+        self.request_seconds.observe(timing.elapsed(), endpoint=endpoint)
+        self.requests.inc(endpoint=endpoint, outcome=timing.outcome or 'error')
+
+    @contextmanager
+    def request(self, endpoint):
+        # The handler reports the answer through finish(); an exception counts as an error
+        timing = self._start(endpoint)
+        token = _current_timing.set(timing)
+        try:
+            yield timing
+        finally:
+            _current_timing.reset(token)
+            self._finish(endpoint, timing)
+
+    def finish(self, timing, response):
+        # A cached answer keeps the 'cached' outcome noted during the lookup
+        if timing.outcome is None or _outcome(response) == 'error':
+            timing.outcome = _outcome(response)
+
+    def stream(self, endpoint, chunks):
+        # Streams are counted and timed but get no Server-Timing: their headers are already sent
+        timing = self._start(endpoint)
+        try:
+            for chunk in chunks:
+                if _outcome(chunk) == 'error':
+                    timing.outcome = 'error'
+                yield chunk
+            timing.outcome = timing.outcome or 'ok'
+        finally:
+            self._finish(endpoint, timing)
+
+    async def astream(self, endpoint, chunks):
+        timing = self._start(endpoint)
+        try:
+            async for chunk in chunks:
+                if _outcome(chunk) == 'error':
+                    timing.outcome = 'error'
+                yield chunk
+            timing.outcome = timing.outcome or 'ok'
+        finally:
+            self._finish(endpoint, timing)
+
+    def record_queue(self, provider, seconds):
+        self.provider_queue_seconds.observe(seconds, provider=provider)
+        if seconds >= 0.0005:
+            record('queue', seconds, provider)
+
+    @contextmanager
+    def provider_call(self, provider):
+        self.provider_in_flight.inc(provider=provider)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.provider_in_flight.dec(provider=provider)
+            self.provider_seconds.observe(seconds, provider=provider)
+            record('provider', seconds, provider)
+
+    def provider_error(self, provider, code):
+        self.provider_errors.inc(provider=provider, code=code)
+
+    def provider_failure(self, provider, error):
+        # SDK exceptions carry the HTTP status as .code (google.api_core); anything else is 'exception'
+        code = getattr(error, 'code', None)
+        self.provider_error(provider, int(code) if isinstance(code, int) else 'exception')
+
+    def count_text(self, provider, prompt, answer):
+        prompt, answer = prompt or '', answer or ''
+        self.provider_bytes.inc(len(prompt.encode('utf-8')), provider=provider, direction='sent')
+        self.provider_bytes.inc(len(answer.encode('utf-8')), provider=provider, direction='received')
+        self.provider_tokens.inc(len(prompt) // 4, provider=provider, kind='prompt')
+        self.provider_tokens.inc(len(answer) // 4, provider=provider, kind='completion')
+
+    def record_generation(self, kind, seconds):
+        self.generation_seconds.observe(seconds, kind=kind)
+
+    def cache_lookup(self, hit):
+        self.cache_lookups.inc(result='hit' if hit else 'miss')
+        if hit:
+            note_outcome('cached')
+
+    def collect_scheduler(self, stats):
+        for provider, limiter in stats.get('providers', {}).items():
+            self.scheduler_queue_depth.set(limiter['queue_depth'], provider=provider)
+            self.scheduler_rejected.set_total(limiter['rejected'], provider=provider)
+
+    def collect_coalescing(self, stats):
+        for result in ('executed', 'coalesced'):
+            self.singleflight.set_total(stats[result], result=result)
+
+    def render(self):
+        return self.registry.render()
@@ -0,0 +1,253 @@
+# Local stand-in for the AI providers, for load tests and offline development.
+#
+# Speaks the wire formats the provider adapters use, with and without streaming:
+#   POST .../chat/completions   OpenAI-compatible (Groq, DeepSeek, OpenAI, Perplexity)
+#   POST .../chat               Cohere
+#   POST .../models/<model>     HuggingFace Inference
+#
+#   python mock_provider.py --port 8001 --latency lognormal:0.4,0.5 --error-rate 0.01
+#
+# then point the app at it, e.g. GROQ_API_KEY=mock GROQ_BASE_URL=http://127.0.0.1:8001/v1
+# (COHERE_BASE_URL=http://127.0.0.1:8001/v1, HUGGINGFACE_BASE_URL=http://127.0.0.1:8001/models).
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyDistribution:
+    # fixed:S | uniform:LOW,HIGH | normal:MEAN,STDDEV | lognormal:MEDIAN,SIGMA | exponential:MEAN (seconds)
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, kind='fixed', a=0.0, b=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec):
+        kind, _, params = spec.partition(':')
+        values = [float(value) for value in params.split(',') if value] or [0.0]
+        return cls(kind, values[0], values[1] if len(values) > 1 else 0.0)
+
+    def sample(self, rng):
+        if self.kind == 'uniform':
+            value = rng.uniform(self.a, self.b)
+        elif self.kind == 'normal':
+            value = rng.gauss(self.a, self.b)
+        elif self.kind == 'lognormal':
+            value = rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        elif self.kind == 'exponential':
+            value = rng.expovariate(1 / self.a) if self.a > 0 else 0.0
+        else:
+            value = self.a
+        return max(0.0, value)
+
+    def __str__(self):
+        return f'{self.kind}:{self.a},{self.b}'
+
+
+class MockConfig:
+    def __init__(self, latency=None, token_delay=0.0, answer_tokens=60, error_rate=0.0, throttle_rate=0.0, seed=None):
+        self.latency = latency or LatencyDistribution()
+        self.token_delay = token_delay
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def draw(self):
+        # One locked draw per request so a seeded run is reproducible across threads
+        with self._lock:
+            self.requests += 1
+            roll = self.rng.random()
+            latency = self.latency.sample(self.rng)
+            outcome = 'ok'
+            if roll < self.throttle_rate:
+                outcome = 'throttle'
+            elif roll < self.throttle_rate + self.error_rate:
+                outcome = 'error'
+            if outcome != 'ok':
+                self.errors += 1
+            return outcome, latency
+
+    def answer(self, prompt, max_tokens=None):
+        # answer_tokens words, or fewer when the request's max_tokens is lower, as a real model stops there
+        tokens = min(self.answer_tokens, max_tokens) if max_tokens else self.answer_tokens
+        words = ['```java', 'public', 'class', 'Main', '{', '}', '```', 'This', 'example', 'shows', 'the', 'idea.']
+        body = ' '.join(words[i % len(words)] for i in range(tokens))
+        return f"Mock answer to: {prompt[-60:]}\n\n{body}"
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            config = self.server.config
+            self._send_json(200, {'status': 'ok', 'requests': config.requests, 'errors': config.errors})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        path = self.path.rstrip('/')
+        if path.endswith('/chat/completions'):
+            wire, prompt = 'openai', (body.get('messages') or [{}])[-1].get('content', '')
+            max_tokens = body.get('max_tokens')
+        elif path.endswith('/chat'):
+            wire, prompt = 'cohere', body.get('message', '')
+            max_tokens = body.get('max_tokens')
+        elif '/models/' in path:
+            wire, prompt = 'huggingface', body.get('inputs', '')
+            max_tokens = (body.get('parameters') or {}).get('max_new_tokens')
+        else:
+            self._send_json(404, {'error': f'unknown endpoint {self.path}'})
+            return
+
+        config = self.server.config
+        outcome, latency = config.draw()
+        time.sleep(latency)
+        if outcome == 'throttle':
+            self._send_json(429, {'error': {'message': 'Rate limit reached (mock)'}}, {'Retry-After': '1'})
+            return
+        if outcome == 'error':
+            self._send_json(500, {'error': {'message': 'Internal error (mock)'}})
+            return
+
+        answer = config.answer(prompt, max_tokens)
+        if body.get('stream'):
+            self._stream(wire, answer)
+            return
+        # A non-streamed answer arrives once every token has been generated
+        time.sleep(config.token_delay * len(answer.split(' ')))
+        if wire == 'openai':
+            self._send_json(200, {
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}]
+            })
+        elif wire == 'cohere':
+            self._send_json(200, {'text': answer})
+        else:
+            self._send_json(200, [{'generated_text': answer}])
+
+    def _stream(self, wire, answer):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson' if wire == 'cohere' else 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for token in answer.split(' '):
+            token += ' '
+            if wire == 'openai':
+                line = f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': token}}]})}\n\n"
+            elif wire == 'cohere':
+                line = json.dumps({'event_type': 'text-generation', 'text': token}) + '\n'
+            else:
+                line = f"data: {json.dumps({'token': {'text': token, 'special': False}})}\n\n"
+            self._write_chunk(line.encode())
+            if self.server.config.token_delay:
+                time.sleep(self.server.config.token_delay)
+        if wire == 'openai' or wire == 'huggingface':
+            self._write_chunk(b'data: [DONE]\n\n')
+        else:
+            self._write_chunk((json.dumps({'event_type': 'stream-end'}) + '\n').encode())
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def provider_env(base_url, providers=('groq',)):
+    # Environment that points the app's providers at a mock server
+    paths = {'cohere': '/v1', 'huggingface': '/models'}
+    env = {}
+    for provider in providers:
+        prefix = provider.upper()
+        env[f'{prefix}_API_KEY'] = 'mock'
+        env[f'{prefix}_BASE_URL'] = base_url + paths.get(provider, '/v1')
+    return env
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        super().__init__((host, port), MockProviderHandler)
+        self.config = config or MockConfig()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def provider_env(self, providers=('groq',)):
+        return provider_env(self.base_url, providers)
+
+    def handle_error(self, request, client_address):
+        # Hedged races hang up on the losing call; that is not a server error
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-provider', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the AI providers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', default='lognormal:0.4,0.5', help='time to first byte, e.g. fixed:0.2, uniform:0.1,0.8')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds to generate each token')
+    parser.add_argument('--answer-tokens', type=int, default=60)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 429')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        LatencyDistribution.parse(args.latency), args.token_delay, args.answer_tokens,
+        args.error_rate, args.throttle_rate, args.seed
+    )
+    server = MockProviderServer(args.host, args.port, config)
+    print(f"[OK] Mock provider on {server.base_url} (latency {config.latency}, errors {args.error_rate}, "
+          f"429s {args.throttle_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,377 +1,740 @@
 import os
-import base64
-import io
-import requests
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
+from batch_chat import BatchRunner
+from hedging import HedgePolicy
+from image_ingest import ImageIngestError, ImageStore, PreparedImage, image_digest, images_supported, preload_pillow
+from metrics import ChatMetrics, timed
+from prompts import language_name
+from provider_adapters import ProviderRegistry
+from provider_router import ProviderRouter
+from provider_scheduler import ProviderScheduler, RateLimited, estimate_tokens, is_quota_error
+from provider_stats import ProviderStats
+from provider_transport import Attempt, AsyncProviderTransport, ProviderTransport, aborted, current_attempt
+from request_budget import UNBUDGETED_MAX_TOKENS, RequestBudgeter
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from session_store import SessionStore
+from single_flight import AsyncSingleFlight, SingleFlight
 
 class MultiAIAssistant:
     def __init__(self):
-        self.gemini_key = os.environ.get('GEMINI_API_KEY')
-        self.groq_key = os.environ.get('GROQ_API_KEY')
-        self.cohere_key = os.environ.get('COHERE_API_KEY')
-        self.hf_key = os.environ.get('HUGGINGFACE_API_KEY')
-        self.deepseek_key = os.environ.get('DEEPSEEK_API_KEY')
-        self.openai_key = os.environ.get('OPENAI_API_KEY')
-        self.perplexity_key = os.environ.get('PERPLEXITY_API_KEY')
-        
         self.active_ai = None
-        self.model = None
+        self.providers = []
+        self.fallback = None
+        self._auto_models = ''
+        self.transport = ProviderTransport.from_env()
+        self.async_transport = AsyncProviderTransport.from_env()
+        self.cache = ResponseCache.from_env()
+        self.semantic_cache = SemanticCache.from_env()
+        self.images = ImageStore.from_env()
+        self.sessions = SessionStore.from_env()
+        self.batches = BatchRunner.from_env()
+        self.provider_stats = ProviderStats()
+        self.router = ProviderRouter.from_env(self.provider_stats)
+        self.scheduler = ProviderScheduler.from_env()
+        self.metrics = ChatMetrics.from_env()
+        self.registry = ProviderRegistry.from_env(
+            self.transport, self.async_transport, self.scheduler.throttle, self.metrics.provider_error
+        )
+        self.hedge = HedgePolicy.from_env()
+        self.budgeter = RequestBudgeter.from_env()
+        self.single_flight = SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+        self._hedge_pool = ThreadPoolExecutor(
+            max_workers=int(os.environ.get('HEDGE_WORKERS', 16)), thread_name_prefix='hedge'
+        )
         self._initialize_ai()
     
     def _initialize_ai(self):
-        # Try Gemini first
-        if self.gemini_key and genai:
-            try:
-                genai.configure(api_key=self.gemini_key)
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
-                self.active_ai = 'gemini'
-                print("[OK] Gemini AI ready")
-                return
-            except Exception as e:
-                print(f"[WARNING] Gemini failed: {e}")
+        # No network calls or SDK imports here: key validation happens in the router's background
+        # health probes, and provider SDKs are imported the first time they are used
+        names = self.registry.names()
+        self.providers = [name for name in names if not self.registry[name].fallback_only]
+        self.fallback = next((name for name in names if self.registry[name].fallback_only), None)
+        self._auto_models = ','.join(sorted(self.registry[name].model for name in self.providers))
         
-        # Try Groq (Free, very fast)
-        if self.groq_key:
-            try:
-                response = requests.post(
-                    'https://api.groq.com/openai/v1/chat/completions',
-                    headers={'Authorization': f'Bearer {self.groq_key}'},
-                    json={'model': 'llama-3.3-70b-versatile', 'messages': [{'role': 'user', 'content': 'Hi'}], 'max_tokens': 10}
-                )
-                if response.status_code == 200:
-                    self.active_ai = 'groq'
-                    print("[OK] Groq AI ready")
-                    return
-            except Exception as e:
-                print(f"[WARNING] Groq failed: {e}")
+        if not self.providers:
+            if self.fallback:
+                print(f"[OK] No AI available; answering from the {self.registry[self.fallback].display_name}")
+            else:
+                print("[ERROR] No AI available")
+            return
         
-        # Try Cohere (Free tier)
-        if self.cohere_key:
+        self.active_ai = self.providers[0]
+        print(f"[OK] {self.get_status()} ready")
+        self.router.start_probes(self._probe, self.providers)
+    
+    def _probe(self, provider):
+        return self.registry[provider].probe()
+    
+    def warm_up(self, asynchronous=False):
+        # Called once per server worker before it takes traffic, so SDK imports, client setup and
+        # connection pools are not paid for by the first requests
+        for provider in self.providers + ([self.fallback] if self.fallback else []):
             try:
-                response = requests.post(
-                    'https://api.cohere.ai/v1/generate',
-                    headers={'Authorization': f'Bearer {self.cohere_key}'},
-                    json={'model': 'command', 'prompt': 'Hi', 'max_tokens': 10}
-                )
-                if response.status_code == 200:
-                    self.active_ai = 'cohere'
-                    print("[OK] Cohere AI ready")
-                    return
+                self.registry[provider].warm_up(asynchronous)
             except Exception as e:
-                print(f"[WARNING] Cohere failed: {e}")
+                print(f"[ERROR] {provider} warm-up failed: {e}")
+        if any(self.registry[provider].supports_images for provider in self.providers):
+            preload_pillow()
+    
+    def shutdown(self):
+        # Graceful stop: no new health probes, in-flight hedged provider calls run to completion,
+        # queued ones are dropped, then pooled connections are closed
+        self.router.stop_probes()
+        self._hedge_pool.shutdown(wait=True, cancel_futures=True)
+        self.transport.close()
+    
+    def chat(self, user_input, image_data=None, language="any", ai_model="auto", session_id=None):
+        if not user_input and not image_data:
+            return "Please provide a question or upload an image."
         
-        # Try HuggingFace (Free)
-        if self.hf_key:
-            self.active_ai = 'huggingface'
-            print("[OK] HuggingFace AI ready")
-            return
+        provider, error = self._resolve_provider(ai_model)
+        if error:
+            return error
         
-        # Try DeepSeek
-        if self.deepseek_key:
-            self.active_ai = 'deepseek'
-            print("[OK] DeepSeek AI ready")
-            return
+        history = self.sessions.history(session_id)
+        try:
+            with timed('cache'):
+                cache_ref, cached, image_data = self._cache_lookup(
+                    ai_model, provider, user_input, image_data, language, history
+                )
+        except ImageIngestError as e:
+            return f"[ERROR] {e}"
+        if cached is not None:
+            self._remember(session_id, user_input, image_data, cached)
+            return cached
         
-        # Try OpenAI
-        if self.openai_key:
-            self.active_ai = 'openai'
-            print("[OK] OpenAI ready")
-            return
+        flight_key = self._flight_key(
+            ai_model, provider, user_input, image_data, language, session_id if history else None
+        )
+        try:
+            response = self.single_flight.do(
+                flight_key, self._fetch_response, ai_model, provider, cache_ref, user_input, image_data, language,
+                history
+            )
+        except Exception as e:
+            return self._failure_message(ai_model, e)
+        self._remember(session_id, user_input, image_data, response)
+        return response
+    
+    def _fetch_response(self, ai_model, provider, cache_ref, user_input, image_data, language, history=None):
+        if provider == self.fallback:
+            return self._offline_chat(ai_model, user_input, image_data, language)
+        # Planned inside the flight, so coalesced duplicates are classified and trimmed once
+        budget = self.budgeter.plan(user_input, self._image_sent(ai_model, provider, image_data))
+        if ai_model == "auto":
+            response = self._race_chat(user_input, image_data, language, history, budget)
+        else:
+            response = self._timed_chat(provider, user_input, image_data, language, history=history, budget=budget)
+        self._store_response(cache_ref, user_input, response)
+        if self._should_degrade(ai_model, response):
+            return self._offline_chat(ai_model, user_input, image_data, language, response)
+        return response
+    
+    def _should_degrade(self, ai_model, response):
+        return ai_model == "auto" and self.fallback is not None and response.startswith('[ERROR]')
+    
+    def _offline_chat(self, ai_model, user_input, image_data, language, failure=None):
+        # The knowledge base answers when picked as "offline", and stands in for the auto router when
+        # no provider is configured or every attempt failed; failure is what the providers returned.
+        # These answers are never cached, so real ones come back as soon as a provider recovers.
+        adapter = self.registry[self.fallback]
+        with self.metrics.provider_call(self.fallback):
+            if ai_model != "auto":
+                return adapter.chat(user_input, image_data, language)
+            answer = adapter.fallback(user_input, image_data, language)
+        if answer is not None:
+            return answer
+        return failure or "[ERROR] No AI service available. Please add API keys."
+    
+    def _remember(self, session_id, user_input, image_data, response):
+        if session_id and response and not response.startswith('[ERROR]'):
+            question = user_input or 'Analyze this image'
+            self.sessions.append(session_id, f"{question} [image attached]" if image_data else question, response)
+    
+    def _cache_owner(self, ai_model, provider):
+        # Auto-mode answers may come from any configured provider, and the ranking shifts with latency,
+        # so they share entries keyed on 'auto' and the set of models instead of today's first choice
+        if ai_model == "auto":
+            return "auto", self._auto_models
+        return provider, self.registry[provider].model
+    
+    def _cache_lookup(self, ai_model, provider, user_input, image_data, language, history=None):
+        # Exact-match cache first, then the semantic near-duplicate tier.
+        # Returns (cache_ref, cached, image_data); image uploads come back decoded once.
+        # Follow-ups in a conversation depend on earlier turns, so they skip the caches entirely;
+        # their uploads are still decoded here, so a bad one is a client error, not a provider failure.
+        if history:
+            if image_data and images_supported():
+                with timed('image', 'decode'):
+                    image_data = self.images.get(image_data)
+            return None, None, image_data
+        lang_name = language_name(language)
+        provider, model = self._cache_owner(ai_model, provider)
+        if image_data:
+            return self._image_cache_lookup(provider, model, lang_name, user_input, image_data)
+        key = self.cache.make_key(provider, model, lang_name, user_input)
+        namespace = (provider, model, lang_name.lower())
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self.semantic_cache.lookup(namespace, user_input)
+        self.metrics.cache_lookup(cached is not None)
+        return ((key,), namespace), cached, None
+    
+    def _image_cache_lookup(self, provider, model, lang_name, user_input, image_data):
+        # Keyed on the upload's byte hash, so a hit needs no decode. Only identical uploads share an
+        # answer: two code screenshots can look alike at any thumbnail size yet differ in the one
+        # character the question is about.
+        if not images_supported():
+            return None, None, image_data
+        with timed('image', 'hash'):
+            digest = image_digest(image_data)
+        byte_key = self.cache.make_key(provider, model, lang_name, user_input, image_key=digest)
+        cached = self.cache.get(byte_key)
+        self.metrics.cache_lookup(cached is not None)
+        if cached is not None:
+            return None, cached, None
         
-        # Try Perplexity
-        if self.perplexity_key:
-            self.active_ai = 'perplexity'
-            print("[OK] Perplexity AI ready")
+        with timed('image', 'decode'):
+            image = self.images.get(image_data, digest)
+        return ((byte_key,), None), None, image
+    
+    async def _acache_lookup(self, ai_model, provider, user_input, image_data, language, history=None):
+        if image_data:
+            # Hashing and decoding an upload is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(
+                self._cache_lookup, ai_model, provider, user_input, image_data, language, history
+            )
+        return self._cache_lookup(ai_model, provider, user_input, image_data, language, history)
+    
+    def _flight_key(self, ai_model, provider, user_input, image_data, language, session_id=None):
+        # Auto mode may hedge to another provider or degrade to the offline answer and an explicit
+        # request does neither, so the two never share a flight even when they start at one provider
+        if isinstance(image_data, PreparedImage):
+            image_hash = image_data.digest
+        else:
+            image_hash = image_digest(image_data) if image_data else None
+        return (ai_model == "auto", provider, language.lower(), user_input, image_hash, session_id)
+    
+    def _store_response(self, cache_ref, user_input, response):
+        if cache_ref and response and not response.startswith('[ERROR]'):
+            keys, namespace = cache_ref
+            for key in keys:
+                self.cache.set(key, response)
+            if namespace:
+                self.semantic_cache.add(namespace, user_input, response)
+    
+    def _chat_provider(self, provider, user_input, image_data, language, history=None, budget=None):
+        return self.registry[provider].chat(user_input, image_data, language, history, budget)
+    
+    async def _achat_provider(self, provider, user_input, image_data, language, history=None, budget=None):
+        return await self.registry[provider].achat(user_input, image_data, language, history, budget)
+    
+    def _estimate_tokens(self, user_input, image_data, history):
+        tokens = estimate_tokens(user_input, bool(image_data))
+        return tokens + history.tokens if history else tokens
+    
+    def _timed_chat(self, provider, user_input, image_data, language, max_wait=None, history=None, budget=None):
+        # Waits for the provider's rate/concurrency budget first; being refused a slot is not
+        # a provider failure, so it is returned as an error without touching the router.
+        # The provider is sent the budget's trimmed question when there is one.
+        # A hedged attempt aborted because another provider answered first is not recorded either.
+        user_input = budget.text if budget else user_input
+        tokens = self._estimate_tokens(user_input, image_data, history)
+        queued = time.perf_counter()
+        try:
+            with self.scheduler.slot(provider, tokens, max_wait):
+                start = time.perf_counter()
+                self.metrics.record_queue(provider, start - queued)
+                if aborted():
+                    return f"[ERROR] {provider} was not called: another provider answered first"
+                try:
+                    with self.metrics.provider_call(provider):
+                        response = self._chat_provider(provider, user_input, image_data, language, history, budget)
+                except Exception as e:
+                    if not aborted():
+                        self._record_failure(provider, start, e)
+                    raise
+        except RateLimited as e:
+            self.metrics.provider_error(provider, 'rate_limited')
+            return f"[ERROR] {e}"
+        if aborted():
+            # Time until it lost is a lower bound on its latency, so a slow primary still ranks lower;
+            # it says nothing about errors, so the circuit breaker is left alone
+            self.provider_stats.record(provider, time.perf_counter() - start, True)
+        else:
+            self._record_response(provider, start, user_input, response, budget)
+        return response
+    
+    async def _atimed_chat(self, provider, user_input, image_data, language, max_wait=None, history=None,
+                           budget=None):
+        user_input = budget.text if budget else user_input
+        tokens = self._estimate_tokens(user_input, image_data, history)
+        queued = time.perf_counter()
+        try:
+            async with self.scheduler.aslot(provider, tokens, max_wait):
+                start = time.perf_counter()
+                self.metrics.record_queue(provider, start - queued)
+                try:
+                    with self.metrics.provider_call(provider):
+                        response = await self._achat_provider(
+                            provider, user_input, image_data, language, history, budget
+                        )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._record_failure(provider, start, e)
+                    raise
+        except RateLimited as e:
+            self.metrics.provider_error(provider, 'rate_limited')
+            return f"[ERROR] {e}"
+        self._record_response(provider, start, user_input, response, budget)
+        return response
+    
+    def _record_response(self, provider, start, user_input, response, budget=None):
+        seconds = time.perf_counter() - start
+        ok = not response.startswith('[ERROR]')
+        self.router.record(provider, seconds, ok=ok)
+        if ok:
+            self.metrics.count_text(provider, user_input, response)
+        self._record_budget(budget, seconds, response)
+    
+    def _record_budget(self, budget, seconds, response):
+        if budget is None:
             return
+        self.budgeter.record(budget, seconds, response)
+        if not response.startswith('[ERROR]'):
+            self.metrics.record_generation(budget.kind, seconds)
+    
+    def _record_failure(self, provider, start, error):
+        if is_quota_error(error):
+            self.scheduler.throttle(provider)
+        self.metrics.provider_failure(provider, error)
+        self.router.record(provider, time.perf_counter() - start, ok=False)
+    
+    def _image_sent(self, ai_model, provider, image_data):
+        # Whether an upload reaches the model: the auto race sends it to a vision-capable provider
+        # when there is one (_auto_candidates); otherwise it goes to this provider or nowhere
+        if not image_data or not images_supported():
+            return False
+        if ai_model == "auto":
+            return any(self.registry[name].supports_images for name in self.providers)
+        return self.registry[provider].supports_images
+    
+    def _auto_candidates(self, image_data):
+        # Only vision-capable providers read images, so image requests are never hedged to another provider
+        ranked = self.router.rank(self.providers)
+        self.active_ai = ranked[0]
+        if image_data:
+            vision = [provider for provider in self.providers if self.registry[provider].supports_images]
+            return vision[:1] or ranked[:1]
+        return ranked
+    
+    def _race_chat(self, user_input, image_data, language, history=None, budget=None):
+        # Backups are costed at the request's own output budget rather than the largest one
+        max_tokens = budget.max_tokens if budget else UNBUDGETED_MAX_TOKENS
+        candidates = self.hedge.plan(self._auto_candidates(image_data), max_tokens)
+        if len(candidates) == 1:
+            return self._timed_chat(candidates[0], user_input, image_data, language, history=history, budget=budget)
         
-        print("[ERROR] No AI available")
-
-    def chat(self, user_input, image_data=None, language="any", ai_model="auto"):
-        if not user_input and not image_data:
-            return "Please provide a question or upload an image."
+        # The primary runs on the caller's thread, so the hedge pool only limits how many backups run
+        # at once, never how many requests do. The first answer aborts the other attempts' requests.
+        race = threading.Condition()
+        attempts = []
+        state = {'winner': None, 'failure': None, 'finished': 0}
         
-        # If specific model selected, try that first
-        if ai_model != "auto":
+        def run(index, max_wait):
+            attempt = Attempt()
+            with race:
+                if state['winner'] is not None:
+                    return
+                attempts.append(attempt)
+            token = current_attempt.set(attempt)
             try:
-                if ai_model == 'gemini' and self.gemini_key:
-                    return self._chat_gemini(user_input, image_data, language)
-                elif ai_model == 'groq' and self.groq_key:
-                    return self._chat_groq(user_input, language)
-                elif ai_model == 'cohere' and self.cohere_key:
-                    return self._chat_cohere(user_input, language)
-                elif ai_model == 'huggingface' and self.hf_key:
-                    return self._chat_huggingface(user_input, language)
-                elif ai_model == 'deepseek' and self.deepseek_key:
-                    return self._chat_deepseek(user_input, language)
-                elif ai_model == 'openai' and self.openai_key:
-                    return self._chat_openai(user_input, language)
-                elif ai_model == 'perplexity' and self.perplexity_key:
-                    return self._chat_perplexity(user_input, language)
-                else:
-                    return f"[ERROR] {ai_model.title()} not available. Please check API key."
+                response = self._timed_chat(
+                    candidates[index], user_input, image_data, language, max_wait, history, budget
+                )
             except Exception as e:
-                return f"[ERROR] {ai_model.title()} error: {str(e)}"
+                response = self._failure_message("auto", e)
+            finally:
+                current_attempt.reset(token)
+            with race:
+                state['finished'] += 1
+                if response.startswith('[ERROR]'):
+                    state['failure'] = state['failure'] or response
+                elif state['winner'] is None:
+                    state['winner'] = response
+                    if index:
+                        self.hedge.record_hedge_win()
+                    for other in attempts:
+                        if other is not attempt:
+                            other.abort()
+                race.notify_all()
         
-        # Auto mode - try best available
-        if not self.active_ai:
-            return "[ERROR] No AI service available. Please add API keys."
+        def backup(index, deadline, finished):
+            # Starts once the hedge delay has passed or an attempt has failed since the previous start
+            with race:
+                failed = race.wait_for(
+                    lambda: state['winner'] is not None or state['finished'] > finished, deadline - time.monotonic()
+                )
+                if state['winner'] is not None:
+                    return
+                if not failed:
+                    self.hedge.record_hedge()
+                last = index == len(candidates) - 1
+                if not last:
+                    launch(index + 1)
+            run(index, None if last else self.hedge.delay)
         
-        try:
-            if self.active_ai == 'gemini':
-                return self._chat_gemini(user_input, image_data, language)
-            elif self.active_ai == 'groq':
-                return self._chat_groq(user_input, language)
-            elif self.active_ai == 'cohere':
-                return self._chat_cohere(user_input, language)
-            elif self.active_ai == 'huggingface':
-                return self._chat_huggingface(user_input, language)
-            elif self.active_ai == 'deepseek':
-                return self._chat_deepseek(user_input, language)
-            elif self.active_ai == 'openai':
-                return self._chat_openai(user_input, language)
-            elif self.active_ai == 'perplexity':
-                return self._chat_perplexity(user_input, language)
-        except Exception as e:
-            return f"[ERROR] Error: {str(e)}"
-    
-    def _chat_gemini(self, user_input, image_data, language):
-        if not self.model:
-            genai.configure(api_key=self.gemini_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
+        def launch(index):
+            # Run in a copy of this context so the attempt's time shows up in the request's timing
+            self._hedge_pool.submit(
+                contextvars.copy_context().run, backup, index, time.monotonic() + self.hedge.delay, state['finished']
+            )
         
-        # Map language codes to full names
-        lang_map = {
-            'cpp': 'C++',
-            'csharp': 'C#',
-            'javascript': 'JavaScript',
-            'typescript': 'TypeScript',
-            'python': 'Python',
-            'java': 'Java',
-            'go': 'Go',
-            'rust': 'Rust',
-            'php': 'PHP',
-            'ruby': 'Ruby',
-            'swift': 'Swift',
-            'kotlin': 'Kotlin',
-            'c': 'C'
-        }
+        # While a backup remains, an attempt that would queue past the hedge delay is refused
+        # at once so the race moves on to the backup instead of waiting
+        with race:
+            launch(1)
+        run(0, self.hedge.delay)
+        with race:
+            race.wait_for(lambda: state['winner'] is not None or state['finished'] == len(candidates))
+            return state['winner'] or state['failure']
+    
+    async def _arace_chat(self, user_input, image_data, language, history=None, budget=None):
+        max_tokens = budget.max_tokens if budget else UNBUDGETED_MAX_TOKENS
+        candidates = self.hedge.plan(self._auto_candidates(image_data), max_tokens)
+        if len(candidates) == 1:
+            return await self._atimed_chat(
+                candidates[0], user_input, image_data, language, history=history, budget=budget
+            )
         
-        lang_name = lang_map.get(language.lower(), language)
+        launched = {}
         
-        if language != "any":
-            lang_context = f"Write code ONLY in {lang_name}. Provide complete working code with explanation."
-        else:
-            lang_context = "Provide complete working code with explanation."
+        def launch(provider, max_wait):
+            task = asyncio.ensure_future(
+                self._atimed_chat(provider, user_input, image_data, language, max_wait, history, budget)
+            )
+            launched[task] = provider
+            return task
         
-        if image_data and Image:
-            image_bytes = base64.b64decode(image_data.split(',')[1])
-            image = Image.open(io.BytesIO(image_bytes))
-            prompt = f"{lang_context}\n\nUser request: {user_input or 'Analyze this code'}"
-            response = self.model.generate_content([prompt, image])
-        else:
-            prompt = f"{lang_context}\n\nUser request: {user_input}\n\nProvide complete code and explanation."
-            response = self.model.generate_content(prompt)
+        pending = {launch(candidates[0], self.hedge.delay)}
+        remaining = candidates[1:]
+        failure = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=self.hedge.delay if remaining else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        response = self._failure_message("auto", e)
+                    if not response.startswith('[ERROR]'):
+                        if launched[task] != candidates[0]:
+                            self.hedge.record_hedge_win()
+                        return response
+                    failure = failure or response
+                if remaining:
+                    if not done:
+                        self.hedge.record_hedge()
+                    provider = remaining.pop(0)
+                    pending.add(launch(provider, self.hedge.delay if remaining else None))
+            return failure
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _resolve_provider(self, ai_model, image_data=None):
+        # Streams start on one provider, so an auto-mode upload goes to the best vision-capable one,
+        # as _race_chat does; /chat passes no image here since its race picks the provider itself
+        if ai_model != "auto":
+            if ai_model not in self.registry:
+                return None, f"[ERROR] {ai_model.title()} not available. Please check API key."
+            return ai_model, None
         
-        return response.text
+        if not self.providers:
+            if self.fallback:
+                return self.fallback, None
+            return None, "[ERROR] No AI service available. Please add API keys."
+        if image_data:
+            return self._auto_candidates(image_data)[0], None
+        return self.router.rank(self.providers)[0], None
+    
+    def _stream_candidates(self, ai_model, provider, image_data):
+        # Providers a stream tries in turn until one sends something: in auto mode the rest of the
+        # ranking follows the first choice, except for uploads, which stay on the vision provider
+        if ai_model != "auto" or image_data:
+            return [provider]
+        return [provider] + [name for name in self.router.rank(self.providers) if name != provider]
+    
+    def _record_stream(self, provider, start, budget, parts, failure):
+        # Router outcome and latency of one streamed attempt, as _timed_chat records a /chat call;
+        # an error can also arrive as the last chunk after some text
+        if failure is None and parts and parts[-1].startswith('[ERROR]'):
+            failure = parts[-1]
+        self._record_response(provider, start, budget.text, failure or ''.join(parts), budget)
+    
+    def _failure_message(self, ai_model, error):
+        if ai_model != "auto":
+            return f"[ERROR] {ai_model.title()} error: {str(error)}"
+        return f"[ERROR] Error: {str(error)}"
     
-    def _chat_groq(self, user_input, language):
-        lang_map = {'cpp': 'C++', 'csharp': 'C#', 'javascript': 'JavaScript', 'typescript': 'TypeScript', 'python': 'Python', 'java': 'Java', 'go': 'Go', 'rust': 'Rust', 'php': 'PHP', 'ruby': 'Ruby', 'swift': 'Swift', 'kotlin': 'Kotlin', 'c': 'C'}
-        lang_name = lang_map.get(language.lower(), language)
+    async def achat(self, user_input, image_data=None, language="any", ai_model="auto", session_id=None):
+        if not user_input and not image_data:
+            return "Please provide a question or upload an image."
         
-        if language != "any":
-            prompt = f"You are a {lang_name} programming expert. Provide complete working code with explanation. User question: {user_input}"
-        else:
-            prompt = f"You are a programming expert. Provide complete working code with explanation. User question: {user_input}"
+        provider, error = self._resolve_provider(ai_model)
+        if error:
+            return error
         
+        history = self.sessions.history(session_id)
         try:
-            response = requests.post(
-                'https://api.groq.com/openai/v1/chat/completions',
-                headers={'Authorization': f'Bearer {self.groq_key}', 'Content-Type': 'application/json'},
-                json={
-                    'model': 'llama-3.3-70b-versatile',
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 2048,
-                    'temperature': 0.7
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                return f"[ERROR] Groq API error {response.status_code}: {response.text}"
-        except Exception as e:
-            return f"[ERROR] Groq connection error: {str(e)}"
-    
-    def _chat_cohere(self, user_input, language):
-        lang_map = {'cpp': 'C++', 'csharp': 'C#', 'javascript': 'JavaScript', 'typescript': 'TypeScript', 'python': 'Python', 'java': 'Java', 'go': 'Go', 'rust': 'Rust', 'php': 'PHP', 'ruby': 'Ruby', 'swift': 'Swift', 'kotlin': 'Kotlin', 'c': 'C'}
-        lang_name = lang_map.get(language.lower(), language)
-        
-        if language != "any":
-            prompt = f"You are a {lang_name} programming expert. Provide complete working code with explanation. User question: {user_input}"
-        else:
-            prompt = f"You are a programming expert. Provide complete working code with explanation. User question: {user_input}"
+            with timed('cache'):
+                cache_ref, cached, image_data = await self._acache_lookup(
+                    ai_model, provider, user_input, image_data, language, history
+                )
+        except ImageIngestError as e:
+            return f"[ERROR] {e}"
+        if cached is not None:
+            self._remember(session_id, user_input, image_data, cached)
+            return cached
         
+        flight_key = self._flight_key(
+            ai_model, provider, user_input, image_data, language, session_id if history else None
+        )
         try:
-            response = requests.post(
-                'https://api.cohere.com/v1/chat',
-                headers={'Authorization': f'Bearer {self.cohere_key}', 'Content-Type': 'application/json'},
-                json={
-                    'model': 'command',
-                    'message': prompt,
-                    'max_tokens': 2048,
-                    'temperature': 0.7
-                },
-                timeout=30
+            response = await self.async_single_flight.do(
+                flight_key, self._afetch_response, ai_model, provider, cache_ref, user_input, image_data, language,
+                history
             )
-            
-            if response.status_code == 200:
-                return response.json()['text']
-            else:
-                return f"[ERROR] Cohere API error {response.status_code}: {response.text}"
         except Exception as e:
-            return f"[ERROR] Cohere connection error: {str(e)}"
+            return self._failure_message(ai_model, e)
+        self._remember(session_id, user_input, image_data, response)
+        return response
     
-    def _chat_huggingface(self, user_input, language):
-        lang_map = {'cpp': 'C++', 'csharp': 'C#', 'javascript': 'JavaScript', 'typescript': 'TypeScript', 'python': 'Python', 'java': 'Java', 'go': 'Go', 'rust': 'Rust', 'php': 'PHP', 'ruby': 'Ruby', 'swift': 'Swift', 'kotlin': 'Kotlin', 'c': 'C'}
-        lang_name = lang_map.get(language.lower(), language)
-        
-        if language != "any":
-            prompt = f"You are a {lang_name} programming expert. Provide complete working code with explanation. User question: {user_input}"
+    async def _afetch_response(self, ai_model, provider, cache_ref, user_input, image_data, language, history=None):
+        if provider == self.fallback:
+            return self._offline_chat(ai_model, user_input, image_data, language)
+        budget = self.budgeter.plan(user_input, self._image_sent(ai_model, provider, image_data))
+        if ai_model == "auto":
+            response = await self._arace_chat(user_input, image_data, language, history, budget)
         else:
-            prompt = f"You are a programming expert. Provide complete working code with explanation. User question: {user_input}"
-        
-        try:
-            response = requests.post(
-                'https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1',
-                headers={'Authorization': f'Bearer {self.hf_key}', 'Content-Type': 'application/json'},
-                json={'inputs': prompt, 'parameters': {'max_new_tokens': 2048, 'return_full_text': False}},
-                timeout=60
+            response = await self._atimed_chat(
+                provider, user_input, image_data, language, history=history, budget=budget
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    return result[0].get('generated_text', '').replace(prompt, '').strip()
-                return str(result)
-            else:
-                return f"[ERROR] HuggingFace API error {response.status_code}: {response.text}"
-        except Exception as e:
-            return f"[ERROR] HuggingFace connection error: {str(e)}"
+        self._store_response(cache_ref, user_input, response)
+        if self._should_degrade(ai_model, response):
+            return self._offline_chat(ai_model, user_input, image_data, language, response)
+        return response
     
-    def _chat_deepseek(self, user_input, language):
-        lang_map = {'cpp': 'C++', 'csharp': 'C#', 'javascript': 'JavaScript', 'typescript': 'TypeScript', 'python': 'Python', 'java': 'Java', 'go': 'Go', 'rust': 'Rust', 'php': 'PHP', 'ruby': 'Ruby', 'swift': 'Swift', 'kotlin': 'Kotlin', 'c': 'C'}
-        lang_name = lang_map.get(language.lower(), language)
+    def stream_chat(self, user_input, image_data=None, language="any", ai_model="auto", session_id=None):
+        if not user_input and not image_data:
+            yield "Please provide a question or upload an image."
+            return
         
-        if language != "any":
-            prompt = f"You are a {lang_name} programming expert. Provide complete working code with explanation. User question: {user_input}"
-        else:
-            prompt = f"You are a programming expert. Provide complete working code with explanation. User question: {user_input}"
+        provider, error = self._resolve_provider(ai_model, image_data)
+        if error:
+            yield error
+            return
         
+        history = self.sessions.history(session_id)
         try:
-            response = requests.post(
-                'https://api.deepseek.com/chat/completions',
-                headers={'Authorization': f'Bearer {self.deepseek_key}', 'Content-Type': 'application/json'},
-                json={
-                    'model': 'deepseek-chat',
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 2048,
-                    'temperature': 0.7
-                },
-                timeout=30
+            cache_ref, cached, image_data = self._cache_lookup(
+                ai_model, provider, user_input, image_data, language, history
             )
-            
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                return f"[ERROR] DeepSeek API error {response.status_code}: {response.text}"
-        except Exception as e:
-            return f"[ERROR] DeepSeek connection error: {str(e)}"
-    
-    def _chat_openai(self, user_input, language):
-        lang_map = {'cpp': 'C++', 'csharp': 'C#', 'javascript': 'JavaScript', 'typescript': 'TypeScript', 'python': 'Python', 'java': 'Java', 'go': 'Go', 'rust': 'Rust', 'php': 'PHP', 'ruby': 'Ruby', 'swift': 'Swift', 'kotlin': 'Kotlin', 'c': 'C'}
-        lang_name = lang_map.get(language.lower(), language)
+        except ImageIngestError as e:
+            yield f"[ERROR] {e}"
+            return
+        if cached is not None:
+            self._remember(session_id, user_input, image_data, cached)
+            yield cached
+            return
+        if provider == self.fallback:
+            answer = self._offline_chat(ai_model, user_input, image_data, language)
+            self._remember(session_id, user_input, image_data, answer)
+            yield answer
+            return
         
-        if language != "any":
-            prompt = f"You are a {lang_name} programming expert. Provide complete working code with explanation. User question: {user_input}"
-        else:
-            prompt = f"You are a programming expert. Provide complete working code with explanation. User question: {user_input}"
+        # In auto mode a provider that fails before sending anything hands the question to the next
+        # one, and the offline answer stands in when they all fail
+        budget = self.budgeter.plan(user_input, self._image_sent(ai_model, provider, image_data))
+        tokens = self._estimate_tokens(budget.text, image_data, history)
+        parts = []
+        for provider in self._stream_candidates(ai_model, provider, image_data):
+            failure = None
+            try:
+                with self.scheduler.slot(provider, tokens):
+                    start = time.perf_counter()
+                    try:
+                        with self.metrics.provider_call(provider):
+                            chunks = self.registry[provider].stream(
+                                budget.text, image_data, language, history, budget
+                            )
+                            for chunk in chunks:
+                                if not parts and ai_model == "auto" and chunk.startswith('[ERROR]'):
+                                    failure = chunk
+                                    break
+                                parts.append(chunk)
+                                yield chunk
+                    except Exception as e:
+                        self._record_failure(provider, start, e)
+                        failure = self._failure_message(ai_model, e)
+                    else:
+                        self._record_stream(provider, start, budget, parts, failure)
+            except RateLimited as e:
+                self.metrics.provider_error(provider, 'rate_limited')
+                failure = f"[ERROR] {e}"
+            if parts or not failure:
+                break
+        if failure:
+            if not parts and self._should_degrade(ai_model, failure):
+                failure = self._offline_chat(ai_model, user_input, image_data, language, failure)
+                # Kept in the session as /chat does; errors are not
+                self._remember(session_id, user_input, image_data, failure)
+            yield failure
+            return
         
-        try:
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={'Authorization': f'Bearer {self.openai_key}', 'Content-Type': 'application/json'},
-                json={
-                    'model': 'gpt-4o-mini',
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 2048,
-                    'temperature': 0.7
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                return f"[ERROR] OpenAI API error {response.status_code}: {response.text}"
-        except Exception as e:
-            return f"[ERROR] OpenAI connection error: {str(e)}"
+        if parts and not parts[-1].startswith('[ERROR]'):
+            response = ''.join(parts)
+            self._store_response(cache_ref, user_input, response)
+            self._remember(session_id, user_input, image_data, response)
     
-    def _chat_perplexity(self, user_input, language):
-        lang_map = {'cpp': 'C++', 'csharp': 'C#', 'javascript': 'JavaScript', 'typescript': 'TypeScript', 'python': 'Python', 'java': 'Java', 'go': 'Go', 'rust': 'Rust', 'php': 'PHP', 'ruby': 'Ruby', 'swift': 'Swift', 'kotlin': 'Kotlin', 'c': 'C'}
-        lang_name = lang_map.get(language.lower(), language)
+    async def astream_chat(self, user_input, image_data=None, language="any", ai_model="auto", session_id=None):
+        if not user_input and not image_data:
+            yield "Please provide a question or upload an image."
+            return
         
-        if language != "any":
-            prompt = f"You are a {lang_name} programming expert. Provide complete working code with explanation. User question: {user_input}"
-        else:
-            prompt = f"You are a programming expert. Provide complete working code with explanation. User question: {user_input}"
+        provider, error = self._resolve_provider(ai_model, image_data)
+        if error:
+            yield error
+            return
         
+        history = self.sessions.history(session_id)
         try:
-            response = requests.post(
-                'https://api.perplexity.ai/chat/completions',
-                headers={'Authorization': f'Bearer {self.perplexity_key}', 'Content-Type': 'application/json'},
-                json={
-                    'model': 'llama-3.1-sonar-small-128k-online',
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 2048,
-                    'temperature': 0.7
-                },
-                timeout=30
+            cache_ref, cached, image_data = await self._acache_lookup(
+                ai_model, provider, user_input, image_data, language, history
             )
-            
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                return f"[ERROR] Perplexity API error {response.status_code}: {response.text}"
-        except Exception as e:
-            return f"[ERROR] Perplexity connection error: {str(e)}"
+        except ImageIngestError as e:
+            yield f"[ERROR] {e}"
+            return
+        if cached is not None:
+            self._remember(session_id, user_input, image_data, cached)
+            yield cached
+            return
+        if provider == self.fallback:
+            answer = self._offline_chat(ai_model, user_input, image_data, language)
+            self._remember(session_id, user_input, image_data, answer)
+            yield answer
+            return
+        
+        # In auto mode a provider that fails before sending anything hands the question to the next
+        # one, and the offline answer stands in when they all fail
+        budget = self.budgeter.plan(user_input, self._image_sent(ai_model, provider, image_data))
+        tokens = self._estimate_tokens(budget.text, image_data, history)
+        parts = []
+        for provider in self._stream_candidates(ai_model, provider, image_data):
+            failure = None
+            try:
+                async with self.scheduler.aslot(provider, tokens):
+                    start = time.perf_counter()
+                    try:
+                        with self.metrics.provider_call(provider):
+                            chunks = self.registry[provider].astream(
+                                budget.text, image_data, language, history, budget
+                            )
+                            async for chunk in chunks:
+                                if not parts and ai_model == "auto" and chunk.startswith('[ERROR]'):
+                                    failure = chunk
+                                    break
+                                parts.append(chunk)
+                                yield chunk
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self._record_failure(provider, start, e)
+                        failure = self._failure_message(ai_model, e)
+                    else:
+                        self._record_stream(provider, start, budget, parts, failure)
+            except RateLimited as e:
+                self.metrics.provider_error(provider, 'rate_limited')
+                failure = f"[ERROR] {e}"
+            if parts or not failure:
+                break
+        if failure:
+            if not parts and self._should_degrade(ai_model, failure):
+                failure = self._offline_chat(ai_model, user_input, image_data, language, failure)
+                # Kept in the session as /chat does; errors are not
+                self._remember(session_id, user_input, image_data, failure)
+            yield failure
+            return
+        
+        if parts and not parts[-1].startswith('[ERROR]'):
+            response = ''.join(parts)
+            self._store_response(cache_ref, user_input, response)
+            self._remember(session_id, user_input, image_data, response)
+    
+    def chat_batch(self, items):
+        # items come from self.batches.parse(); yields NDJSON lines as answers finish
+        return self.batches.run(self.chat, items)
+    
+    def achat_batch(self, items):
+        return self.batches.arun(self.achat, items)
     
     def get_status(self):
-        if self.active_ai == 'gemini':
-            return "Gemini AI"
-        elif self.active_ai == 'groq':
-            return "Groq AI"
-        elif self.active_ai == 'cohere':
-            return "Cohere AI"
-        elif self.active_ai == 'huggingface':
-            return "HuggingFace AI"
-        elif self.active_ai == 'deepseek':
-            return "DeepSeek AI"
-        elif self.active_ai == 'openai':
-            return "OpenAI"
-        elif self.active_ai == 'perplexity':
-            return "Perplexity AI"
-        else:
-            return "Offline"
+        if self.active_ai is None:
+            return self.registry[self.fallback].display_name if self.fallback else "Offline"
+        return self.registry[self.active_ai].display_name
+    
+    def get_cache_stats(self):
+        stats = self.cache.get_stats()
+        stats['semantic'] = self.semantic_cache.get_stats()
+        stats['images'] = self.images.get_stats()
+        return stats
+    
+    def get_session_stats(self):
+        return self.sessions.get_stats()
+    
+    def get_batch_stats(self):
+        return self.batches.get_stats()
+    
+    def get_knowledge_stats(self):
+        if self.fallback is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.registry[self.fallback].get_stats()}
+    
+    def get_budget_stats(self):
+        return self.budgeter.get_stats()
+    
+    def get_provider_stats(self):
+        return self.router.snapshot()
+    
+    def get_hedge_stats(self):
+        return self.hedge.get_stats()
+    
+    def get_coalescing_stats(self):
+        sync_stats = self.single_flight.get_stats()
+        async_stats = self.async_single_flight.get_stats()
+        return {name: sync_stats[name] + async_stats[name] for name in sync_stats}
+    
+    def get_scheduler_stats(self):
+        return self.scheduler.get_stats()
+    
+    def get_metrics(self):
+        # Prometheus text format; rate-limit queues and coalescing counts are read at scrape time
+        self.metrics.collect_scheduler(self.scheduler.get_stats())
+        self.metrics.collect_coalescing(self.get_coalescing_stats())
+        return self.metrics.render()
+    
+    def get_transport_stats(self):
+        return {'sync': self.transport.get_stats(), 'async': self.async_transport.get_stats()}
     
     @property
     def use_gemini(self):
@@ -0,0 +1,68 @@
+from functools import lru_cache
+
+LANG_MAP = {
+    'cpp': 'C++',
+    'csharp': 'C#',
+    'javascript': 'JavaScript',
+    'typescript': 'TypeScript',
+    'python': 'Python',
+    'java': 'Java',
+    'go': 'Go',
+    'rust': 'Rust',
+    'php': 'PHP',
+    'ruby': 'Ruby',
+    'swift': 'Swift',
+    'kotlin': 'Kotlin',
+    'c': 'C'
+}
+
+CODE_REQUEST = "Provide complete working code with explanation."
+
+# What the model is asked for, per request class (request_budget.py). Short instructions for short
+# budgets: a model told to write complete code writes it even for a one-line concept question.
+REQUESTS = {
+    'concept': "Explain concisely, with a short example only if it helps.",
+    'codegen': CODE_REQUEST,
+    'debug': "Find the problem in the user's code, explain it briefly and show only the corrected parts.",
+    'image': "Explain the code in the image and point out any errors, with corrected code where needed."
+}
+
+
+def language_name(language):
+    return LANG_MAP.get(language.lower(), language)
+
+
+# Prompt prefixes are built once per language and request class rather than on every request
+
+@lru_cache(maxsize=128)
+def expert_preamble(language, kind='codegen'):
+    if language != "any":
+        return f"You are a {language_name(language)} programming expert. {REQUESTS[kind]} User question: "
+    return f"You are a programming expert. {REQUESTS[kind]} User question: "
+
+
+@lru_cache(maxsize=128)
+def gemini_context(language, kind='codegen'):
+    if language != "any":
+        return f"Write code ONLY in {language_name(language)}. {REQUESTS[kind]}"
+    return REQUESTS[kind]
+
+
+def expert_prompt(user_input, language, kind='codegen'):
+    return f"{expert_preamble(language, kind)}{user_input}"
+
+
+def gemini_prompt(user_input, language, image=False, kind='codegen'):
+    if image:
+        return f"{gemini_context(language, kind)}\n\nUser request: {user_input or 'Analyze this code'}"
+    if kind != 'codegen':
+        return f"{gemini_context(language, kind)}\n\nUser request: {user_input}"
+    return f"{gemini_context(language, kind)}\n\nUser request: {user_input}\n\nProvide complete code and explanation."
+
+
+def code_review_prompt(code):
+    # For code that passed the local syntax checks (java_analyzer.py)
+    return (
+        "Review this Java code. It passed a basic syntax check, so look for logic errors, runtime "
+        f"exceptions and unclear style, and show the corrected lines.\n\n```java\n{code}\n```"
+    )
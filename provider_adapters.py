@@ -0,0 +1,524 @@
+import json
+import os
+import threading
+
+from image_ingest import PreparedImage, images_supported, prepare_image
+from knowledge_base import KnowledgeBase
+from lazy_imports import is_installed, optional_import
+from metrics import timed
+from prompts import expert_prompt, gemini_prompt
+from provider_transport import aborted
+
+DEFAULT_MAX_TOKENS = 2048
+
+# Built-in providers in auto-mode priority order. Any of them can be pointed at another
+# endpoint or model with <NAME>_BASE_URL / <NAME>_MODEL, e.g. GROQ_BASE_URL=http://localhost:8001/v1
+BUILTIN_PROVIDERS = {
+    'gemini': {
+        'format': 'gemini',
+        'label': 'Gemini',
+        'display_name': 'Gemini AI',
+        'model': 'gemini-2.5-flash'
+    },
+    'groq': {
+        'format': 'openai',
+        'label': 'Groq',
+        'display_name': 'Groq AI',
+        'base_url': 'https://api.groq.com/openai/v1',
+        'model': 'llama-3.3-70b-versatile'
+    },
+    'cohere': {
+        'format': 'cohere',
+        'label': 'Cohere',
+        'display_name': 'Cohere AI',
+        'base_url': 'https://api.cohere.com/v1',
+        'model': 'command'
+    },
+    'huggingface': {
+        'format': 'huggingface',
+        'label': 'HuggingFace',
+        'display_name': 'HuggingFace AI',
+        'base_url': 'https://api-inference.huggingface.co/models',
+        'model': 'mistralai/Mixtral-8x7B-Instruct-v0.1',
+        'read_timeout': 60
+    },
+    'deepseek': {
+        'format': 'openai',
+        'label': 'DeepSeek',
+        'display_name': 'DeepSeek AI',
+        'base_url': 'https://api.deepseek.com',
+        'model': 'deepseek-chat'
+    },
+    'openai': {
+        'format': 'openai',
+        'label': 'OpenAI',
+        'display_name': 'OpenAI',
+        'base_url': 'https://api.openai.com/v1',
+        'model': 'gpt-4o-mini'
+    },
+    'perplexity': {
+        'format': 'openai',
+        'label': 'Perplexity',
+        'display_name': 'Perplexity AI',
+        'base_url': 'https://api.perplexity.ai',
+        'model': 'llama-3.1-sonar-small-128k-online'
+    }
+}
+
+# The API key variable for a built-in provider, when it isn't <NAME>_API_KEY
+API_KEY_ENV = {'huggingface': 'HUGGINGFACE_API_KEY'}
+
+
+class HTTPAdapter:
+    # Shared call logic for providers reached over HTTP; subclasses supply the wire format
+    supports_images = False
+    fallback_only = False
+
+    def __init__(self, name, label, base_url, model, api_key=None, display_name=None, read_timeout=None,
+                 transport=None, async_transport=None, on_throttle=None, on_error=None):
+        self.name = name
+        self.label = label
+        self.model = model
+        self.url = self.endpoint(base_url.rstrip('/'), model)
+        self.display_name = display_name or label
+        self.read_timeout = read_timeout
+        self.transport = transport
+        self.async_transport = async_transport
+        self.on_throttle = on_throttle
+        self.on_error = on_error
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['Authorization'] = f'Bearer {api_key}'
+
+    def endpoint(self, base_url, model):
+        raise NotImplementedError
+
+    def build_payload(self, prompt, max_tokens, history=None):
+        # history is a session_store.History of earlier turns, or None for a one-off question
+        raise NotImplementedError
+
+    def parse_result(self, prompt, result):
+        raise NotImplementedError
+
+    def parse_stream_line(self, line):
+        # Returns (text, done) for one line of the provider's streaming response
+        raise NotImplementedError
+
+    def build_request(self, user_input, language, stream=False, max_tokens=DEFAULT_MAX_TOKENS, history=None,
+                      budget=None):
+        # budget is the request_budget.Budget the assistant planned; it overrides max_tokens
+        kind = 'codegen'
+        if budget is not None:
+            kind, max_tokens = budget.template, budget.max_tokens
+        with timed('prompt'):
+            prompt = expert_prompt(user_input, language, kind)
+            payload = self.build_payload(prompt, max_tokens, history)
+        if stream:
+            payload['stream'] = True
+        return prompt, payload
+
+    def parse_response(self, prompt, response):
+        if response.status_code != 200:
+            return f"[ERROR] {self.label} API error {response.status_code}: {response.text}"
+        return self.parse_result(prompt, response.json())
+
+    def _read_timeout(self, transport):
+        if self.read_timeout is not None:
+            return max(transport.read_timeout, self.read_timeout)
+        return None
+
+    def _observe(self, response):
+        if response.status_code >= 400 and self.on_error:
+            self.on_error(self.name, response.status_code)
+        if response.status_code == 429 and self.on_throttle:
+            self.on_throttle(self.name, response.headers.get('Retry-After'))
+
+    def _connection_error(self, error):
+        # A hedged attempt whose socket was shut down because another provider won is not a provider error
+        if self.on_error and not aborted():
+            self.on_error(self.name, 'connection')
+        return f"[ERROR] {self.label} connection error: {str(error)}"
+
+    def _is_json(self, response):
+        return response.status_code != 200 or response.headers.get('Content-Type', '').startswith('application/json')
+
+    def chat(self, user_input, image_data, language, history=None, budget=None):
+        prompt, payload = self.build_request(user_input, language, history=history, budget=budget)
+        try:
+            response = self.transport.post(
+                self.url, headers=self.headers, json=payload, read_timeout=self._read_timeout(self.transport)
+            )
+            self._observe(response)
+            return self.parse_response(prompt, response)
+        except Exception as e:
+            return self._connection_error(e)
+
+    async def achat(self, user_input, image_data, language, history=None, budget=None):
+        prompt, payload = self.build_request(user_input, language, history=history, budget=budget)
+        try:
+            response = await self.async_transport.post(
+                self.url, headers=self.headers, json=payload, read_timeout=self._read_timeout(self.async_transport)
+            )
+            self._observe(response)
+            return self.parse_response(prompt, response)
+        except Exception as e:
+            return self._connection_error(e)
+
+    def stream(self, user_input, image_data, language, history=None, budget=None):
+        prompt, payload = self.build_request(user_input, language, stream=True, history=history, budget=budget)
+        try:
+            with self.transport.stream(
+                self.url, headers=self.headers, json=payload, read_timeout=self._read_timeout(self.transport)
+            ) as response:
+                if self._is_json(response):
+                    self._observe(response)
+                    yield self.parse_response(prompt, response)
+                    return
+                response.encoding = response.encoding or 'utf-8'
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    text, done = self.parse_stream_line(line)
+                    if text:
+                        yield text
+                    if done:
+                        return
+        except Exception as e:
+            yield self._connection_error(e)
+
+    async def astream(self, user_input, image_data, language, history=None, budget=None):
+        prompt, payload = self.build_request(user_input, language, stream=True, history=history, budget=budget)
+        try:
+            async with self.async_transport.stream(
+                self.url, headers=self.headers, json=payload, read_timeout=self._read_timeout(self.async_transport)
+            ) as response:
+                if self._is_json(response):
+                    await response.aread()
+                    self._observe(response)
+                    yield self.parse_response(prompt, response)
+                    return
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    text, done = self.parse_stream_line(line)
+                    if text:
+                        yield text
+                    if done:
+                        return
+        except Exception as e:
+            yield self._connection_error(e)
+
+    def warm_up(self, asynchronous=False):
+        transport = self.async_transport if asynchronous else self.transport
+        if transport is not None:
+            transport.prepare(self.url)
+
+    def probe(self):
+        prompt, payload = self.build_request('Hi', 'any', max_tokens=1)
+        response = self.transport.post(self.url, headers=self.headers, json=payload)
+        return response.status_code == 200
+
+
+def _sse_event(line):
+    # (event, done) for one "data: ..." server-sent event line; other lines carry no event
+    if not line.startswith('data:'):
+        return None, False
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return None, True
+    return json.loads(data), False
+
+
+class OpenAICompatibleAdapter(HTTPAdapter):
+    # Groq, DeepSeek, OpenAI, Perplexity and any local server speaking /chat/completions
+    def endpoint(self, base_url, model):
+        return f'{base_url}/chat/completions'
+
+    def build_payload(self, prompt, max_tokens, history=None):
+        messages = []
+        if history:
+            if history.summary:
+                messages.append({'role': 'system', 'content': history.summary_text()})
+            messages.extend({'role': turn.role, 'content': turn.text} for turn in history.turns)
+        messages.append({'role': 'user', 'content': prompt})
+        return {
+            'model': self.model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': 0.7
+        }
+
+    def parse_result(self, prompt, result):
+        return result['choices'][0]['message']['content']
+
+    def parse_stream_line(self, line):
+        event, done = _sse_event(line)
+        if event is None:
+            return '', done
+        choices = event.get('choices') or [{}]
+        return choices[0].get('delta', {}).get('content') or '', False
+
+
+class CohereAdapter(HTTPAdapter):
+    def endpoint(self, base_url, model):
+        return f'{base_url}/chat'
+
+    def build_payload(self, prompt, max_tokens, history=None):
+        payload = {'model': self.model, 'message': prompt, 'max_tokens': max_tokens, 'temperature': 0.7}
+        if history:
+            chat_history = [{'role': 'SYSTEM', 'message': history.summary_text()}] if history.summary else []
+            chat_history.extend(
+                {'role': 'USER' if turn.role == 'user' else 'CHATBOT', 'message': turn.text} for turn in history.turns
+            )
+            payload['chat_history'] = chat_history
+        return payload
+
+    def parse_result(self, prompt, result):
+        return result['text']
+
+    def parse_stream_line(self, line):
+        event = json.loads(line)
+        if event.get('event_type') == 'text-generation':
+            return event.get('text', ''), False
+        return '', event.get('event_type') == 'stream-end'
+
+
+class HuggingFaceAdapter(HTTPAdapter):
+    def endpoint(self, base_url, model):
+        return f'{base_url}/{model}'
+
+    def build_payload(self, prompt, max_tokens, history=None):
+        # Text generation has no chat structure, so earlier turns go in front of the prompt
+        inputs = f"{history.transcript()}\n\n{prompt}" if history else prompt
+        return {'inputs': inputs, 'parameters': {'max_new_tokens': max_tokens, 'return_full_text': False}}
+
+    def parse_result(self, prompt, result):
+        if isinstance(result, list) and len(result) > 0:
+            return result[0].get('generated_text', '').replace(prompt, '').strip()
+        return str(result)
+
+    def parse_stream_line(self, line):
+        event, done = _sse_event(line)
+        if event is None:
+            return '', done
+        token = event.get('token') or {}
+        if token.get('special'):
+            return '', False
+        return token.get('text', ''), False
+
+
+class GeminiAdapter:
+    supports_images = True
+    fallback_only = False
+
+    def __init__(self, name, label, model, api_key=None, display_name=None, **http_options):
+        # base_url, read_timeout, the transports and the status hooks only apply to HTTP adapters; SDK
+        # errors are raised to the caller instead
+        self.name = name
+        self.label = label
+        self.model = model
+        self.display_name = display_name or label
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        # The SDK is imported and configured on first use (a request or health probe), not at startup
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    genai = optional_import('google.generativeai')
+                    genai.configure(api_key=self.api_key)
+                    self._client = genai.GenerativeModel(self.model)
+        return self._client
+
+    def request(self, user_input, image_data, language, kind='codegen'):
+        with timed('prompt'):
+            if image_data and images_supported():
+                image = image_data.blob if isinstance(image_data, PreparedImage) else prepare_image(image_data)
+                return [gemini_prompt(user_input, language, image=True, kind=kind), image]
+            return gemini_prompt(user_input, language, kind=kind)
+
+    def chat_history(self, history):
+        # start_chat history; the summary becomes an opening exchange since Gemini chats have no system turn
+        turns = []
+        if history.summary:
+            turns.append({'role': 'user', 'parts': [history.summary_text()]})
+            turns.append({'role': 'model', 'parts': ['Understood.']})
+        turns.extend({'role': 'user' if turn.role == 'user' else 'model', 'parts': [turn.text]} for turn in history.turns)
+        return turns
+
+    def _options(self, budget, options):
+        # The prompt's request class, and the SDK options with the budget's output limit
+        if budget is None:
+            return 'codegen', options
+        return budget.template, {**options, 'generation_config': {'max_output_tokens': budget.max_tokens}}
+
+    def generate(self, user_input, image_data, language, history=None, budget=None, **options):
+        kind, options = self._options(budget, options)
+        request = self.request(user_input, image_data, language, kind)
+        if history:
+            return self.client().start_chat(history=self.chat_history(history)).send_message(request, **options)
+        return self.client().generate_content(request, **options)
+
+    async def agenerate(self, user_input, image_data, language, history=None, budget=None, **options):
+        kind, options = self._options(budget, options)
+        request = self.request(user_input, image_data, language, kind)
+        if history:
+            chat = self.client().start_chat(history=self.chat_history(history))
+            return await chat.send_message_async(request, **options)
+        return await self.client().generate_content_async(request, **options)
+
+    def chat(self, user_input, image_data, language, history=None, budget=None):
+        return self.generate(user_input, image_data, language, history, budget).text
+
+    async def achat(self, user_input, image_data, language, history=None, budget=None):
+        response = await self.agenerate(user_input, image_data, language, history, budget)
+        return response.text
+
+    def stream(self, user_input, image_data, language, history=None, budget=None):
+        for chunk in self.generate(user_input, image_data, language, history, budget, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    async def astream(self, user_input, image_data, language, history=None, budget=None):
+        response = await self.agenerate(user_input, image_data, language, history, budget, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def warm_up(self, asynchronous=False):
+        self.client()
+
+    def probe(self):
+        self.client().count_tokens('Hi')
+        return True
+
+
+class KnowledgeBaseAdapter:
+    # Answers from the bundled offline corpus (knowledge_base.py) instead of a model. It is never
+    # ranked or hedged with the AI providers: auto mode only falls back to it when none is configured
+    # or every attempt failed, and it can be picked explicitly as ai_model "offline".
+    supports_images = False
+    fallback_only = True
+
+    DEGRADED_NOTE = "_The AI providers are unavailable right now, so this answer comes from the offline knowledge base._"
+
+    def __init__(self, name='offline', label='Offline', display_name='Offline Knowledge Base', knowledge=None):
+        self.name = name
+        self.label = label
+        self.model = 'bm25'
+        self.display_name = display_name
+        self.knowledge = knowledge or KnowledgeBase.from_env()
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def answer(self, user_input, image_data, language):
+        if image_data and not user_input:
+            return None
+        with timed('knowledge'):
+            return self.knowledge.answer(user_input, language)
+
+    def chat(self, user_input, image_data, language, history=None, budget=None):
+        # Answers are fixed corpus sections, so there is no generation budget to apply
+        answer = self.answer(user_input, image_data, language)
+        if answer is None:
+            return ("[ERROR] The offline knowledge base has no answer for this question. It covers core "
+                    "concepts like loops, strings, classes or error handling in each language.")
+        return answer
+
+    def fallback(self, user_input, image_data, language):
+        # Degraded-mode answer for the auto router, or None when there is nothing confident to say
+        answer = self.answer(user_input, image_data, language)
+        if answer is None:
+            return None
+        with self._lock:
+            self.fallbacks += 1
+        return f"{self.DEGRADED_NOTE}\n\n{answer}"
+
+    async def achat(self, user_input, image_data, language, history=None, budget=None):
+        # An index lookup takes well under a millisecond, so it runs inline on the event loop
+        return self.chat(user_input, image_data, language, history)
+
+    def stream(self, user_input, image_data, language, history=None, budget=None):
+        yield self.chat(user_input, image_data, language, history)
+
+    async def astream(self, user_input, image_data, language, history=None, budget=None):
+        yield self.chat(user_input, image_data, language, history)
+
+    def warm_up(self, asynchronous=False):
+        # Maps (or first builds) the index so the first degraded request doesn't pay for it
+        self.knowledge.index
+
+    def probe(self):
+        return self.knowledge.index.n_docs > 0
+
+    def get_stats(self):
+        stats = self.knowledge.get_stats()
+        stats['fallbacks'] = self.fallbacks
+        return stats
+
+
+ADAPTERS = {
+    'gemini': GeminiAdapter,
+    'openai': OpenAICompatibleAdapter,
+    'cohere': CohereAdapter,
+    'huggingface': HuggingFaceAdapter
+}
+
+
+class ProviderRegistry:
+    # Configured providers by name, in auto-mode priority order
+    def __init__(self, adapters):
+        self._adapters = {adapter.name: adapter for adapter in adapters}
+
+    @classmethod
+    def from_env(cls, transport=None, async_transport=None, on_throttle=None, on_error=None):
+        # Built-ins are enabled by their API key. EXTRA_PROVIDERS=local,... adds more from
+        # LOCAL_BASE_URL, LOCAL_MODEL, LOCAL_API_KEY (optional), LOCAL_FORMAT (openai) and LOCAL_LABEL
+        specs = [(name, dict(spec)) for name, spec in BUILTIN_PROVIDERS.items()]
+        for name in os.environ.get('EXTRA_PROVIDERS', '').split(','):
+            name = name.strip().lower()
+            if name and name not in BUILTIN_PROVIDERS:
+                specs.append((name, {'format': 'openai', 'label': name.title(), 'model': 'default', 'keyless': True}))
+
+        adapters = []
+        for name, spec in specs:
+            prefix = name.upper()
+            api_key = os.environ.get(API_KEY_ENV.get(name, f'{prefix}_API_KEY'))
+            base_url = os.environ.get(f'{prefix}_BASE_URL', spec.get('base_url'))
+            if not (api_key or (spec.get('keyless') and base_url)):
+                continue
+            fmt = os.environ.get(f'{prefix}_FORMAT', spec['format']).lower()
+            if fmt not in ADAPTERS:
+                # A typo in one provider's config leaves the others working
+                print(f"[ERROR] {name}: unknown {prefix}_FORMAT '{fmt}' "
+                      f"(expected one of {', '.join(ADAPTERS)}); provider skipped")
+                continue
+            if fmt == 'gemini' and not is_installed('google.generativeai'):
+                continue
+            label = os.environ.get(f'{prefix}_LABEL', spec['label'])
+            adapters.append(ADAPTERS[fmt](
+                name, label, base_url=base_url, model=os.environ.get(f'{prefix}_MODEL', spec['model']),
+                api_key=api_key, display_name=spec.get('display_name', label), read_timeout=spec.get('read_timeout'),
+                transport=transport, async_transport=async_transport, on_throttle=on_throttle, on_error=on_error
+            ))
+
+        # The offline knowledge base is always there unless KNOWLEDGE_BASE=off (or the corpus is missing)
+        if os.environ.get('KNOWLEDGE_BASE', 'on').lower() not in ('off', 'false', '0'):
+            knowledge = KnowledgeBase.from_env()
+            if knowledge.available():
+                adapters.append(KnowledgeBaseAdapter(knowledge=knowledge))
+        return cls(adapters)
+
+    def __contains__(self, name):
+        return name in self._adapters
+
+    def __getitem__(self, name):
+        return self._adapters[name]
+
+    def get(self, name):
+        return self._adapters.get(name)
+
+    def names(self):
+        return list(self._adapters)
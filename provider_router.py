@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def current_state(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        return self.state
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self, now):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.trip(now)
+
+    def trip(self, now):
+        self.state = OPEN
+        self.opened_at = now
+
+
+class ProviderRouter:
+    def __init__(self, stats, failure_threshold=5, error_rate_threshold=0.5, min_samples=10,
+                 cooldown=30.0, default_latency=3.0, probe_interval=300.0):
+        self.stats = stats
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.default_latency = default_latency
+        self.probe_interval = probe_interval
+        self._breakers = {}
+        self._probes = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._probe_thread = None
+
+    @classmethod
+    def from_env(cls, stats):
+        return cls(
+            stats,
+            failure_threshold=int(os.environ.get('ROUTER_FAILURE_THRESHOLD', 5)),
+            error_rate_threshold=float(os.environ.get('ROUTER_ERROR_RATE_THRESHOLD', 0.5)),
+            cooldown=float(os.environ.get('ROUTER_COOLDOWN', 30)),
+            probe_interval=float(os.environ.get('HEALTH_PROBE_INTERVAL', 300)),
+        )
+
+    def _breaker(self, provider):
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return breaker
+
+    def state(self, provider):
+        with self._lock:
+            return self._breaker(provider).current_state(time.monotonic())
+
+    def record(self, provider, seconds, ok):
+        self.stats.record(provider, seconds, ok)
+        with self._lock:
+            breaker = self._breaker(provider)
+            if ok:
+                breaker.record_success()
+                return
+            breaker.record_failure(time.monotonic())
+            if (breaker.state == CLOSED and self.stats.samples(provider) >= self.min_samples
+                    and self.stats.error_rate(provider) >= self.error_rate_threshold):
+                breaker.trip(time.monotonic())
+
+    def score(self, provider):
+        # Expected seconds to a good answer: median latency inflated by the recent error rate
+        latency = self.stats.latency(provider, 0.5)
+        if latency is None:
+            latency = self.default_latency
+        return latency * (1 + 4 * self.stats.error_rate(provider))
+
+    def rank(self, candidates):
+        # Healthy providers by score (ties keep priority order), then half-open ones being retried.
+        # If every breaker is open, fall back to all candidates rather than refusing the request.
+        healthy, recovering = [], []
+        for provider in candidates:
+            state = self.state(provider)
+            if state == CLOSED:
+                healthy.append(provider)
+            elif state == HALF_OPEN:
+                recovering.append(provider)
+        ranked = sorted(healthy, key=self.score) + recovering
+        return ranked or sorted(candidates, key=self.score)
+
+    def record_probe(self, provider, seconds, ok):
+        self.stats.record_outcome(provider, ok)
+        with self._lock:
+            self._probes[provider] = {'ok': ok, 'latency_ms': round(seconds * 1000, 1), 'at': time.time()}
+            breaker = self._breaker(provider)
+            if ok:
+                if breaker.current_state(time.monotonic()) != OPEN:
+                    breaker.record_success()
+            else:
+                breaker.record_failure(time.monotonic())
+
+    def start_probes(self, probe, providers):
+        if self.probe_interval <= 0 or not providers or self._probe_thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                for provider in providers:
+                    if self._stop.is_set():
+                        return
+                    start = time.perf_counter()
+                    try:
+                        ok = probe(provider)
+                    except Exception:
+                        ok = False
+                    self.record_probe(provider, time.perf_counter() - start, ok)
+                self._stop.wait(self.probe_interval)
+
+        self._probe_thread = threading.Thread(target=run, name='provider-health-probe', daemon=True)
+        self._probe_thread.start()
+
+    def stop_probes(self):
+        self._stop.set()
+        self._probe_thread = None
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        with self._lock:
+            providers = set(stats) | set(self._breakers) | set(self._probes)
+        state = {}
+        for provider in sorted(providers):
+            entry = stats.get(provider, {'requests': 0, 'errors': 0})
+            entry['state'] = self.state(provider)
+            entry['score'] = round(self.score(provider), 3)
+            entry['last_probe'] = self._probes.get(provider)
+            state[provider] = entry
+        return state
@@ -0,0 +1,317 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# Free-tier ceilings per provider; override with e.g. GROQ_RPM, GROQ_TPM, GROQ_MAX_CONCURRENCY.
+# None means no limit on that dimension (paid keys).
+PROVIDER_LIMITS = {
+    'gemini': {'rpm': 10, 'tpm': 250000, 'concurrency': 4},
+    'groq': {'rpm': 30, 'tpm': 12000, 'concurrency': 8},
+    'cohere': {'rpm': 20, 'tpm': None, 'concurrency': 4},
+    'huggingface': {'rpm': 30, 'tpm': None, 'concurrency': 2},
+    'deepseek': {'rpm': None, 'tpm': None, 'concurrency': 16},
+    'openai': {'rpm': None, 'tpm': None, 'concurrency': 16},
+    'perplexity': {'rpm': None, 'tpm': None, 'concurrency': 16}
+}
+
+# Answers are usually far shorter than max_tokens; providers meter what is actually generated
+ESTIMATED_OUTPUT_TOKENS = 512
+# An upload downscaled to IMAGE_MAX_EDGE is about four 258-token Gemini tiles
+ESTIMATED_IMAGE_TOKENS = 1032
+
+
+def estimate_tokens(prompt, image=False):
+    tokens = len(prompt or '') // 4 + ESTIMATED_OUTPUT_TOKENS
+    return tokens + ESTIMATED_IMAGE_TOKENS if image else tokens
+
+
+class RateLimited(Exception):
+    pass
+
+
+def is_quota_error(error):
+    # SDK exceptions for HTTP 429, e.g. google.api_core.exceptions.ResourceExhausted
+    return type(error).__name__ == 'ResourceExhausted' or getattr(error, 'code', None) == 429
+
+
+class TokenBucket:
+    # The balance may go negative: each admitted request reserves its share up front, so
+    # later arrivals queue behind earlier ones and wait times come out in arrival order
+    def __init__(self, per_minute, burst_seconds=60.0):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        self._refill(now)
+        # A request larger than the whole bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        # Returns a reservation for a request that never started
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class FairGate:
+    # Counting semaphore that hands slots to waiting threads strictly in arrival order
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return True
+            granted = threading.Event()
+            self._waiters.append(granted)
+        if granted.wait(timeout):
+            return True
+        with self._lock:
+            if granted.is_set():
+                return True
+            self._waiters.remove(granted)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter; active stays the same
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+
+
+class ProviderLimiter:
+    def __init__(self, provider, rpm=None, tpm=None, concurrency=None, burst_seconds=60.0):
+        self.provider = provider
+        self.requests = TokenBucket(rpm, burst_seconds) if rpm else None
+        self.tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+        self.concurrency = concurrency
+        self.gate = FairGate(concurrency) if concurrency else None
+        self._async_gate = None
+        self.paused_until = 0.0
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _admit(self, tokens, max_wait):
+        # Deadline-aware admission: reserve rate capacity now, or refuse straight away if the
+        # reservation could not start within max_wait, instead of queueing a request that will time out
+        with self._lock:
+            now = time.monotonic()
+            amounts = [(self.requests, 1), (self.tokens, tokens)]
+            waits = [bucket.delay(amount, now) for bucket, amount in amounts if bucket is not None]
+            wait = max(waits + [self.paused_until - now, 0.0])
+            if wait > max_wait:
+                self.rejected += 1
+                raise RateLimited(f"{self.provider.title()} is at its rate limit (next slot in {wait:.0f}s)")
+            for bucket, amount in amounts:
+                if bucket is not None:
+                    bucket.take(amount)
+            self.admitted += 1
+            self.queued += 1
+            return now + wait, now + max_wait
+
+    def _leave_queue(self, tokens, rejected):
+        # Admitted but never started (no concurrency slot in time, or cancelled while queued): it is
+        # no longer counted as admitted and its rate reservation is refunded
+        with self._lock:
+            self.queued -= 1
+            self.admitted -= 1
+            if rejected:
+                self.rejected += 1
+            for bucket, amount in [(self.requests, 1), (self.tokens, tokens)]:
+                if bucket is not None:
+                    bucket.give_back(amount)
+
+    def _started(self):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def _finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @contextmanager
+    def slot(self, tokens, max_wait):
+        start_at, deadline = self._admit(tokens, max_wait)
+        time.sleep(max(0.0, start_at - time.monotonic()))
+        if self.gate is not None and not self.gate.acquire(max(0.0, deadline - time.monotonic())):
+            self._leave_queue(tokens, rejected=True)
+            raise RateLimited(f"{self.provider.title()} has too many requests in flight")
+        self._started()
+        try:
+            yield
+        finally:
+            self._finished()
+            if self.gate is not None:
+                self.gate.release()
+
+    @asynccontextmanager
+    async def aslot(self, tokens, max_wait):
+        start_at, deadline = self._admit(tokens, max_wait)
+        gate = None
+        try:
+            await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+            if self.concurrency:
+                # asyncio.Semaphore wakes waiters in FIFO order; created lazily on the serving loop
+                gate = self._async_gate = self._async_gate or asyncio.Semaphore(self.concurrency)
+                await asyncio.wait_for(gate.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._leave_queue(tokens, rejected=True)
+            raise RateLimited(f"{self.provider.title()} has too many requests in flight")
+        except asyncio.CancelledError:
+            # A hedged request lost the race while still queued
+            self._leave_queue(tokens, rejected=False)
+            raise
+        self._started()
+        try:
+            yield
+        finally:
+            self._finished()
+            if gate is not None:
+                gate.release()
+
+    def throttle(self, seconds):
+        # The provider said "slow down": start nothing new until the pause has elapsed
+        with self._lock:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queued,
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'throttled': self.throttled,
+                'rpm': self.requests.per_minute if self.requests else None,
+                'tpm': self.tokens.per_minute if self.tokens else None,
+                'max_concurrency': self.concurrency
+            }
+
+
+class ProviderScheduler:
+    def __init__(self, limits=None, max_wait=10.0, enabled=True, throttle_pause=20.0, burst_seconds=60.0, workers=1):
+        self.limits = limits if limits is not None else PROVIDER_LIMITS
+        self.max_wait = max_wait
+        # Server processes sharing the same API keys; each enforces its share of the limits
+        self.workers = max(1, workers)
+        self.burst_seconds = burst_seconds
+        self.enabled = enabled
+        self.throttle_pause = throttle_pause
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            {provider: _env_limits(provider, defaults) for provider, defaults in PROVIDER_LIMITS.items()},
+            max_wait=float(os.environ.get('RATE_LIMIT_MAX_WAIT', 10)),
+            enabled=os.environ.get('RATE_LIMITS', 'on').lower() != 'off',
+            throttle_pause=float(os.environ.get('RATE_LIMIT_THROTTLE_PAUSE', 20)),
+            burst_seconds=float(os.environ.get('RATE_LIMIT_BURST_SECONDS', 60)),
+            workers=int(os.environ.get('RATE_LIMIT_WORKERS', 1)),
+        )
+
+    def limiter(self, provider):
+        with self._lock:
+            limiter = self._limiters.get(provider)
+            if limiter is None:
+                # Providers added through config have no defaults but honour the same env overrides
+                limits = self.limits.get(provider) or _env_limits(provider)
+                limiter = self._limiters[provider] = ProviderLimiter(
+                    provider, burst_seconds=self.burst_seconds, **_share(limits, self.workers)
+                )
+            return limiter
+
+    def _max_wait(self, max_wait):
+        return self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+
+    @contextmanager
+    def slot(self, provider, tokens, max_wait=None):
+        if not self.enabled:
+            yield
+            return
+        with self.limiter(provider).slot(tokens, self._max_wait(max_wait)):
+            yield
+
+    @asynccontextmanager
+    async def aslot(self, provider, tokens, max_wait=None):
+        if not self.enabled:
+            yield
+            return
+        async with self.limiter(provider).aslot(tokens, self._max_wait(max_wait)):
+            yield
+
+    def throttle(self, provider, retry_after=None):
+        # Called on a 429: honour Retry-After (seconds) when the provider sends it
+        if not self.enabled:
+            return
+        try:
+            seconds = float(retry_after)
+        except (TypeError, ValueError):
+            seconds = self.throttle_pause
+        self.limiter(provider).throttle(seconds)
+
+    def get_stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {
+            'enabled': True,
+            'max_wait': self.max_wait,
+            'workers': self.workers,
+            'providers': {provider: limiter.get_stats() for provider, limiter in sorted(limiters.items())}
+        }
+
+
+def _share(limits, workers):
+    if workers == 1:
+        return limits
+    shared = {name: value / workers if value else value for name, value in limits.items()}
+    if shared.get('concurrency'):
+        shared['concurrency'] = max(1, math.ceil(shared['concurrency']))
+    return shared
+
+
+def _env_limit(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    value = int(value)
+    return value if value > 0 else None
+
+
+def _env_limits(provider, defaults=None):
+    defaults = defaults or {}
+    prefix = provider.upper()
+    return {
+        'rpm': _env_limit(f'{prefix}_RPM', defaults.get('rpm')),
+        'tpm': _env_limit(f'{prefix}_TPM', defaults.get('tpm')),
+        'concurrency': _env_limit(f'{prefix}_MAX_CONCURRENCY', defaults.get('concurrency'))
+    }
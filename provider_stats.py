@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ProviderStats:
+    def __init__(self, window=200):
+        self.window = window
+        self._latencies = {}
+        self._outcomes = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _track(self, provider):
+        latencies = self._latencies.get(provider)
+        if latencies is None:
+            latencies = self._latencies[provider] = deque(maxlen=self.window)
+            self._outcomes[provider] = deque(maxlen=self.window)
+            self._counts[provider] = {'requests': 0, 'errors': 0}
+        return latencies
+
+    def record(self, provider, seconds, ok=True):
+        with self._lock:
+            latencies = self._track(provider)
+            self._outcomes[provider].append(ok)
+            self._counts[provider]['requests'] += 1
+            if ok:
+                latencies.append(seconds)
+            else:
+                self._counts[provider]['errors'] += 1
+
+    def record_outcome(self, provider, ok):
+        # Health signal without a latency sample, e.g. from a background probe
+        with self._lock:
+            self._track(provider)
+            self._outcomes[provider].append(ok)
+
+    def latency(self, provider, fraction):
+        with self._lock:
+            values = sorted(self._latencies.get(provider, ()))
+        return percentile(values, fraction)
+
+    def error_rate(self, provider):
+        with self._lock:
+            outcomes = list(self._outcomes.get(provider, ()))
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def samples(self, provider):
+        with self._lock:
+            return len(self._outcomes.get(provider, ()))
+
+    def snapshot(self):
+        with self._lock:
+            providers = {name: (sorted(values), dict(self._counts[name])) for name, values in self._latencies.items()}
+        stats = {}
+        for name, (values, counts) in providers.items():
+            p50 = percentile(values, 0.5)
+            p99 = percentile(values, 0.99)
+            counts['p50_ms'] = round(p50 * 1000, 1) if p50 is not None else None
+            counts['p99_ms'] = round(p99 * 1000, 1) if p99 is not None else None
+            counts['error_rate'] = round(self.error_rate(name), 3)
+            stats[name] = counts
+        return stats
@@ -0,0 +1,266 @@
+import contextvars
+import os
+import socket
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from lazy_imports import optional_import
+
+# The hedged-race attempt the provider call on this thread belongs to, if any
+current_attempt = contextvars.ContextVar('current_attempt', default=None)
+
+
+def _httpx():
+    # Only the ASGI server needs httpx, so it is imported on the first async call
+    httpx = optional_import('httpx')
+    if httpx is None:
+        raise RuntimeError("httpx is required for async provider calls")
+    return httpx
+
+
+class Attempt:
+    # One provider call in a hedged race. abort() shuts down the socket its request is using, so a
+    # call blocked waiting for the provider fails at once instead of running to the read timeout.
+    # Only calls made through ProviderTransport can be cut short; SDK calls (Gemini) run to the end.
+    __slots__ = ('aborted', '_connection', '_lock')
+
+    def __init__(self):
+        self.aborted = False
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def attach(self, connection):
+        with self._lock:
+            self._connection = connection
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            connection = self._connection
+        sock = getattr(connection, 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def aborted():
+    # Whether the call on this thread was cut short because another provider answered first
+    attempt = current_attempt.get()
+    return attempt is not None and attempt.aborted
+
+
+class _AttemptTracking:
+    # Tells the current attempt which pooled connection its request was given
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        attempt = current_attempt.get()
+        if attempt is not None:
+            attempt.attach(connection)
+        return connection
+
+
+class _TrackedHTTPConnectionPool(_AttemptTracking, HTTPConnectionPool):
+    pass
+
+
+class _TrackedHTTPSConnectionPool(_AttemptTracking, HTTPSConnectionPool):
+    pass
+
+
+class _TrackedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TrackedHTTPConnectionPool, 'https': _TrackedHTTPSConnectionPool
+        }
+
+
+class ProviderTransport:
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._sessions = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **overrides):
+        config = {
+            'pool_size': int(os.environ.get('PROVIDER_POOL_SIZE', 10)),
+            'connect_timeout': float(os.environ.get('PROVIDER_CONNECT_TIMEOUT', 5)),
+            'read_timeout': float(os.environ.get('PROVIDER_READ_TIMEOUT', 30)),
+        }
+        config.update(overrides)
+        return cls(**config)
+
+    def _register_host(self, host):
+        self._counters[host] = {'requests': 0, 'errors': 0, 'in_flight': 0, 'peak_in_flight': 0}
+
+    def _request_started(self, host):
+        counters = self._counters[host]
+        with self._lock:
+            counters['requests'] += 1
+            counters['in_flight'] += 1
+            counters['peak_in_flight'] = max(counters['peak_in_flight'], counters['in_flight'])
+
+    def _request_finished(self, host, failed):
+        counters = self._counters[host]
+        with self._lock:
+            counters['in_flight'] -= 1
+            if failed:
+                counters['errors'] += 1
+
+    def _session_for(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = _TrackedAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount(f'https://{host}', adapter)
+                session.mount(f'http://{host}', adapter)
+                self._sessions[host] = session
+                self._register_host(host)
+            return session
+
+    def prepare(self, url):
+        # Sets up the host's connection pool ahead of the first request
+        self._session_for(urlsplit(url).netloc)
+
+    def post(self, url, read_timeout=None, **kwargs):
+        host = urlsplit(url).netloc
+        session = self._session_for(host)
+        self._request_started(host)
+        failed = True
+        try:
+            response = session.post(url, timeout=(self.connect_timeout, read_timeout or self.read_timeout), **kwargs)
+            failed = False
+            return response
+        finally:
+            self._request_finished(host, failed)
+
+    @contextmanager
+    def stream(self, url, read_timeout=None, **kwargs):
+        host = urlsplit(url).netloc
+        session = self._session_for(host)
+        self._request_started(host)
+        failed = True
+        try:
+            response = session.post(
+                url, stream=True, timeout=(self.connect_timeout, read_timeout or self.read_timeout), **kwargs
+            )
+            try:
+                yield response
+                failed = False
+            finally:
+                response.close()
+        finally:
+            self._request_finished(host, failed)
+
+    def _pool_usage(self, session, host):
+        opened = idle = 0
+        adapter = session.get_adapter(f'https://{host}')
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return {'connections_opened': opened, 'idle_connections': idle}
+
+    def get_stats(self):
+        stats = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for host, session in sessions:
+            with self._lock:
+                host_stats = dict(self._counters[host])
+            host_stats['pool_size'] = self.pool_size
+            host_stats.update(self._pool_usage(session, host))
+            stats[host] = host_stats
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class AsyncProviderTransport(ProviderTransport):
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0, max_connections=100):
+        super().__init__(pool_size, connect_timeout, read_timeout)
+        self.max_connections = max_connections
+
+    @classmethod
+    def from_env(cls, **overrides):
+        overrides.setdefault('max_connections', int(os.environ.get('PROVIDER_ASYNC_MAX_CONNECTIONS', 100)))
+        return super().from_env(**overrides)
+
+    def _session_for(self, host):
+        httpx = _httpx()
+        with self._lock:
+            client = self._sessions.get(host)
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.pool_size),
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                )
+                self._sessions[host] = client
+                self._register_host(host)
+            return client
+
+    def prepare(self, url):
+        # Clients belong to the serving event loop, so only the import is done ahead of time
+        _httpx()
+
+    async def post(self, url, read_timeout=None, **kwargs):
+        host = urlsplit(url).netloc
+        client = self._session_for(host)
+        self._request_started(host)
+        failed = True
+        try:
+            timeout = _httpx().Timeout(read_timeout or self.read_timeout, connect=self.connect_timeout)
+            response = await client.post(url, timeout=timeout, **kwargs)
+            failed = False
+            return response
+        finally:
+            self._request_finished(host, failed)
+
+    @asynccontextmanager
+    async def stream(self, url, read_timeout=None, **kwargs):
+        host = urlsplit(url).netloc
+        client = self._session_for(host)
+        self._request_started(host)
+        failed = True
+        try:
+            timeout = _httpx().Timeout(read_timeout or self.read_timeout, connect=self.connect_timeout)
+            async with client.stream('POST', url, timeout=timeout, **kwargs) as response:
+                yield response
+                failed = False
+        finally:
+            self._request_finished(host, failed)
+
+    def _pool_usage(self, client, host):
+        pool = getattr(getattr(client, '_transport', None), '_pool', None)
+        connections = list(getattr(pool, 'connections', []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {'max_connections': self.max_connections, 'open_connections': len(connections), 'idle_connections': idle}
+
+    async def aclose(self):
+        with self._lock:
+            clients = list(self._sessions.values())
+            self._sessions.clear()
+        for client in clients:
+            await client.aclose()
+
+    def close(self):
+        raise RuntimeError("Use 'await aclose()' to close the async transport")
@@ -0,0 +1,210 @@
+# Per-request output budgets and prompt sizing.
+#
+# Every provider call used to ask for up to 2048 tokens with the same "complete working code"
+# template, so a one-line concept question was allowed as long a generation as a code review.
+# plan() sorts each request into a class, picks that class's max_tokens and prompt template, and
+# trims pasted code that is repeated or far longer than a model needs to see (logs and stack traces
+# that repeat a line, the same block pasted twice, thousands of lines of a file). Caches and
+# sessions keep the question as it was asked; only the provider is sent the trimmed text.
+import os
+import re
+import threading
+
+from session_store import CHARS_PER_TOKEN, estimate_text_tokens
+
+# Request classes, most specific first
+KINDS = ('image', 'debug', 'codegen', 'concept')
+
+# Generation budgets per class. Answers are usually well under these, so they mostly cut off the
+# rare runaway answer; providers that stop at max_tokens also generate less for short questions.
+DEFAULT_BUDGETS = {'concept': 600, 'codegen': 1500, 'debug': 1200, 'image': 1024}
+# What every request got before budgeting, and still gets with REQUEST_BUDGET=off
+UNBUDGETED_MAX_TOKENS = 2048
+
+_FENCE = re.compile(r'```[^\n]*\n(.*?)(?:```|$)', re.S)
+# Lines that read as code or a stack trace rather than prose
+_CODE_LINE = re.compile(
+    r'[;{}]\s*$|^\s*(?:def|class|import|from|#include|public|private|protected|static|return|if\s*\(|for\s*\(|'
+    r'while\s*\(|func|fn|let|const|var|package|using|at\s+[\w$.]+\(|File\s+")|^(?: {4}|\t)\S'
+)
+_CODEGEN_WORDS = re.compile(
+    r'\b(?:write|implement|create|build|generate|make|program|code\s+(?:for|to|that)|function\s+(?:to|that)|'
+    r'class\s+(?:to|that)|script)\b', re.I
+)
+# A pasted block needs this many code-like lines to count as code without a fence
+MIN_CODE_LINES = 3
+# A line repeated this many more times in a row is folded into a count
+MAX_REPEATS = 2
+
+
+class Budget:
+    # What one request is sent with: its class, the generation limit, the prompts.REQUESTS template
+    # and the (trimmed) question
+    __slots__ = ('kind', 'max_tokens', 'template', 'text', 'trimmed')
+
+    def __init__(self, kind, max_tokens, text, template=None, trimmed=0):
+        self.kind = kind
+        self.max_tokens = max_tokens
+        self.template = template or kind
+        self.text = text
+        self.trimmed = trimmed
+
+
+def has_code(text):
+    if '```' in text:
+        return True
+    return sum(1 for line in text.splitlines() if _CODE_LINE.search(line)) >= MIN_CODE_LINES
+
+
+def classify(user_input, image=False):
+    if image:
+        return 'image'
+    text = user_input or ''
+    if has_code(text):
+        return 'debug'
+    if _CODEGEN_WORDS.search(text):
+        return 'codegen'
+    return 'concept'
+
+
+def _drop_duplicate_blocks(text):
+    # A fenced block pasted a second time is replaced by a pointer to the first copy
+    seen = set()
+
+    def replace(match):
+        body = match.group(1).strip()
+        if not body or body not in seen:
+            seen.add(body)
+            return match.group(0)
+        return '(same code as above)\n'
+
+    return _FENCE.sub(replace, text)
+
+
+def _fold_repeats(lines):
+    # Runs of the same line (deep recursion in a stack trace, a log line in a loop) keep their first
+    # copy and a count; runs of blank lines become one
+    out = []
+    previous, repeats = None, 0
+    for line in lines + [None]:
+        if line == previous:
+            repeats += 1
+            continue
+        if repeats and previous.strip():
+            if repeats < MAX_REPEATS:
+                out.extend([previous] * repeats)
+            else:
+                out.append(f'... (line above repeated {repeats} more times)')
+        if line is not None:
+            out.append(line)
+        previous, repeats = line, 0
+    return out
+
+
+def _keep_ends(lines, max_chars):
+    # Head and tail of an oversized paste: the question and imports come first, the failing call
+    # and error message usually last
+    head_chars, tail_chars = max_chars * 2 // 3, max_chars // 3
+    head, size = [], 0
+    for line in lines:
+        if size + len(line) + 1 > head_chars:
+            break
+        head.append(line)
+        size += len(line) + 1
+    tail, size = [], 0
+    for line in reversed(lines[len(head):]):
+        if size + len(line) + 1 > tail_chars:
+            break
+        tail.append(line)
+        size += len(line) + 1
+    omitted = len(lines) - len(head) - len(tail)
+    if not omitted:
+        return lines
+    return head + [f'... ({omitted} lines omitted) ...'] + tail[::-1]
+
+
+def trim_code(text, max_chars):
+    # The question with duplicate blocks and repeated lines folded, cut to about max_chars
+    text = _drop_duplicate_blocks(text)
+    lines = _fold_repeats([line.rstrip() for line in text.splitlines()])
+    if max_chars and sum(len(line) + 1 for line in lines) > max_chars:
+        lines = _keep_ends(lines, max_chars)
+    return '\n'.join(lines).strip()
+
+
+class _ClassStats:
+    __slots__ = ('requests', 'answers', 'errors', 'seconds', 'completion_tokens', 'chars_in', 'chars_sent')
+
+    def __init__(self):
+        self.requests = self.answers = self.errors = self.completion_tokens = self.chars_in = self.chars_sent = 0
+        self.seconds = 0.0
+
+
+class RequestBudgeter:
+    def __init__(self, enabled=True, budgets=None, max_code_chars=6000):
+        self.enabled = enabled
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        # About 1500 tokens: room for a whole class or a long stack trace, not a whole project
+        self.max_code_chars = max_code_chars
+        self._lock = threading.Lock()
+        self._stats = {kind: _ClassStats() for kind in KINDS}
+
+    @classmethod
+    def from_env(cls):
+        budgets = {}
+        for kind in KINDS:
+            value = os.environ.get(f'BUDGET_{kind.upper()}_TOKENS')
+            if value:
+                budgets[kind] = int(value)
+        return cls(
+            enabled=os.environ.get('REQUEST_BUDGET', 'on').lower() not in ('off', 'false', '0'),
+            budgets=budgets,
+            max_code_chars=int(os.environ.get('MAX_CODE_CHARS', 6000))
+        )
+
+    def plan(self, user_input, image=False):
+        # image: an upload will actually reach the model. Adapters without images drop it, and
+        # the question is then budgeted and templated as the text it is.
+        kind = classify(user_input, image)
+        text = user_input or ''
+        if not self.enabled:
+            budget = Budget(kind, UNBUDGETED_MAX_TOKENS, text, template='codegen')
+        else:
+            if kind == 'debug' or len(text) > self.max_code_chars:
+                text = trim_code(text, self.max_code_chars)
+            budget = Budget(kind, self.budgets[kind], text, trimmed=len(user_input or '') - len(text))
+        with self._lock:
+            stats = self._stats[kind]
+            stats.requests += 1
+            stats.chars_in += len(user_input or '')
+            stats.chars_sent += len(text)
+        return budget
+
+    def record(self, budget, seconds, response):
+        # One answered provider call: how long it took and how much it generated
+        if budget is None:
+            return
+        with self._lock:
+            stats = self._stats[budget.kind]
+            if response.startswith('[ERROR]'):
+                stats.errors += 1
+                return
+            stats.answers += 1
+            stats.seconds += seconds
+            stats.completion_tokens += estimate_text_tokens(response)
+
+    def get_stats(self):
+        with self._lock:
+            classes = {}
+            for kind, stats in self._stats.items():
+                answers = stats.answers
+                classes[kind] = {
+                    'max_tokens': self.budgets[kind] if self.enabled else UNBUDGETED_MAX_TOKENS,
+                    'requests': stats.requests,
+                    'answers': answers,
+                    'errors': stats.errors,
+                    'avg_seconds': round(stats.seconds / answers, 3) if answers else None,
+                    'avg_completion_tokens': round(stats.completion_tokens / answers) if answers else None,
+                    'prompt_tokens_saved': (stats.chars_in - stats.chars_sent) // CHARS_PER_TOKEN
+                }
+            return {'enabled': self.enabled, 'max_code_chars': self.max_code_chars, 'classes': classes}
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    return ' '.join((prompt or '').lower().split()).rstrip('?.! ')
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    def __init__(self, path='response_cache.sqlite3', max_entries=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+                self._conn.commit()
+            return row
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)',
+                (key, value, expires_at, time.time())
+            )
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN ('
+                'SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        kind = os.environ.get('RESPONSE_CACHE', 'memory').lower()
+        max_entries = int(os.environ.get('RESPONSE_CACHE_SIZE', 1000))
+        if kind == 'sqlite':
+            backend = SQLiteCacheBackend(os.environ.get('RESPONSE_CACHE_PATH', 'response_cache.sqlite3'), max_entries)
+        elif kind == 'memory':
+            backend = MemoryCacheBackend(max_entries)
+        else:
+            backend = None
+        return cls(backend, ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 3600)))
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def make_key(self, provider, model, language, prompt, image_key=None):
+        parts = [provider, model or '', language.lower(), normalize_prompt(prompt)]
+        if image_key:
+            parts.append(image_key)
+        raw = '\x1f'.join(parts)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        entry = self.backend.get(key)
+        if entry is not None and entry[1] < time.time():
+            self.backend.delete(key)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry[0] if entry is not None else None
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key, value, time.time() + self.ttl)
+
+    def get_stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        total = self.hits + self.misses
+        return {
+            'enabled': True,
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'ttl': self.ttl
+        }
@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+import time
+import zlib
+
+from response_cache import normalize_prompt
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Filler words that change phrasing but not the concept being asked about
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'what', 'whats', 'how', 'do', 'does', 'i', 'me', 'my', 'you',
+    'can', 'could', 'please', 'explain', 'show', 'tell', 'give', 'about', 'of', 'in', 'to', 'for',
+    'with', 'and', 'or', 'example', 'examples', 'work', 'works', 'use', 'using'
+}
+
+WORD_RE = re.compile(r"[a-z0-9_+#]+")
+
+BLOCK_ROWS = 16384
+
+# Words whose two sides can't be swapped: "convert int to string" is not "convert string to int",
+# though both have the same words. Order matters only around these; elsewhere it is just phrasing.
+RELATION_WORDS = {'to', 'from', 'into', 'vs', 'versus', 'than'}
+
+
+def _features(text):
+    words = [w for w in WORD_RE.findall(normalize_prompt(text)) if w not in STOPWORDS]
+    features = list(words)
+    for word in words:
+        padded = f"<{word}>"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return features
+
+
+def relations(text):
+    # {relation word: (content words before it, content words after it)}
+    tokens = WORD_RE.findall(normalize_prompt(text))
+    found = {}
+    for i, word in enumerate(tokens):
+        if word in RELATION_WORDS and word not in found:
+            before = frozenset(w for w in tokens[:i] if w not in STOPWORDS and w not in RELATION_WORDS)
+            after = frozenset(w for w in tokens[i + 1:] if w not in STOPWORDS and w not in RELATION_WORDS)
+            found[word] = (before, after)
+    return found
+
+
+def same_direction(relations, other):
+    # False when a relation word has words from one side of it in one question on the other side in the
+    # other question, both ways round ("python faster than java" / "java faster than python")
+    for word, (before, after) in relations.items():
+        if word in other:
+            other_before, other_after = other[word]
+            if before & other_after and after & other_before:
+                return False
+    return True
+
+
+def embed(text, dim=128):
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode('utf-8'))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+class SemanticIndex:
+    def __init__(self, dim=128, capacity=10000, initial_rows=1024):
+        self.dim = dim
+        self.capacity = capacity
+        rows = min(initial_rows, capacity)
+        self.vectors = np.zeros((rows, dim), dtype=np.float32)
+        self.expires_at = np.zeros(rows, dtype=np.float64)
+        self.answers = [None] * rows
+        # relations() of each row's question, for the direction check on a hit
+        self.relations = [None] * rows
+        self.size = 0
+        self._next = 0
+
+    def _grow(self):
+        rows = min(self.vectors.shape[0] * 2, self.capacity)
+        vectors = np.zeros((rows, self.dim), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        expires_at = np.zeros(rows, dtype=np.float64)
+        expires_at[:self.size] = self.expires_at[:self.size]
+        self.vectors, self.expires_at = vectors, expires_at
+        self.answers.extend([None] * (rows - len(self.answers)))
+        self.relations.extend([None] * (rows - len(self.relations)))
+
+    def add(self, vector, answer, expires_at, relations=None):
+        if self.size == self.vectors.shape[0] and self.size < self.capacity:
+            self._grow()
+        # Once full, overwrite the oldest row (ring buffer)
+        row = self._next
+        self.vectors[row] = vector
+        self.expires_at[row] = expires_at
+        self.answers[row] = answer
+        self.relations[row] = relations
+        self._next = (row + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def search(self, queries, now):
+        # Batched dot-product search: one (rows x dim) @ (dim x queries) product per block
+        best_rows = np.full(len(queries), -1, dtype=np.int64)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        for start in range(0, self.size, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, self.size)
+            scores = self.vectors[start:stop] @ queries.T
+            scores[self.expires_at[start:stop] < now] = -np.inf
+            rows = scores.argmax(axis=0)
+            top = scores[rows, np.arange(len(queries))]
+            better = top > best_scores
+            best_rows[better] = rows[better] + start
+            best_scores[better] = top[better]
+        return best_rows, best_scores
+
+
+class SemanticCache:
+    def __init__(self, threshold=0.9, dim=128, capacity=10000, ttl=3600):
+        self.threshold = threshold
+        self.dim = dim
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        if os.environ.get('SEMANTIC_CACHE', 'on').lower() in ('off', 'false', '0'):
+            return cls(threshold=None)
+        return cls(
+            threshold=float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.9)),
+            dim=int(os.environ.get('SEMANTIC_CACHE_DIM', 128)),
+            capacity=int(os.environ.get('SEMANTIC_CACHE_SIZE', 10000)),
+            ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 3600)),
+        )
+
+    @property
+    def enabled(self):
+        return np is not None and self.threshold is not None
+
+    def lookup_many(self, namespace, prompts):
+        if not self.enabled:
+            return [None] * len(prompts)
+        queries = np.stack([embed(prompt, self.dim) for prompt in prompts])
+        directions = [relations(prompt) for prompt in prompts]
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None or index.size == 0:
+                results = [None] * len(prompts)
+            else:
+                rows, scores = index.search(queries, time.time())
+                results = [
+                    index.answers[row]
+                    if row >= 0 and score >= self.threshold and same_direction(direction, index.relations[row] or {})
+                    else None
+                    for row, score, direction in zip(rows, scores, directions)
+                ]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def lookup(self, namespace, prompt):
+        return self.lookup_many(namespace, [prompt])[0]
+
+    def add(self, namespace, prompt, answer):
+        if not self.enabled:
+            return
+        vector = embed(prompt, self.dim)
+        if not vector.any():
+            return
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = SemanticIndex(self.dim, self.capacity)
+            index.add(vector, answer, time.time() + self.ttl, relations(prompt))
+
+    def get_stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        total = self.hits + self.misses
+        return {
+            'enabled': True,
+            'entries': sum(index.size for index in self._indexes.values()),
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
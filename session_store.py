@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MAX_SESSION_ID_LENGTH = 128
+# Same rough estimate the rate limiter uses
+CHARS_PER_TOKEN = 4
+
+_CODE_BLOCK = re.compile(r'```.*?(```|$)', re.S)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_text_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _gist(text, limit=160):
+    # First sentence of a turn with code blocks elided: enough for the model to keep track
+    # of what was discussed without resending the code itself
+    text = ' '.join(_CODE_BLOCK.sub(' [code] ', text).split())
+    text = _SENTENCE_END.split(text, 1)[0]
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+class Turn:
+    __slots__ = ('role', 'text', 'tokens')
+
+    def __init__(self, role, text):
+        self.role = role
+        self.text = text
+        self.tokens = estimate_text_tokens(text)
+
+
+class History:
+    # What a provider is sent about the earlier conversation: a running summary of
+    # folded turns plus the most recent turns verbatim, oldest first
+    __slots__ = ('summary', 'turns', 'tokens')
+
+    def __init__(self, summary, turns):
+        self.summary = summary
+        self.turns = turns
+        self.tokens = sum(turn.tokens for turn in turns) + (estimate_text_tokens(summary) if summary else 0)
+
+    def __bool__(self):
+        return bool(self.summary or self.turns)
+
+    def summary_text(self):
+        return f"Summary of the earlier conversation: {self.summary}" if self.summary else ''
+
+    def transcript(self):
+        # Plain-text rendering for providers that take a single prompt string
+        lines = [self.summary_text()] if self.summary else []
+        lines.extend(f"{'User' if turn.role == 'user' else 'Assistant'}: {turn.text}" for turn in self.turns)
+        return '\n'.join(lines)
+
+
+class Session:
+    __slots__ = ('turns', 'summary_lines', 'tokens', 'bytes', 'updated')
+
+    def __init__(self):
+        self.turns = []
+        self.summary_lines = []
+        self.tokens = 0
+        self.bytes = 0
+        self.updated = time.monotonic()
+
+    def history(self):
+        return History(' '.join(self.summary_lines), list(self.turns))
+
+
+class SessionStore:
+    # Conversation history per browser session, in memory. Sessions are evicted least recently
+    # used first when over max_sessions or max_bytes, and dropped after ttl seconds idle.
+    # Each session is kept within history_tokens: the oldest turns are folded into a short
+    # extractive summary, so building a request never has to trim or call a model.
+    def __init__(self, max_sessions=1000, ttl=1800.0, max_bytes=32 * 1024 * 1024, history_tokens=1500, max_turns=20):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.history_tokens = history_tokens
+        self.max_turns = max_turns
+        self.summary_tokens = history_tokens // 4
+        self.total_bytes = 0
+        self.evicted = 0
+        self.expired = 0
+        self.summarized = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        if os.environ.get('SESSIONS', 'on').lower() in ('off', 'false', '0'):
+            return cls(max_sessions=0)
+        return cls(
+            max_sessions=int(os.environ.get('SESSION_MAX', 1000)),
+            ttl=float(os.environ.get('SESSION_TTL', 1800)),
+            max_bytes=int(float(os.environ.get('SESSION_MEMORY_MB', 32)) * 1024 * 1024),
+            history_tokens=int(os.environ.get('SESSION_HISTORY_TOKENS', 1500)),
+            max_turns=int(os.environ.get('SESSION_MAX_TURNS', 20)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_sessions > 0
+
+    def _valid(self, session_id):
+        return self.enabled and isinstance(session_id, str) and 0 < len(session_id) <= MAX_SESSION_ID_LENGTH
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.bytes
+
+    def _expire(self, now):
+        # Sessions are kept in last-use order, so expired ones are all at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.updated < self.ttl:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def history(self, session_id):
+        if not self._valid(session_id):
+            return None
+        with self._lock:
+            self._expire(time.monotonic())
+            session = self._sessions.get(session_id)
+            if session is None or not (session.turns or session.summary_lines):
+                return None
+            return session.history()
+
+    def append(self, session_id, question, answer):
+        if not self._valid(session_id):
+            return
+        # A single turn longer than half the budget could never be sent whole anyway
+        limit = self.history_tokens // 2 * CHARS_PER_TOKEN
+        turns = [Turn('user', question[:limit]), Turn('assistant', answer[:limit])]
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session()
+            self._sessions.move_to_end(session_id)
+            session.updated = now
+            for turn in turns:
+                session.turns.append(turn)
+                session.tokens += turn.tokens
+            self._fold(session)
+            self._resize(session)
+            self._evict(session_id)
+
+    def _fold(self, session):
+        # Oldest question/answer pairs move into the summary until the session fits its budget
+        while len(session.turns) > 2 and (
+            session.tokens > self.history_tokens or len(session.turns) > self.max_turns
+        ):
+            for turn in session.turns[:2]:
+                session.tokens -= turn.tokens
+                label = 'User asked' if turn.role == 'user' else 'Assistant answered'
+                line = f"{label}: {_gist(turn.text)}"
+                session.summary_lines.append(line)
+                session.tokens += estimate_text_tokens(line)
+            del session.turns[:2]
+            self.summarized += 2
+            while len(session.summary_lines) > 1 and sum(
+                estimate_text_tokens(line) for line in session.summary_lines
+            ) > self.summary_tokens:
+                session.tokens -= estimate_text_tokens(session.summary_lines.pop(0))
+
+    def _resize(self, session):
+        # Text length stands in for memory use; the cap is approximate by design
+        size = sum(len(turn.text) for turn in session.turns) + sum(len(line) for line in session.summary_lines)
+        self.total_bytes += size - session.bytes
+        session.bytes = size
+
+    def _evict(self, keep):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._drop(session_id)
+            self.evicted += 1
+
+    def get_stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            return {
+                'enabled': True,
+                'sessions': len(self._sessions),
+                'bytes': self.total_bytes,
+                'evicted': self.evicted,
+                'expired': self.expired,
+                'summarized_turns': self.summarized,
+                'history_tokens': self.history_tokens
+            }
@@ -0,0 +1,21 @@
+import json
+
+
+def sse_event(data, event=None):
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_chunks(chunks):
+    for chunk in chunks:
+        yield sse_event({'text': chunk})
+    yield sse_event({}, event='done')
+
+
+async def asse_chunks(chunks):
+    async for chunk in chunks:
+        yield sse_event({'text': chunk})
+    yield sse_event({}, event='done')
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_provider import MockProviderServer, provider_env  # noqa: E402
+
+# No caches, rate limits or background probes, so every question reaches the mock providers
+TEST_ENV = {
+    'HEALTH_PROBE_INTERVAL': '0', 'RESPONSE_CACHE': 'off', 'SEMANTIC_CACHE': 'off', 'KNOWLEDGE_BASE': 'off',
+    'RATE_LIMITS': 'off', 'PROVIDER_POOL_SIZE': '64'
+}
+
+
+@pytest.fixture
+def assistant_factory(monkeypatch):
+    # MultiAIAssistant with each named provider pointed at its own mock server ({provider: MockConfig}),
+    # ranked in the registry's order until the router has latencies
+    servers, assistants = [], []
+
+    def make(providers, **env):
+        for name in list(os.environ):
+            if name.endswith('_API_KEY'):
+                monkeypatch.delenv(name)
+        for provider, config in providers.items():
+            server = MockProviderServer(config=config).start()
+            servers.append(server)
+            for name, value in provider_env(server.base_url, [provider]).items():
+                monkeypatch.setenv(name, value)
+        for name, value in {**TEST_ENV, **env}.items():
+            monkeypatch.setenv(name, value)
+        from multi_ai_assistant import MultiAIAssistant
+
+        assistant = MultiAIAssistant()
+        assistants.append(assistant)
+        return assistant
+
+    yield make
+    for assistant in assistants:
+        assistant.shutdown()
+    for server in servers:
+        server.stop()
@@ -0,0 +1,35 @@
+import threading
+import time
+
+from mock_provider import LatencyDistribution, MockConfig
+
+
+def fixed(seconds):
+    return MockConfig(LatencyDistribution('fixed', seconds))
+
+
+def test_backup_answer_cuts_slow_primary_short(assistant_factory):
+    assistant = assistant_factory({'groq': fixed(5.0), 'deepseek': fixed(0.05)}, HEDGE_DELAY='0.1')
+    start = time.perf_counter()
+    response = assistant.chat('what is a java record', language='java')
+    assert time.perf_counter() - start < 2
+    assert not response.startswith('[ERROR]')
+    assert assistant.get_hedge_stats()['hedge_wins'] == 1
+
+
+def test_primaries_are_not_capped_by_hedge_pool(assistant_factory):
+    # 4 hedge workers, 24 concurrent requests: primaries run on the callers' threads
+    assistant = assistant_factory({'groq': fixed(0.5), 'deepseek': fixed(0.5)}, HEDGE_DELAY='10', HEDGE_WORKERS='4')
+    responses = []
+
+    def ask(i):
+        responses.append(assistant.chat(f'question {i}', language='java'))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(24)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - start < 1.5
+    assert len(responses) == 24 and not any(response.startswith('[ERROR]') for response in responses)
@@ -0,0 +1,34 @@
+import io
+
+import pytest
+
+pytest.importorskip('PIL')
+
+from PIL import Image, ImageDraw  # noqa: E402
+from mock_provider import MockConfig  # noqa: E402
+
+
+def screenshot(code):
+    # Same editor theme and layout, different code
+    image = Image.new('RGB', (640, 200), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    for line, text in enumerate(code.splitlines()):
+        draw.text((12, 12 + 18 * line), text, fill=(220, 220, 220))
+    out = io.BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
+
+
+FIRST = screenshot('int total = 0;\nfor (int i = 0; i < n; i++) {\n    total += values[i];\n}')
+SECOND = screenshot('int total = 0;\nfor (int i = 0; i <= n; i++) {\n    total += values[i];\n}')
+
+
+def test_different_code_screenshots_do_not_share_answers(assistant_factory):
+    assistant = assistant_factory({'groq': MockConfig()}, RESPONSE_CACHE='memory')
+    question = 'why does this throw?'
+    cache_ref, cached, _ = assistant._cache_lookup('auto', 'groq', question, FIRST, 'java')
+    assert cached is None
+    assistant._store_response(cache_ref, question, 'answer about the first screenshot')
+
+    assert assistant._cache_lookup('auto', 'groq', question, SECOND, 'java')[1] is None
+    assert assistant._cache_lookup('auto', 'groq', question, FIRST, 'java')[1] == 'answer about the first screenshot'
@@ -0,0 +1,24 @@
+import pytest
+
+from knowledge_base import KnowledgeBase
+
+
+@pytest.fixture(scope='module')
+def kb(tmp_path_factory):
+    return KnowledgeBase(index_path=str(tmp_path_factory.mktemp('kb') / 'knowledge.idx'))
+
+
+@pytest.mark.parametrize('query', [
+    'hi', 'hello', 'hey there', 'thanks', 'ok', 'ok thanks', 'yes', 'test', 'good morning'
+])
+def test_greetings_and_filler_get_no_answer(kb, query):
+    assert kb.answer(query) is None
+
+
+@pytest.mark.parametrize('query, title', [
+    ('what is inheritance in java', 'Inheritance, interfaces and polymorphism in Java'),
+    ('recursion', 'Recursion explained'),
+    ('hello world in c', 'Hello World and compiling C'),
+])
+def test_topic_questions_are_answered(kb, query, title):
+    assert kb.answer(query).startswith(f'### {title}')
@@ -0,0 +1,15 @@
+import threading
+
+from mock_provider import LatencyDistribution, MockConfig
+
+
+def test_singleflight_counters(assistant_factory):
+    assistant = assistant_factory({'groq': MockConfig(LatencyDistribution('fixed', 0.3))})
+    threads = [threading.Thread(target=assistant.chat, args=('what is a java record',)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text = assistant.get_metrics()
+    assert 'assistant_singleflight_total{result="executed"} 1' in text
+    assert 'assistant_singleflight_total{result="coalesced"} 2' in text
@@ -0,0 +1,15 @@
+from provider_adapters import OpenAICompatibleAdapter, ProviderRegistry
+
+
+def test_unknown_format_skips_only_that_provider(monkeypatch, capsys):
+    monkeypatch.setenv('KNOWLEDGE_BASE', 'off')
+    monkeypatch.setenv('EXTRA_PROVIDERS', 'local,lab')
+    monkeypatch.setenv('LOCAL_BASE_URL', 'http://127.0.0.1:8001/v1')
+    monkeypatch.setenv('LAB_BASE_URL', 'http://127.0.0.1:8002/v1')
+    monkeypatch.setenv('LAB_FORMAT', 'opneai')
+
+    registry = ProviderRegistry.from_env()
+
+    assert 'lab' not in registry
+    assert isinstance(registry['local'], OpenAICompatibleAdapter)
+    assert "unknown LAB_FORMAT 'opneai'" in capsys.readouterr().out
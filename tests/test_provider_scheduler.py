@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import pytest
+
+from provider_scheduler import ProviderLimiter, RateLimited
+
+
+def test_refused_at_concurrency_gate_is_refunded():
+    limiter = ProviderLimiter('groq', rpm=60, tpm=6000, concurrency=1)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with limiter.slot(100, max_wait=5):
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait(5)
+    requests_left, tokens_left = limiter.requests.tokens, limiter.tokens.tokens
+    with pytest.raises(RateLimited):
+        with limiter.slot(500, max_wait=0.05):
+            pass
+    release.set()
+    thread.join()
+
+    stats = limiter.get_stats()
+    assert stats['admitted'] == 1 and stats['rejected'] == 1 and stats['queue_depth'] == 0
+    assert limiter.requests.tokens == pytest.approx(requests_left, abs=0.1)
+    assert limiter.tokens.tokens == pytest.approx(tokens_left, abs=10)
+
+
+def test_async_refused_at_concurrency_gate_is_refunded():
+    limiter = ProviderLimiter('groq', rpm=60, concurrency=1)
+
+    async def run():
+        async with limiter.aslot(100, max_wait=5):
+            requests_left = limiter.requests.tokens
+            with pytest.raises(RateLimited):
+                async with limiter.aslot(100, max_wait=0.05):
+                    pass
+            return requests_left
+
+    requests_left = asyncio.run(run())
+    stats = limiter.get_stats()
+    assert stats['admitted'] == 1 and stats['rejected'] == 1
+    assert limiter.requests.tokens == pytest.approx(requests_left, abs=0.1)
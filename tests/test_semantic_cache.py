@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from semantic_cache import SemanticCache  # noqa: E402
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(threshold=0.9)
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('what is inheritance in java', 'explain java inheritance'),
+    ('how do I reverse a linked list', 'reverse a linked list'),
+])
+def test_paraphrase_hits(cache, cached, asked):
+    cache.add('java', cached, 'answer')
+    assert cache.lookup('java', asked) == 'answer'
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('convert celsius to fahrenheit', 'convert fahrenheit to celsius'),
+    ('convert int to string', 'convert string to int'),
+    ('cast a long into an int', 'cast an int into a long'),
+    ('is python faster than java', 'is java faster than python'),
+])
+def test_direction_reversal_misses(cache, cached, asked):
+    cache.add('any', cached, 'answer')
+    assert cache.lookup('any', asked) is None
+
+
+def test_same_question_with_relation_word_hits(cache):
+    cache.add('any', 'convert int to string', 'answer')
+    assert cache.lookup('any', 'how do I convert an int to a string') == 'answer'
+
+
+def test_namespaces_are_separate(cache):
+    cache.add('java', 'what is inheritance in java', 'answer')
+    assert cache.lookup('python', 'what is inheritance in java') is None
@@ -0,0 +1,33 @@
+import asyncio
+
+from mock_provider import LatencyDistribution, MockConfig
+
+FAST = LatencyDistribution('fixed', 0.01)
+
+
+def test_stream_fails_over_before_first_chunk(assistant_factory):
+    assistant = assistant_factory({'groq': MockConfig(FAST, error_rate=1.0), 'deepseek': MockConfig(FAST)})
+    answer = ''.join(assistant.stream_chat('what is a java record', language='java'))
+    assert answer.startswith('Mock answer')
+    stats = assistant.get_provider_stats()
+    assert stats['groq']['errors'] == 1
+    assert stats['deepseek']['requests'] == 1 and stats['deepseek']['errors'] == 0
+
+
+def test_async_stream_fails_over_before_first_chunk(assistant_factory):
+    assistant = assistant_factory({'groq': MockConfig(FAST, error_rate=1.0), 'deepseek': MockConfig(FAST)})
+
+    async def ask():
+        return ''.join([chunk async for chunk in assistant.astream_chat('what is a java record', language='java')])
+
+    assert asyncio.run(ask()).startswith('Mock answer')
+    stats = assistant.get_provider_stats()
+    assert stats['groq']['errors'] == 1 and stats['deepseek']['requests'] == 1
+
+
+def test_stream_records_named_provider_outcome(assistant_factory):
+    assistant = assistant_factory({'groq': MockConfig(FAST, error_rate=1.0), 'deepseek': MockConfig(FAST)})
+    assert ''.join(assistant.stream_chat('what is a java record', ai_model='groq')).startswith('[ERROR]')
+    assert ''.join(assistant.stream_chat('what is a java record', ai_model='deepseek')).startswith('Mock answer')
+    stats = assistant.get_provider_stats()
+    assert stats['groq']['errors'] == 1 and stats['deepseek']['requests'] == 1